@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+
+from .utils import rand_argmax, StateMixin
+from .nonstationary import init_cusum, push_cusum, reset_cusum
+
+__all__ = ['CD_ThompsonSampling']
+
+class CD_ThompsonSampling(StateMixin):
+    """ This class is implementation of ThompsonSampling restarted on detected change points.
+    Reference from 'A Change-Detection based Framework for Piecewise-stationary Multi-Armed Bandit Problem'.
+    `restart` resets posterior of the changed 'arm' or of 'all' arms to the prior.
+    """
+    STATE = ('param', 'rng')
+    CHOICES = {'restart': ('all', 'arm')}
+    
+    def __init__(self, arms, warmup=100, epsilon=0.05, threshold=40, restart='all', prior_alpha=1, prior_beta=1, rng=None):
+        self.arms = arms
+        self.warmup, self.epsilon, self.threshold = warmup, epsilon, threshold
+        self.restart = restart
+        self.prior_alpha, self.prior_beta = prior_alpha, prior_beta
+        self.rng = np.random.default_rng(rng)
+        
+        self.param = dict(init_cusum(self.arms),
+                          alpha=np.full(self.arms, prior_alpha, dtype=float),
+                          beta=np.full(self.arms, prior_beta, dtype=float),
+                          restarts=0)
+    
+    def select_arm(self):
+        return rand_argmax(self.rng.beta(self.param['alpha'], self.param['beta']), self.rng)
+    
+    def select_arms(self, k):
+        return rand_argmax(self.rng.beta(self.param['alpha'], self.param['beta'], size=(k, self.arms)), self.rng)
+    
+    def update_parameter(self, selected_arm, reward):
+        self.param['alpha'][selected_arm] += reward
+        self.param['beta'][selected_arm] += 1 - reward
+        
+        if push_cusum(self.param, selected_arm, reward, self.warmup, self.epsilon, self.threshold):
+            arms = selected_arm if self.restart == 'arm' else slice(None)
+            self.param['alpha'][arms] = self.prior_alpha
+            self.param['beta'][arms] = self.prior_beta
+            reset_cusum(self.param, arms)
+            self.param['restarts'] += 1
+    
+    def update_batch(self, selected_arms, rewards, contexts=None):
+        # detector runs on every feedback in order, so batch is applied one by one
+        for arm, reward in zip(selected_arms, rewards):
+            self.update_parameter(arm, reward)
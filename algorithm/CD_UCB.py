@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+
+from .utils import rand_argmax, StateMixin
+from .nonstationary import init_cusum, push_cusum, reset_cusum
+
+__all__ = ['CD_UCB']
+
+class CD_UCB(StateMixin):
+    """ This class is implementation of CUSUM-UCB algorithm, which is UCB restarted on detected change points.
+    Reference from 'A Change-Detection based Framework for Piecewise-stationary Multi-Armed Bandit Problem'.
+    `restart` forgets the changed 'arm' as in the paper or 'all' arms, and `explore` is probability of pulling a random arm.
+    """
+    STATE = ('param', 'rng')
+    CHOICES = {'restart': ('all', 'arm')}
+    
+    def __init__(self, arms, warmup=100, epsilon=0.05, threshold=40, restart='all', explore=0.0, rng=None):
+        self.arms = arms
+        self.warmup, self.epsilon, self.threshold = warmup, epsilon, threshold
+        self.restart = restart
+        self.explore = explore
+        self.rng = np.random.default_rng(rng)
+        
+        self.param = dict(init_cusum(self.arms), count=np.zeros(self.arms), total=np.zeros(self.arms), restarts=0)
+    
+    def _get_index(self):
+        # rounds since restart are the sum of counts, as in the paper
+        count, total = self.param['count'], self.param['total']
+        with np.errstate(divide='ignore', invalid='ignore'):
+            index = total / count + np.sqrt(2 * np.log(max(count.sum(), 1)) / count)
+        
+        return np.where(count > 0, index, np.inf)
+    
+    def select_arm(self):
+        if self.explore and self.rng.random() < self.explore:
+            return int(self.rng.integers(self.arms))
+        
+        return rand_argmax(self._get_index(), self.rng)
+    
+    def select_arms(self, k):
+        arms = rand_argmax(np.broadcast_to(self._get_index(), (k, self.arms)), self.rng)
+        if self.explore:
+            explored = self.rng.random(k) < self.explore
+            arms[explored] = self.rng.integers(self.arms, size=explored.sum())
+        
+        return arms
+    
+    def update_parameter(self, selected_arm, reward):
+        self.param['count'][selected_arm] += 1
+        self.param['total'][selected_arm] += reward
+        
+        if push_cusum(self.param, selected_arm, reward, self.warmup, self.epsilon, self.threshold):
+            arms = selected_arm if self.restart == 'arm' else slice(None)
+            self.param['count'][arms] = 0
+            self.param['total'][arms] = 0
+            reset_cusum(self.param, arms)
+            self.param['restarts'] += 1
+    
+    def update_batch(self, selected_arms, rewards, contexts=None):
+        # detector runs on every feedback in order, so batch is applied one by one
+        for arm, reward in zip(selected_arms, rewards):
+            self.update_parameter(arm, reward)
@@ -1,67 +1,92 @@
 # -*- coding: utf-8 -*-
-import os
-os.environ['OMP_NUM_THREADS'] = '1'
-import random
 import numpy as np
-import traceback
+
+from .utils import rand_argmax, StateMixin
 
 __all__ = ['Context_ThompsonSampling']
 
-class Context_ThompsonSampling:
+class Context_ThompsonSampling(StateMixin):
     """ This class is implementation of Context_ThompsonSampling algorithm.
     Reference from 'Thompson Sampling for Contextual Bandits with Linear Payoffs'.
+    Factor `G` of B^-1 = G^T G is kept by rank-1 updates, and recomputed after every `refresh` updates if positive.
     """
-    def __init__(self, arms, context, dim, v=0.15):
+    STATE = ('param', 'rng')
+    
+    def __init__(self, arms, context, dim, v=0.15, refresh=0, rng=None):
         self.arms    = arms
-        self.context = context
+        self.context = np.stack([context[arm] for arm in range(self.arms)])
         self.dim     = dim
+        self.refresh = refresh
+        self.rng     = np.random.default_rng(rng)
         
         self.param = {'B': np.eye(self.dim),
+                      'G': np.eye(self.dim),
                       'u_hat': np.zeros(self.dim),
                       'f': np.zeros(self.dim),
-                      'v': v}
+                      'v': v,
+                      'n': 0}
+            
+    def select_arm(self, context=None):
+        z = self.rng.standard_normal(self.dim)
+        u_sample = self.param['u_hat'] + self.param['v'] * np.matmul(z, self.param['G'])
+        
+        return rand_argmax(np.matmul(self.context if context is None else context, u_sample), self.rng)
+    
+    def select_arms(self, k, contexts=None):
+        z = self.rng.standard_normal((k, self.dim))
+        u_sample = self.param['u_hat'] + self.param['v'] * np.matmul(z, self.param['G'])
+        if contexts is not None:
+            return rand_argmax(np.matmul(contexts, u_sample[:, :, None])[..., 0], self.rng)
         
-    def __solve(self, A, b):
+        return rand_argmax(np.matmul(u_sample, self.context.T), self.rng)
+    
+    def __refresh_factor(self):
         try:
-            return np.linalg.solve(A, b)
+            L = np.linalg.cholesky(self.param['B'])
+            self.param['G'] = np.linalg.solve(L, np.eye(self.dim))
         except np.linalg.LinAlgError:
-            return np.linalg.lstsq(A, b)[0]
-        
-    def __get_parameter(self):
-        params = {}
-        
-        B_inv = self.__solve(self.param['B'], np.eye(self.dim))
-        cov = pow(self.param['v'], 2) * B_inv
-        params['u_hat'] = self.param['u_hat']
-        params['cov'] = cov
+            pass
+    
+    def update_parameter(self, selected_arm, reward, context=None):
+        b = self.context[selected_arm] if context is None else context[selected_arm]
+        self.param['B'] += np.outer(b, b)
+        self.param['f'] += reward * b
+        self.param['n'] += 1
         
-        return params
-            
-    def select_arm(self):
-        selected_arm, best = 0, 0
-        params = self.__get_parameter()
+        if self.refresh and self.param['n'] % self.refresh == 0:
+            self.__refresh_factor()
+        else:
+            self.__rank1_update(b)
         
-        try:
-            u_sample = np.random.multivariate_normal(params['u_hat'], params['cov'], tol=1e-6)
-        except Exception as e:
-            traceback.print_exc(e)
-            u_sample = np.zeros(self.dim)
-            
-        for arm in range(self.arms):
-            ctx = self.context[arm]
-            tmp = np.dot(u_sample, ctx)
-                
-            if tmp > best:
-                selected_arm = arm
-                best = tmp
-            elif tmp == best:
-                selected_arm = random.choice(selected_arm, arm)
+        self.__update_u_hat()
     
-        return selected_arm
+    def __rank1_update(self, b):
+        # with F = G^-1 and w = G b, F' = F (I + c w w^T) satisfies F' F'^T = B + b b^T for c = (sqrt(1 + |w|^2) - 1) / |w|^2,
+        # so the inverse factor becomes G' = (I - c / (1 + c |w|^2) w w^T) G
+        G = self.param['G']
+        w = np.matmul(G, b)
+        s = np.dot(w, w)
+        if s > 0:
+            c = (np.sqrt(1 + s) - 1) / s
+            G -= (c / (1 + c * s)) * np.outer(w, np.matmul(w, G))
     
-    def update_parameter(self, selected_arm, reward):
-        b = self.context[selected_arm]
-        self.param['B'] += np.outer(b, b)
-        self.param['f'] += reward * b
+    def __update_u_hat(self):
+        G = self.param['G']
+        self.param['u_hat'] = np.matmul(np.matmul(self.param['f'], G.T), G)
+    
+    def update_batch(self, selected_arms, rewards, contexts=None):
+        """ Apply feedback of many rounds at once. `contexts` is (len(selected_arms), d) context of each feedback, context of the arm is used if None.
+        Batch larger than d is cheaper to refactorize than to apply as rank-1 updates one by one.
+        """
+        x = self.context[np.asarray(selected_arms)] if contexts is None else np.asarray(contexts)
+        self.param['B'] += np.matmul(x.T, x)
+        self.param['f'] += np.matmul(np.asarray(rewards, dtype=float), x)
+        self.param['n'] += len(x)
+        
+        if len(x) > self.dim:
+            self.__refresh_factor()
+        else:
+            for b in x:
+                self.__rank1_update(b)
         
-        self.param['u_hat'] = self.__solve(self.param['B'], self.param['f'])
\ No newline at end of file
+        self.__update_u_hat()
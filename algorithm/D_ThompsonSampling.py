@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+
+from .utils import rand_argmax, StateMixin
+from .nonstationary import init_discount, push_discount, get_discounted
+
+__all__ = ['D_ThompsonSampling']
+
+class D_ThompsonSampling(StateMixin):
+    """ This class is implementation of Discounted ThompsonSampling algorithm for non-stationary rewards.
+    Reference from 'Taming Non-stationary Bandits: A Bayesian Approach'.
+    """
+    STATE = ('param', 'rng')
+    
+    def __init__(self, arms, gamma=0.999, prior_alpha=1, prior_beta=1, rng=None):
+        self.arms = arms
+        self.gamma = gamma
+        self.prior_alpha, self.prior_beta = prior_alpha, prior_beta
+        self.rng = np.random.default_rng(rng)
+        
+        self.param = init_discount(self.arms)
+    
+    def _get_posterior(self):
+        count, total = get_discounted(self.param)
+        # count - total is clipped, as both are rounded after scaling
+        return self.prior_alpha + total, self.prior_beta + np.maximum(count - total, 0)
+    
+    def select_arm(self):
+        return rand_argmax(self.rng.beta(*self._get_posterior()), self.rng)
+    
+    def select_arms(self, k):
+        alpha, beta = self._get_posterior()
+        return rand_argmax(self.rng.beta(alpha, beta, size=(k, self.arms)), self.rng)
+    
+    def update_parameter(self, selected_arm, reward):
+        push_discount(self.param, selected_arm, reward, self.gamma)
+    
+    def update_batch(self, selected_arms, rewards, contexts=None):
+        # each feedback is one round of discount, so batch is applied one by one
+        for arm, reward in zip(selected_arms, rewards):
+            self.update_parameter(arm, reward)
@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+
+from .utils import rand_argmax, StateMixin
+from .nonstationary import init_discount, push_discount, get_discounted
+
+__all__ = ['D_UCB']
+
+class D_UCB(StateMixin):
+    """ This class is implementation of Discounted UCB algorithm for non-stationary rewards.
+    Reference from 'On Upper-Confidence Bound Policies for Switching Bandit Problems'.
+    """
+    STATE = ('param', 'rng')
+    
+    def __init__(self, arms, gamma=0.999, xi=0.6, rng=None):
+        self.arms = arms
+        self.gamma = gamma
+        self.xi = xi
+        self.rng = np.random.default_rng(rng)
+        
+        self.param = init_discount(self.arms)
+    
+    def _get_index(self):
+        count, total = get_discounted(self.param)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            index = total / count + 2 * np.sqrt(self.xi * max(np.log(count.sum()), 0) / count)
+        
+        return np.where(count > 0, index, np.inf)
+    
+    def select_arm(self):
+        return rand_argmax(self._get_index(), self.rng)
+    
+    def select_arms(self, k):
+        return rand_argmax(np.broadcast_to(self._get_index(), (k, self.arms)), self.rng)
+    
+    def update_parameter(self, selected_arm, reward):
+        push_discount(self.param, selected_arm, reward, self.gamma)
+    
+    def update_batch(self, selected_arms, rewards, contexts=None):
+        # each feedback is one round of discount, so batch is applied one by one
+        for arm, reward in zip(selected_arms, rewards):
+            self.update_parameter(arm, reward)
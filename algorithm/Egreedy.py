@@ -1,52 +1,88 @@
 # -*- coding: utf-8 -*-
-import os
-os.environ['OMP_NUM_THREADS'] = '1'
-import random
 import numpy as np
 
+from .utils import rand_argmax, get_index, get_batch_stats, StateMixin
+from .index_tree import IndexTree
+
 __all__ = ['Egreedy']
 
-class Egreedy:
+class Egreedy(StateMixin):
     """ This class is implementation of Egreedy algorithm.
     Reference from 'Finite-time Analysis of the Multiarmed Bandit Problem'.
+    `index='tree'` keeps argmax of reward means in `IndexTree` so that exploitation needs no scan.
     """
+    STATE = ('rounds', 'n', 'reward_mean', 'rng')
+    CHOICES = {'index': ('scan', 'tree')}
+    
     # d should be in interval 0 and (best reward - second reward) & c just positive scalar
-    def __init__(self, arms, c=6, d=0.2):
+    def __init__(self, arms, c=6, d=0.2, replicas=None, index='scan', rng=None):
         self.arms = arms
+        self.rng = np.random.default_rng(rng)
         self.e, self.c, self.d = 1, c, d
+        self.replicas = replicas
+        self.rows = None if replicas is None else np.arange(replicas)
         
-        self.n = {'rounds': 1}
-        self.reward_mean = {}
         # for the initialization of Egreedy algorithm param
-        for arm in range(self.arms):
-            self.n[arm] = 0
-            self.reward_mean[arm] = 0
-
+        shape = (self.arms,) if replicas is None else (replicas, self.arms)
+        self.rounds = 1
+        self.n = np.zeros(shape)
+        self.reward_mean = np.zeros(shape)
+        
+        self.tree = IndexTree(self.arms, self.rng) if index == 'tree' and replicas is None else None
+        if self.tree is not None:
+            self.tree.build(self.reward_mean)
+    
+    def _get_greedy(self):
+        return rand_argmax(self.reward_mean, self.rng) if self.tree is None else self.tree.argmax()
+    
+    def _get_epsilon(self):
+        e = min(1, (self.c * self.arms) / (pow(self.d, 2) * self.rounds))
+        return e
+    
     def select_arm(self):
-        def _get_epsilon(arms, c, d, n):
-            e = min(1, (c * arms) / (pow(d, 2) * n))
-            return e
-
+        e = self._get_epsilon()
+        if self.replicas is not None:
+            explore = self.rng.random(self.replicas) < e
+            return np.where(explore, self.rng.integers(self.arms, size=self.replicas), rand_argmax(self.reward_mean, self.rng))
+        
         # if True Exploit, False Explore
-        if not np.random.binomial(1, _get_epsilon(self.arms, self.c, self.d, self.n['rounds'])):
-            selected_arm, best = 0, 0
-            for arm in range(self.arms):
-                tmp = self.reward_mean[arm]
-                if tmp > best:
-                    selected_arm = arm
-                    best = tmp
-                elif tmp == best:
-                    selected_arm = random.choice([selected_arm, arm])
-
+        if not self.rng.binomial(1, e):
+            selected_arm = self._get_greedy()
         else:
-            selected_arm = random.choice(list(range(self.arms)))
-
+            selected_arm = self.rng.integers(self.arms)
+        
         return selected_arm
-
+    
+    def select_arms(self, k):
+        explore = self.rng.random(k) < self._get_epsilon()
+        if self.tree is not None:
+            greedy = self.tree.argmax()
+        else:
+            greedy = rand_argmax(np.broadcast_to(self.reward_mean, (k, self.arms)), self.rng)
+        
+        return np.where(explore, self.rng.integers(self.arms, size=k), greedy)
+    
     def update_parameter(self, selected_arm, reward):
-        self.reward_mean[selected_arm] *= self.n[selected_arm]
-        self.reward_mean[selected_arm] += reward
-        self.n[selected_arm] += 1
-        self.reward_mean[selected_arm] /= self.n[selected_arm]
+        idx = get_index(selected_arm, self.rows)
+        self.n[idx] += 1
+        self.reward_mean[idx] += (reward - self.reward_mean[idx]) / self.n[idx]
+        
+        self.rounds += 1
+        if self.tree is not None:
+            self.tree.update(selected_arm, self.reward_mean[selected_arm])
+    
+    def update_batch(self, selected_arms, rewards, contexts=None):
+        count, total = get_batch_stats(selected_arms, rewards, self.arms)
+        pulled = count > 0
+        self.n[pulled] += count[pulled]
+        self.reward_mean[pulled] += (total[pulled] - count[pulled] * self.reward_mean[pulled]) / self.n[pulled]
         
-        self.n['rounds'] += 1
+        self.rounds += len(selected_arms)
+        if self.tree is not None:
+            for arm in np.flatnonzero(pulled):
+                self.tree.update(arm, self.reward_mean[arm])
+    
+    def set_state(self, state):
+        super().set_state(state)
+        if self.tree is not None:
+            self.tree.build(self.reward_mean)
@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+
+from .utils import rand_argmax, StateMixin
+
+__all__ = ['HybridLinUCB']
+
+class HybridLinUCB(StateMixin):
+    """ This class is implementation of LinUCB with hybrid linear models algorithm.
+    Reference from 'A Contextual-Bandit Approach to Personalized News Article Recommendation'.
+    `arm_features` is per-arm feature, 'context' as in the paper, 'bias' for per-arm offset only or 'none' for one shared model.
+    """
+    STATE = ('param', 'rng')
+    CHOICES = {'arm_features': ('context', 'bias', 'none')}
+    
+    def __init__(self, arms, context, dim, alpha=1, arm_features='context', rng=None):
+        self.arms    = arms
+        self.context = np.stack([context[arm] for arm in range(self.arms)])
+        self.dim     = dim
+        self.alpha   = alpha
+        self.rng     = np.random.default_rng(rng)
+        
+        self.arm_features = arm_features
+        self.features = self._get_features(self.context)
+        m = self.features.shape[-1]
+        
+        self.param = {'A0': np.eye(self.dim),
+                      'A0_inv': np.eye(self.dim),
+                      'b0': np.zeros(self.dim),
+                      'beta': np.zeros(self.dim),
+                      'A_inv': np.tile(np.eye(m), (self.arms, 1, 1)),
+                      'B': np.zeros((self.arms, m, self.dim)),
+                      'b': np.zeros((self.arms, m)),
+                      'n': 0}
+    
+    def _get_features(self, z):
+        if self.arm_features == 'context':
+            return z
+        
+        return np.ones(z.shape[:-1] + ({'bias': 1, 'none': 0}[self.arm_features],))
+    
+    def _get_index(self, context=None):
+        z, x = (self.context, self.features) if context is None else (context, self._get_features(context))
+        
+        # with u = B^T A^-1 x, s = z^T A0^-1 z - 2 z^T A0^-1 u + u^T A0^-1 u + x^T A^-1 x = w^T A0^-1 w + x^T A^-1 x for w = z - u,
+        # and as A^-1 is symmetric, mean = z^T beta + x^T A^-1 (b - B beta) = w^T beta + (A^-1 x)^T b
+        w, mean, var = z, 0, 0
+        if x.shape[-1]:
+            A_inv_x = np.matmul(self.param['A_inv'], x[..., None])[..., 0]
+            w = z - np.matmul(A_inv_x[..., None, :], self.param['B'])[..., 0, :]
+            mean = np.sum(A_inv_x * self.param['b'], axis=-1)
+            var = np.sum(A_inv_x * x, axis=-1)
+        
+        mean = mean + np.matmul(w, self.param['beta'])
+        var = var + np.sum(np.matmul(w, self.param['A0_inv']) * w, axis=-1)
+        
+        return mean + self.alpha * np.sqrt(np.maximum(var, 0))
+    
+    def select_arm(self, context=None):
+        return rand_argmax(self._get_index(context), self.rng)
+    
+    def select_arms(self, k, contexts=None):
+        if contexts is not None:
+            return rand_argmax(self._get_index(contexts), self.rng)
+        
+        return rand_argmax(np.broadcast_to(self._get_index(), (k, self.arms)), self.rng)
+    
+    def __accumulate(self, arm, reward, z=None):
+        """ Apply one feedback to per-arm state and to shared A0 and b0, without re-inverting A0.
+        `z` is context of the arm at the round, fixed context of the arm is used if None.
+        """
+        z, x = (self.context[arm], self.features[arm]) if z is None else (z, self._get_features(z))
+        A_inv, B, b = self.param['A_inv'][arm], self.param['B'][arm], self.param['b'][arm]
+        
+        # contribution of the arm to the shared model is replaced by its updated one
+        A_inv_B = np.matmul(A_inv, B)
+        self.param['A0'] += np.matmul(B.T, A_inv_B)
+        self.param['b0'] += np.matmul(b, A_inv_B)
+        
+        A_inv_x = np.matmul(A_inv, x)
+        A_inv -= np.outer(A_inv_x, A_inv_x) / (1 + np.dot(x, A_inv_x))
+        B += np.outer(x, z)
+        b += reward * x
+        
+        A_inv_B = np.matmul(A_inv, B)
+        self.param['A0'] += np.outer(z, z) - np.matmul(B.T, A_inv_B)
+        self.param['b0'] += reward * z - np.matmul(b, A_inv_B)
+        self.param['n'] += 1
+    
+    def __update_beta(self):
+        try:
+            self.param['A0_inv'] = np.linalg.inv(self.param['A0'])
+        except np.linalg.LinAlgError:
+            self.param['A0_inv'] = np.linalg.pinv(self.param['A0'])
+        self.param['beta'] = np.matmul(self.param['A0_inv'], self.param['b0'])
+    
+    def update_parameter(self, selected_arm, reward, context=None):
+        self.__accumulate(selected_arm, reward, None if context is None else context[selected_arm])
+        self.__update_beta()
+    
+    def update_batch(self, selected_arms, rewards, contexts=None):
+        """ Apply feedback of many rounds, re-inverting shared A0 only once.
+        `contexts` is (len(selected_arms), d) context of each feedback, context of the arm is used if None.
+        """
+        for i, (arm, reward) in enumerate(zip(selected_arms, rewards)):
+            self.__accumulate(arm, reward, None if contexts is None else contexts[i])
+        self.__update_beta()
@@ -1,77 +1,101 @@
 # -*- coding: utf-8 -*-
-import os
-os.environ['OMP_NUM_THREADS'] = '1'
-import random
 import numpy as np
-import datetime
+
+from .utils import rand_argmax, get_index, get_batch_stats, StateMixin
+from .kl_index import KLIndex
+from .index_tree import IndexTree
+
 __all__ = ['KL_UCB']
 
-class KL_UCB:
+class KL_UCB(StateMixin):
     """ This class is implementation of KL_UCB algorithm.
     Reference from 'The KL-UCB Algorithm for Bounded Stochastic Bandits and Beyond'.
+    `refresh` refreshes the bound lazily by that ratio and solves only the changed arms again, by default 0 (exact) for scan and 0.05 for tree.
     """
-    def __init__(self, arms, c=0):
+    STATE = ('rounds', 'n', 'reward_mean', 'bound', 'rng')
+    CHOICES = {'index': ('scan', 'tree')}
+    
+    # tol and maxiter control the batched Newton solver, arms left unconverged fall back to bisection
+    def __init__(self, arms, c=0, tol=1e-6, maxiter=10, replicas=None, index='scan', refresh=None, rng=None):
         self.arms = arms
+        self.rng = np.random.default_rng(rng)
         self.c = c
+        self.rows = None if replicas is None else np.arange(replicas)
         
-        self.n = {'rounds': self.arms}
-        self.reward_mean = {}
         # for the initialization of KL_UCB algorithm param
-        for arm in range(self.arms):
-            self.n[arm] = 1
-            self.reward_mean[arm] = np.random.binomial(1, 0.5)
-
-    # This Bernoulli Kullback-Leibler divergence formulation is from the paper
-    def __kl(self, P, Q):
-        div = 0 if P == Q else np.sum(P * np.log(P / Q) + (1 - P) * np.log((1 - P) / (1 - Q)))
-
-        return div
-    
-    # For each arm the upper-confidence bound can be efficiently computed using Newton iterations
-    def __newton_method(self, arm, tol=1e-2, maxiter=3):
-        epsilon = 1e-5
-        # initial value of q can be different, but will be good to set higher than mean reward value
-        q = self.reward_mean[arm] + 0.05
-        q = 1 if q > 1 else q
+        shape = (self.arms,) if replicas is None else (replicas, self.arms)
+        self.rounds = self.arms
+        self.n = np.ones(shape)
+        self.reward_mean = self.rng.binomial(1, 0.5, size=shape).astype(float)
         
-        for i in range(maxiter):
-            # For avoiding RuntimeWarning: division by zero in log
-            q = (q + epsilon) if q == 0 else (q - epsilon) if q == 1 else q
-            self.reward_mean[arm] = (self.reward_mean[arm] + epsilon) if self.reward_mean[arm] == 0 else (self.reward_mean[arm] - epsilon) if self.reward_mean[arm] == 1 else self.reward_mean[arm]
-            
-            if q == self.reward_mean[arm]:
-                return q
-            
-            y = self.n[arm] * self.__kl(self.reward_mean[arm], q) - (np.log(self.n['rounds']) + self.c * np.log(np.log(self.n['rounds'])))
-            dy = (1 - self.reward_mean[arm]) * (self.n[arm] / (1 - q)) - self.n[arm] * (self.reward_mean[arm] / q)
-            
-            q_next = min(max(q - y / dy, 0), 1)
-            if q_next in (0, 1):
-                return q_next
-            # give some tolerance to convergence
-            if abs((q_next - q) / q_next) <= tol:
-                return q_next
-            
-            q = q_next
-            
-        return q
+        self.kl_index = KLIndex(self.n.size, tol=tol, maxiter=maxiter)
+        
+        self.refresh = (0.05 if index == 'tree' else 0) if refresh is None else refresh
+        self.bound = self._get_bound()
+        self.tree = IndexTree(self.arms, self.rng) if index == 'tree' and replicas is None else None
+        if self.tree is not None:
+            self._build_tree()
+        
+    def _get_bound(self):
+        # log(log(t)) is kept non-negative for the first few rounds
+        return np.log(self.rounds) + self.c * np.log(max(np.log(self.rounds), 1))
+        
+    def _refresh_bound(self):
+        bound = self._get_bound()
+        if bound > self.bound * (1 + self.refresh):
+            self.bound = bound
+        
+        return self.bound
+    
+    def _build_tree(self):
+        self.tree.build(self.kl_index(self.n, self.reward_mean, self.bound))
+    
+    def _update_tree(self, arms):
+        if self._get_bound() > self.bound * (1 + self.refresh):
+            self.bound = self._get_bound()
+            self._build_tree()
+            return
         
+        arms = np.asarray(arms)
+        for arm, value in zip(arms, self.kl_index.solve(self.n[arms], self.reward_mean[arms], self.bound)):
+            self.tree.update(arm, value)
+    
     def select_arm(self):
-        selected_arm, best = 0, 0
-        for arm in range(self.arms):
-            tmp = self.__newton_method(arm)
-            if tmp > best:
-                selected_arm = arm
-                best = tmp
-            elif tmp == best:
-                selected_arm = random.choice([selected_arm, arm])
-
-        return selected_arm
-
+        if self.tree is not None:
+            return self.tree.argmax()
+        
+        index = self.kl_index(self.n.ravel(), self.reward_mean.ravel(), self._refresh_bound())
+        
+        return rand_argmax(index.reshape(self.n.shape), self.rng)
+    
+    def select_arms(self, k):
+        if self.tree is not None:
+            return np.full(k, self.tree.argmax())
+        
+        index = self.kl_index(self.n, self.reward_mean, self._refresh_bound())
+        
+        return rand_argmax(np.broadcast_to(index, (k, self.arms)), self.rng)
+    
     def update_parameter(self, selected_arm, reward):
-        self.reward_mean[selected_arm] *= self.n[selected_arm]
-        self.reward_mean[selected_arm] += reward
-        self.n[selected_arm] += 1
-        self.reward_mean[selected_arm] /= self.n[selected_arm]
+        idx = get_index(selected_arm, self.rows)
+        self.n[idx] += 1
+        self.reward_mean[idx] += (reward - self.reward_mean[idx]) / self.n[idx]
         
-        self.n['rounds'] += 1
+        self.rounds += 1
+        if self.tree is not None:
+            self._update_tree([selected_arm])
+    
+    def update_batch(self, selected_arms, rewards, contexts=None):
+        count, total = get_batch_stats(selected_arms, rewards, self.arms)
+        pulled = count > 0
+        self.n[pulled] += count[pulled]
+        self.reward_mean[pulled] += (total[pulled] - count[pulled] * self.reward_mean[pulled]) / self.n[pulled]
+        
+        self.rounds += len(selected_arms)
+        if self.tree is not None:
+            self._update_tree(np.flatnonzero(pulled))
+    
+    def set_state(self, state):
+        super().set_state(state)
+        if self.tree is not None:
+            self._build_tree()
@@ -1,66 +1,81 @@
 # -*- coding: utf-8 -*-
-import os
-os.environ['OMP_NUM_THREADS'] = '1'
-import random
 import numpy as np
-import traceback
+
+from .utils import rand_argmax, StateMixin
 
 __all__ = ['LinUCB']
 
-class LinUCB:
+class LinUCB(StateMixin):
     """ This class is implementation of LinUCB with disjoint linear models algorithm.
     Reference from 'A Contextual-Bandit Approach to Personalized News Article Recommendation'.
+    Inverse of `A` is kept by Sherman-Morrison updates, and recomputed after every `refresh` updates of the arm if positive.
     """
-    def __init__(self, arms, context, dim, alpha=1):
+    STATE = ('param', 'rng')
+    
+    def __init__(self, arms, context, dim, alpha=1, refresh=0, rng=None):
         self.arms    = arms
-        self.context = context
+        self.context = np.stack([context[arm] for arm in range(self.arms)])
         self.dim     = dim
         self.alpha   = alpha
+        self.refresh = refresh
+        self.rng     = np.random.default_rng(rng)
         
-        self.param = {}
-        for arm in range(self.arms):
-            self.param[arm] = {'A': np.eye(self.dim),
-                               'b':np.zeros(self.dim)}
+        eye = np.tile(np.eye(self.dim), (self.arms, 1, 1))
+        self.param = {'A': eye.copy(),
+                      'A_inv': eye,
+                      'b': np.zeros((self.arms, self.dim)),
+                      'theta': np.zeros((self.arms, self.dim)),
+                      'n': np.zeros(self.arms, dtype=int)}
         
     def __solve(self, A, b):
         try:
             return np.linalg.solve(A, b)
         except np.linalg.LinAlgError:
             return np.linalg.lstsq(A, b)[0]
+            
+    def _get_index(self, context=None):
+        ctx = self.context if context is None else context
+        var = np.matmul(self.param['A_inv'], ctx[..., None])[..., 0]
+        var = np.sqrt(np.sum(ctx * var, axis=-1))
         
-    def __get_parameter(self, arm, ctx):
-        params = {}
+        return np.sum(self.param['theta'] * ctx, axis=-1) + self.alpha * var
+            
+    def select_arm(self, context=None):
+        return rand_argmax(self._get_index(context), self.rng)
+    
+    def select_arms(self, k, contexts=None):
+        if contexts is not None:
+            return rand_argmax(self._get_index(contexts), self.rng)
         
-        A_inv = self.__solve(self.param[arm]['A'], np.eye(self.dim))
-        theta = np.matmul(A_inv, self.param[arm]['b'])
-        var = np.matmul(A_inv, ctx)
-        #theta = self.__solve(self.param[arm]['A'], self.param[arm]['b'])
-        #var = self.__solve(self.param[arm]['A'], ctx)
-        var = np.sqrt(np.dot(ctx, var))
+        return rand_argmax(np.broadcast_to(self._get_index(), (k, self.arms)), self.rng)
+    
+    def update_parameter(self, selected_arm, reward, context=None):
+        x = self.context[selected_arm] if context is None else context[selected_arm]
+        self.param['A'][selected_arm] += np.outer(x, x)
+        self.param['b'][selected_arm] += reward * x
+        self.param['n'][selected_arm] += 1
         
-        params['theta'] = theta
-        params['var'] = var
+        A_inv = self.param['A_inv'][selected_arm]
+        if self.refresh and self.param['n'][selected_arm] % self.refresh == 0:
+            A_inv[:] = self.__solve(self.param['A'][selected_arm], np.eye(self.dim))
+        else:
+            # Sherman-Morrison: (A + xx^T)^-1 = A^-1 - (A^-1 x)(A^-1 x)^T / (1 + x^T A^-1 x)
+            A_inv_x = np.matmul(A_inv, x)
+            A_inv -= np.outer(A_inv_x, A_inv_x) / (1 + np.dot(x, A_inv_x))
         
-        return params
-            
-    def select_arm(self):
-        selected_arm, best = 0, 0
-        for arm in range(self.arms):
-            ctx = self.context[arm]
-            params = self.__get_parameter(arm, ctx)
-            
-            tmp = np.dot(params['theta'], ctx)
-            tmp += (self.alpha * params['var'])
-                
-            if tmp > best:
-                selected_arm = arm
-                best = tmp
-            elif tmp == best:
-                selected_arm = random.choice(selected_arm, arm)
-    
-        return selected_arm
+        self.param['theta'][selected_arm] = np.matmul(A_inv, self.param['b'][selected_arm])
     
-    def update_parameter(self, selected_arm, reward):
-        x = self.context[selected_arm]
-        self.param[selected_arm]['A'] += np.outer(x, x)
-        self.param[selected_arm]['b'] += reward * x
\ No newline at end of file
+    def update_batch(self, selected_arms, rewards, contexts=None):
+        """ Accumulate A and b of all feedback with scatter-add, and re-invert only the arms pulled in the batch at once.
+        `contexts` is (len(selected_arms), d) context of each feedback, context of the arm is used if None.
+        """
+        selected_arms = np.asarray(selected_arms)
+        x = self.context[selected_arms] if contexts is None else np.asarray(contexts)
+        
+        np.add.at(self.param['A'], selected_arms, x[:, :, None] * x[:, None, :])
+        np.add.at(self.param['b'], selected_arms, np.asarray(rewards, dtype=float)[:, None] * x)
+        np.add.at(self.param['n'], selected_arms, 1)
+        
+        pulled = np.unique(selected_arms)
+        self.param['A_inv'][pulled] = np.linalg.inv(self.param['A'][pulled])
+        self.param['theta'][pulled] = np.matmul(self.param['A_inv'][pulled], self.param['b'][pulled][..., None])[..., 0]
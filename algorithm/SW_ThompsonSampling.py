@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+
+from .utils import rand_argmax, StateMixin
+from .nonstationary import init_window, push_window
+
+__all__ = ['SW_ThompsonSampling']
+
+class SW_ThompsonSampling(StateMixin):
+    """ This class is implementation of Sliding-Window ThompsonSampling algorithm for non-stationary rewards.
+    Reference from 'Sliding-Window Thompson Sampling for Non-Stationary Settings'.
+    """
+    STATE = ('param', 'rng')
+    
+    def __init__(self, arms, window=1000, prior_alpha=1, prior_beta=1, rng=None):
+        self.arms = arms
+        self.window = window
+        self.prior_alpha, self.prior_beta = prior_alpha, prior_beta
+        self.rng = np.random.default_rng(rng)
+        
+        self.param = init_window(self.arms, self.window)
+    
+    def _get_posterior(self):
+        count, total = self.param['count'], self.param['total']
+        return self.prior_alpha + total, self.prior_beta + count - total
+    
+    def select_arm(self):
+        return rand_argmax(self.rng.beta(*self._get_posterior()), self.rng)
+    
+    def select_arms(self, k):
+        alpha, beta = self._get_posterior()
+        return rand_argmax(self.rng.beta(alpha, beta, size=(k, self.arms)), self.rng)
+    
+    def update_parameter(self, selected_arm, reward):
+        push_window(self.param, selected_arm, reward)
+    
+    def update_batch(self, selected_arms, rewards, contexts=None):
+        # window moves by every feedback in order, so batch is applied one by one
+        for arm, reward in zip(selected_arms, rewards):
+            self.update_parameter(arm, reward)
@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+
+from .utils import rand_argmax, StateMixin
+from .nonstationary import init_window, push_window
+
+__all__ = ['SW_UCB']
+
+class SW_UCB(StateMixin):
+    """ This class is implementation of Sliding-Window UCB algorithm for non-stationary rewards.
+    Reference from 'On Upper-Confidence Bound Policies for Switching Bandit Problems'.
+    """
+    STATE = ('param', 'rng')
+    
+    def __init__(self, arms, window=1000, xi=0.6, rng=None):
+        self.arms = arms
+        self.window = window
+        self.xi = xi
+        self.rng = np.random.default_rng(rng)
+        
+        self.param = dict(init_window(self.arms, self.window), rounds=0)
+    
+    def _get_index(self):
+        count, total = self.param['count'], self.param['total']
+        with np.errstate(divide='ignore', invalid='ignore'):
+            index = total / count + np.sqrt(self.xi * np.log(max(min(self.param['rounds'], self.window), 1)) / count)
+        
+        return np.where(count > 0, index, np.inf)
+    
+    def select_arm(self):
+        return rand_argmax(self._get_index(), self.rng)
+    
+    def select_arms(self, k):
+        return rand_argmax(np.broadcast_to(self._get_index(), (k, self.arms)), self.rng)
+    
+    def update_parameter(self, selected_arm, reward):
+        push_window(self.param, selected_arm, reward)
+        self.param['rounds'] += 1
+    
+    def update_batch(self, selected_arms, rewards, contexts=None):
+        # window moves by every feedback in order, so batch is applied one by one
+        for arm, reward in zip(selected_arms, rewards):
+            self.update_parameter(arm, reward)
@@ -1,36 +1,37 @@
 # -*- coding: utf-8 -*-
-import os
-os.environ['OMP_NUM_THREADS'] = '1'
 import numpy as np
 
+from .utils import rand_argmax, get_index, get_batch_stats, StateMixin
+
 __all__ = ['ThompsonSampling']
 
-class ThompsonSampling:
+class ThompsonSampling(StateMixin):
     """ This class is implementation of ThompsonSampling algorithm.
     Reference from 'Analysis of Thompson Sampling for the Multi-armed Bandit Problem'.
     """
-    def __init__(self, arms, prior_alpha=1, prior_beta=1):
+    STATE = ('alpha', 'beta', 'rng')
+    
+    def __init__(self, arms, prior_alpha=1, prior_beta=1, replicas=None, rng=None):
         self.arms = arms
-        self.alpha, self.beta = {}, {}
+        self.rng = np.random.default_rng(rng)
+        self.rows = None if replicas is None else np.arange(replicas)
         
-        for arm in range(self.arms):
-            self.alpha[arm] = prior_alpha
-            self.beta[arm] = prior_beta
+        shape = (self.arms,) if replicas is None else (replicas, self.arms)
+        self.alpha = np.full(shape, prior_alpha, dtype=float)
+        self.beta = np.full(shape, prior_beta, dtype=float)
 
     def select_arm(self):
-        selected_arm, best = 0, 0
-        for arm in range(self.arms):
-            tmp = np.random.beta(self.alpha[arm], self.beta[arm])
-            if tmp > best:
-                selected_arm = arm
-                best = tmp
-            elif tmp == best:
-                selected_arm = random.choice(selected_arm, arm)
-
-        return selected_arm
+        return rand_argmax(self.rng.beta(self.alpha, self.beta), self.rng)
+    
+    def select_arms(self, k):
+        return rand_argmax(self.rng.beta(self.alpha, self.beta, size=(k, self.arms)), self.rng)
 
     def update_parameter(self, selected_arm, reward):
-        if reward == 1:
-            self.alpha[selected_arm] += 1
-        else:
-            self.beta[selected_arm] += 1
+        idx = get_index(selected_arm, self.rows)
+        self.alpha[idx] += reward
+        self.beta[idx] += 1 - reward
+
+    def update_batch(self, selected_arms, rewards, contexts=None):
+        count, total = get_batch_stats(selected_arms, rewards, self.arms)
+        self.alpha += total
+        self.beta += count - total
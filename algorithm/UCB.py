@@ -1,41 +1,84 @@
 # -*- coding: utf-8 -*-
-import os
-os.environ['OMP_NUM_THREADS'] = '1'
-import random
 import numpy as np
 
+from .utils import rand_argmax, get_index, get_batch_stats, StateMixin
+from .index_tree import IndexTree
+
 __all__ = ['UCB']
 
-class UCB:    
+class UCB(StateMixin):    
     """ This class is implementation of UCB algorithm.
     Reference from 'Finite-time Analysis of the Multiarmed Bandit Problem'.
+    `index='tree'` keeps arms in `IndexTree` with log(t) refreshed lazily by `refresh` ratio, `refresh=0` gives the same index as scan.
     """
-    def __init__(self, arms):
+    STATE = ('rounds', 'n', 'reward_mean', 'log_t', 'rng')
+    CHOICES = {'index': ('scan', 'tree')}
+    
+    def __init__(self, arms, replicas=None, index='scan', refresh=0.05, rng=None):
         self.arms = arms
+        self.rng = np.random.default_rng(rng)
+        self.rows = None if replicas is None else np.arange(replicas)
         
-        self.n = {'rounds': self.arms}
-        self.reward_mean = {}
         # for the initialization of UCB algorithm param
-        for arm in range(self.arms):
-            self.n[arm] = 1
-            self.reward_mean[arm] = np.random.binomial(1, 0.5)
-
+        shape = (self.arms,) if replicas is None else (replicas, self.arms)
+        self.rounds = self.arms
+        self.n = np.ones(shape)
+        self.reward_mean = self.rng.binomial(1, 0.5, size=shape).astype(float)
+        
+        self.refresh = refresh
+        self.log_t = np.log(self.rounds)
+        self.tree = IndexTree(self.arms, self.rng) if index == 'tree' and replicas is None else None
+        if self.tree is not None:
+            self._build_tree()
+    
+    def _get_index(self):
+        return self.reward_mean + np.sqrt(2 * np.log(self.rounds) / self.n)
+    
+    def _build_tree(self):
+        self.tree.build(self.reward_mean + np.sqrt(2 * self.log_t / self.n))
+    
+    def _update_tree(self, arms):
+        if np.log(self.rounds) > self.log_t * (1 + self.refresh):
+            self.log_t = np.log(self.rounds)
+            self._build_tree()
+            return
+        
+        # only the pulled arms changed, and they are scored with log(t) of the tree
+        for arm in arms:
+            self.tree.update(arm, self.reward_mean[arm] + np.sqrt(2 * self.log_t / self.n[arm]))
+    
     def select_arm(self):
-        selected_arm, best = 0, 0
-        for arm in range(self.arms):
-            tmp = self.reward_mean[arm] + np.sqrt((2 * np.log(self.n['rounds']) / self.n[arm]))
-            if tmp > best:
-                selected_arm = arm
-                best = tmp
-            elif tmp == best:
-                selected_arm = random.choice([selected_arm, arm])
-
-        return selected_arm
-
+        if self.tree is not None:
+            return self.tree.argmax()
+        
+        return rand_argmax(self._get_index(), self.rng)
+    
+    def select_arms(self, k):
+        if self.tree is not None:
+            return np.full(k, self.tree.argmax())
+        
+        return rand_argmax(np.broadcast_to(self._get_index(), (k, self.arms)), self.rng)
+    
     def update_parameter(self, selected_arm, reward):
-        self.reward_mean[selected_arm] *= self.n[selected_arm]
-        self.reward_mean[selected_arm] += reward
-        self.n[selected_arm] += 1
-        self.reward_mean[selected_arm] /= self.n[selected_arm]
+        idx = get_index(selected_arm, self.rows)
+        self.n[idx] += 1
+        self.reward_mean[idx] += (reward - self.reward_mean[idx]) / self.n[idx]
+        
+        self.rounds += 1
+        if self.tree is not None:
+            self._update_tree((selected_arm,))
+    
+    def update_batch(self, selected_arms, rewards, contexts=None):
+        count, total = get_batch_stats(selected_arms, rewards, self.arms)
+        pulled = count > 0
+        self.n[pulled] += count[pulled]
+        self.reward_mean[pulled] += (total[pulled] - count[pulled] * self.reward_mean[pulled]) / self.n[pulled]
         
-        self.n['rounds'] += 1
+        self.rounds += len(selected_arms)
+        if self.tree is not None:
+            self._update_tree(np.flatnonzero(pulled))
+    
+    def set_state(self, state):
+        super().set_state(state)
+        if self.tree is not None:
+            self._build_tree()
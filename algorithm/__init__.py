@@ -1,6 +1,32 @@
-from .Egreedy import *
-from .UCB import *
-from .KL_UCB import *
-from .ThompsonSampling import *
-from .LinUCB import *
-from .Context_ThompsonSampling import *
\ No newline at end of file
+import os
+os.environ['OMP_NUM_THREADS'] = '1'
+import sys
+import types
+import importlib
+
+from .registry import *
+
+# each algorithm is in module of its own name, which is imported on first access, e.g. `from algorithm import UCB`
+ALGORITHMS = ['Egreedy', 'UCB', 'KL_UCB', 'ThompsonSampling', 'SW_UCB', 'D_UCB', 'CD_UCB', 'SW_ThompsonSampling', 'D_ThompsonSampling', 'CD_ThompsonSampling',
+              'LinUCB', 'HybridLinUCB', 'Context_ThompsonSampling']
+
+__all__ = registry.__all__ + ALGORITHMS
+
+class _Package(types.ModuleType):
+    """ Import system binds name of submodule in this package to the module when it is loaded, e.g. by `import algorithm.UCB`,
+    which is rebound to the class of the same name, so that `algorithm.UCB` is always the class, as with `from .UCB import *`.
+    """
+    def __setattr__(self, name, value):
+        if name in ALGORITHMS and isinstance(value, types.ModuleType):
+            value = getattr(value, name)
+        super().__setattr__(name, value)
+
+sys.modules[__name__].__class__ = _Package
+
+def __getattr__(name):
+    if name in ALGORITHMS:
+        # the class is taken from its module, not from attribute of this package
+        globals()[name] = getattr(importlib.import_module('.' + name, __name__), name)
+        return globals()[name]
+    
+    raise AttributeError('module %r has no attribute %r' % (__name__, name))
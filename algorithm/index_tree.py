@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+
+__all__ = ['IndexTree']
+
+class IndexTree:
+    """ This class is tournament tree over index values of arms, which keeps the arm of the maximum value at its root.
+    Leaves are the arms padded to a power of two, and each internal node holds the winner of its two children,
+    so changing value of one arm replays only log2(arms) matches on its path to the root, and `build` replays all of them level by level.
+    
+    Ties are broken by random priority of each arm drawn once from `rng`, instead of being redrawn every round as in `rand_argmax`.
+    """
+    def __init__(self, arms, rng):
+        self.arms = arms
+        self.size = 1 << max(self.arms - 1, 0).bit_length()
+        
+        # padded leaves have -inf value and the lowest priority, so they never win
+        priority = np.full(self.size, -1.0)
+        priority[:self.arms] = rng.random(self.arms)
+        self.priority = priority.tolist()
+        self.build(np.full(self.arms, -np.inf))
+    
+    def build(self, values):
+        """ Set values of all arms at once. Levels are built with array operations, then kept as lists,
+        as indexing list is much faster than indexing array in scalar updates.
+        """
+        value = np.full(2 * self.size, -np.inf)
+        winner = np.zeros(2 * self.size, dtype=int)
+        value[self.size:self.size + self.arms] = values
+        winner[self.size:] = np.arange(self.size)
+        priority = np.asarray(self.priority)
+        
+        lo = self.size
+        while lo > 1:
+            vl, vr = value[lo:2 * lo:2], value[lo + 1:2 * lo:2]
+            wl, wr = winner[lo:2 * lo:2], winner[lo + 1:2 * lo:2]
+            left = (vl > vr) | ((vl == vr) & (priority[wl] > priority[wr]))
+            value[lo // 2:lo] = np.where(left, vl, vr)
+            winner[lo // 2:lo] = np.where(left, wl, wr)
+            lo //= 2
+        
+        self.value, self.winner = value.tolist(), winner.tolist()
+    
+    def update(self, arm, value):
+        value_, winner, priority = self.value, self.winner, self.priority
+        pos = self.size + int(arm)
+        value_[pos] = float(value)
+        while pos > 1:
+            pos >>= 1
+            l, r = 2 * pos, 2 * pos + 1
+            if value_[l] > value_[r] or (value_[l] == value_[r] and priority[winner[l]] > priority[winner[r]]):
+                value_[pos], winner[pos] = value_[l], winner[l]
+            else:
+                value_[pos], winner[pos] = value_[r], winner[r]
+    
+    def argmax(self):
+        return self.winner[1]
@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+import math
+import numpy as np
+
+__all__ = ['KLIndex']
+
+class KLIndex:
+    """ This class is batched solver of the KL-UCB upper confidence index for Bernoulli rewards.
+    For every arm it finds the largest q in [mean, 1] such that n * kl(mean, q) <= bound, all arms at once.
+    
+    Newton iterations start from an upper bound of the root or from the root of the previous round,
+    arms which did not converge within `maxiter` are solved again with bisection.
+    Indices of arms whose count, mean and bound did not change since the last call are reused as they are.
+    As log(t) bound moves every round, the cache hits only if the caller keeps the bound between refreshes, see `KL_UCB`.
+    """
+    # up to this many stale arms are solved one by one, as array operations on a few arms cost more than their arithmetic
+    SCALAR_ARMS = 8
+    
+    def __init__(self, arms, tol=1e-6, maxiter=10, epsilon=1e-12):
+        self.arms = arms
+        self.tol, self.maxiter, self.epsilon = tol, maxiter, epsilon
+        
+        self.cache = {'n': np.full(self.arms, np.nan),
+                      'mean': np.full(self.arms, np.nan),
+                      'bound': np.nan,
+                      'index': np.full(self.arms, np.nan)}
+    
+    # This Bernoulli Kullback-Leibler divergence formulation is from the paper
+    def _kl(self, P, Q):
+        return P * np.log(P / Q) + (1 - P) * np.log((1 - P) / (1 - Q))
+    
+    def _newton(self, p, d, q):
+        """ Newton iterations on f(q) = kl(p, q) - d, which is convex and increasing in q over [p, 1).
+        Returns the solution and mask of arms which reached the tolerance.
+        """
+        hi = 1 - self.epsilon
+        converged = np.zeros(len(p), dtype=bool)
+        active = np.arange(len(p))
+        for i in range(self.maxiter):
+            pa, da, qa = p[active], d[active], q[active]
+            
+            f = self._kl(pa, qa) - da
+            df = (qa - pa) / (qa * (1 - qa))
+            with np.errstate(divide='ignore', invalid='ignore'):
+                q_next = np.clip(qa - f / df, pa, hi)
+            
+            # the step size is not reliable near 1 where f is very steep, so check the residual instead
+            done = np.abs(f) <= self.tol
+            q[active] = q_next
+            converged[active[done]] = True
+            
+            active = active[~done & np.isfinite(q_next)]
+            if not len(active):
+                break
+            
+        return q, converged & np.isfinite(q)
+    
+    def _bisection(self, p, d):
+        lo, hi = p.copy(), np.full(len(p), 1 - self.epsilon)
+        for i in range(int(np.ceil(np.log2(1 / self.tol)))):
+            mid = (lo + hi) / 2
+            over = self._kl(p, mid) > d
+            hi = np.where(over, mid, hi)
+            lo = np.where(over, lo, mid)
+            
+        return lo
+    
+    def _solve(self, n, mean, bound, q0):
+        p = np.clip(mean, self.epsilon, 1 - self.epsilon)
+        d = np.maximum(bound, 0) / n
+        index = p.copy()
+        
+        # arms which are allowed to reach 1 without exceeding the bound
+        top = self._kl(p, np.full(len(p), 1 - self.epsilon)) <= d
+        index[top] = 1
+        
+        rest = np.flatnonzero(~top & (d > 0))
+        if len(rest):
+            p, d, q0 = p[rest], d[rest], q0[rest]
+            # both Pinsker inequality and dropping the p * log(1 / q) term give upper bounds of the root
+            upper = np.minimum(p + np.sqrt(d / 2), 1 - (1 - p) * np.exp(-(d - p * np.log(p)) / (1 - p)))
+            q0 = np.where(np.isnan(q0), upper, q0)
+            q0 = np.clip(q0, p + self.epsilon, 1 - self.epsilon)
+            
+            q, converged = self._newton(p, d, q0)
+            if not converged.all():
+                q[~converged] = self._bisection(p[~converged], d[~converged])
+            index[rest] = q
+            
+        return index
+    
+    def _solve_one(self, n, mean, bound, q0):
+        """ Same as `_solve` for one arm with python floats.
+        """
+        def kl(p, q):
+            return p * math.log(p / q) + (1 - p) * math.log((1 - p) / (1 - q))
+        
+        p = min(max(mean, self.epsilon), 1 - self.epsilon)
+        d = max(bound, 0) / n
+        hi = 1 - self.epsilon
+        if kl(p, hi) <= d:
+            return 1.
+        if d <= 0:
+            return p
+        
+        if math.isnan(q0):
+            q0 = min(p + math.sqrt(d / 2), 1 - (1 - p) * math.exp(-(d - p * math.log(p)) / (1 - p)))
+        q = min(max(q0, p + self.epsilon), hi)
+        for i in range(self.maxiter):
+            f = kl(p, q) - d
+            df = (q - p) / (q * (1 - q))
+            if df == 0:
+                break
+            q_next = min(max(q - f / df, p), hi)
+            if abs(f) <= self.tol:
+                return q_next
+            if not math.isfinite(q_next):
+                break
+            q = q_next
+        
+        lo = p
+        for i in range(int(np.ceil(np.log2(1 / self.tol)))):
+            mid = (lo + hi) / 2
+            if kl(p, mid) > d:
+                hi = mid
+            else:
+                lo = mid
+        
+        return lo
+    
+    def solve(self, n, mean, bound):
+        """ Returns upper confidence index of the given arms only, without the cache.
+        """
+        return self._solve(n, mean, bound, np.full(len(n), np.nan))
+    
+    def __call__(self, n, mean, bound):
+        """ Returns upper confidence index of every arm.
+        Arms with unchanged (n, mean) are warm started from their cached index when only the bound moved.
+        """
+        cache = self.cache
+        same = (cache['n'] == n) & (cache['mean'] == mean)
+        if bound == cache['bound']:
+            stale = np.flatnonzero(~same)
+        else:
+            stale = np.arange(self.arms)
+            
+        if len(stale) <= self.SCALAR_ARMS:
+            for a in stale:
+                cache['index'][a] = self._solve_one(float(n[a]), float(mean[a]), bound, cache['index'][a] if same[a] else np.nan)
+        else:
+            q0 = np.where(same, cache['index'], np.nan)[stale]
+            cache['index'][stale] = self._solve(n[stale], mean[stale], bound, q0)
+            
+        cache['n'][:] = n
+        cache['mean'][:] = mean
+        cache['bound'] = bound
+        
+        return cache['index'].copy()
@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+
+__all__ = ['init_window', 'push_window', 'init_discount', 'push_discount', 'get_discounted', 'init_cusum', 'push_cusum', 'reset_cusum']
+
+# scaled sums of discounted state are renormalized when scale falls below this, once in log(RESCALE) / log(gamma) rounds
+RESCALE = 1e-100
+
+def init_window(arms, window):
+    """ Returns state of sliding window over the last `window` feedback, which is ring buffer of (arm, reward)
+    with count and total reward of each arm in the window.
+    """
+    return {'count': np.zeros(arms),
+            'total': np.zeros(arms),
+            'window_arm': np.full(window, -1),
+            'window_reward': np.zeros(window),
+            'pos': 0}
+
+def push_window(param, arm, reward):
+    """ Append feedback to the window in O(1), the oldest one falling out of the window is subtracted from its arm.
+    """
+    pos = int(param['pos'])
+    old = param['window_arm'][pos]
+    if old >= 0:
+        param['count'][old] -= 1
+        param['total'][old] -= param['window_reward'][pos]
+    
+    param['window_arm'][pos] = arm
+    param['window_reward'][pos] = reward
+    param['count'][arm] += 1
+    param['total'][arm] += reward
+    param['pos'] = (pos + 1) % len(param['window_arm'])
+
+def init_discount(arms):
+    """ Returns state of discounted count and total reward of each arm, see `push_discount`.
+    """
+    return {'count': np.zeros(arms),
+            'total': np.zeros(arms),
+            'scale': 1.0}
+
+def push_discount(param, arm, reward, gamma):
+    """ Discount count and total of all arms by gamma and add feedback to the arm, in O(1).
+    Sums are kept divided by `scale`, which is gamma to the number of rounds, so that discounting all arms is
+    one multiplication of scale, and they are scaled back by `get_discounted` only when read.
+    """
+    if param['scale'] < RESCALE:
+        param['count'] *= param['scale']
+        param['total'] *= param['scale']
+        param['scale'] = 1.0
+    
+    param['scale'] *= gamma
+    param['count'][arm] += 1 / param['scale']
+    param['total'][arm] += reward / param['scale']
+
+def get_discounted(param):
+    """ Returns discounted count and total reward of each arm.
+    """
+    return param['count'] * param['scale'], param['total'] * param['scale']
+
+def init_cusum(arms):
+    """ Returns state of two-sided CUSUM change detector of each arm, see `push_cusum`.
+    """
+    return {'cd_n': np.zeros(arms),
+            'cd_mean': np.zeros(arms),
+            'g_pos': np.zeros(arms),
+            'g_neg': np.zeros(arms)}
+
+def push_cusum(param, arm, reward, warmup, epsilon, threshold):
+    """ Feed reward of the arm to its detector in O(1), and returns True if change of its mean is detected.
+    Mean before change is estimated from the first `warmup` rewards since restart, and drift from it larger than `epsilon`
+    is accumulated upward in `g_pos` and downward in `g_neg`. Change is detected when either exceeds `threshold`.
+    """
+    param['cd_n'][arm] += 1
+    n = param['cd_n'][arm]
+    if n <= warmup:
+        param['cd_mean'][arm] += (reward - param['cd_mean'][arm]) / n
+        return False
+    
+    param['g_pos'][arm] = max(0, param['g_pos'][arm] + reward - param['cd_mean'][arm] - epsilon)
+    param['g_neg'][arm] = max(0, param['g_neg'][arm] + param['cd_mean'][arm] - reward - epsilon)
+    
+    return max(param['g_pos'][arm], param['g_neg'][arm]) > threshold
+
+def reset_cusum(param, arms=slice(None)):
+    """ Restart detectors of the arms, all arms by default.
+    """
+    for key in ('cd_n', 'cd_mean', 'g_pos', 'g_neg'):
+        param[key][arms] = 0
@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+import importlib
+import collections.abc
+
+__all__ = ['AlgoRegistry', 'ALGO_MAP']
+
+class AlgoRegistry(collections.abc.Mapping):
+    """ This class is registry of MAB algorithms, which maps name of algorithm in config to its class.
+    Algorithm is registered by 'module:Class' path and its module is imported only when it is looked up first,
+    so that a run imports only the algorithms it uses.
+    
+    Algorithms of other installed packages are registered by entry points of `ENTRY_POINT_GROUP`, e.g. in their pyproject.toml
+    
+        [project.entry-points."mab_experiment.algorithms"]
+        my_ucb = "my_package.my_ucb:MyUCB"
+    
+    which are read on first use and come after algorithms registered here, in order of their names.
+    Order matters, as random stream of each algorithm is spawned for its position (see `MABexp._get_seed`).
+    """
+    ENTRY_POINT_GROUP = 'mab_experiment.algorithms'
+    
+    def __init__(self, paths=()):
+        self.paths = dict(paths)
+        self.classes = {}
+        self.entry_points = False
+    
+    def register(self, name, target):
+        """ Register class, or 'module:Class' path to be imported lazily, under the name.
+        """
+        if isinstance(target, str):
+            self.paths[name] = target
+            self.classes.pop(name, None)
+        else:
+            self.paths[name] = '%s:%s' % (target.__module__, target.__qualname__)
+            self.classes[name] = target
+    
+    def _get_paths(self):
+        if not self.entry_points:
+            # importlib.metadata is slow to import and scans installed packages, so it is done only when other names are asked for
+            from importlib import metadata
+            self.entry_points = True
+            for entry_point in sorted(metadata.entry_points(group=self.ENTRY_POINT_GROUP), key=lambda ep: ep.name):
+                self.paths.setdefault(entry_point.name, entry_point.value)
+        
+        return self.paths
+    
+    def _get_path(self, name):
+        return self.paths[name] if name in self.paths else self._get_paths()[name]
+    
+    def position(self, name):
+        """ Returns position of the name in this registry, without reading entry points if it is registered here.
+        """
+        paths = self.paths if name in self.paths else self._get_paths()
+        return list(paths).index(name)
+    
+    def __getitem__(self, name):
+        if name not in self.classes:
+            module, _, qualname = self._get_path(name).partition(':')
+            target = importlib.import_module(module)
+            for attr in qualname.split('.'):
+                target = getattr(target, attr)
+            self.classes[name] = target
+        
+        return self.classes[name]
+    
+    def __iter__(self):
+        return iter(self._get_paths())
+    
+    def __len__(self):
+        return len(self._get_paths())
+
+# If you implement some MAB algorithms, put them here
+ALGO_MAP = AlgoRegistry((name, '%s.%s:%s' % (__package__, cls, cls)) for name, cls in [('egreedy', 'Egreedy'),
+                                                                                       ('ucb', 'UCB'),
+                                                                                       ('kl_ucb', 'KL_UCB'),
+                                                                                       ('thompson', 'ThompsonSampling'),
+                                                                                       ('linucb', 'LinUCB'),
+                                                                                       ('hybrid_linucb', 'HybridLinUCB'),
+                                                                                       ('context_thompson', 'Context_ThompsonSampling'),
+                                                                                       ('sw_ucb', 'SW_UCB'),
+                                                                                       ('d_ucb', 'D_UCB'),
+                                                                                       ('cd_ucb', 'CD_UCB'),
+                                                                                       ('sw_thompson', 'SW_ThompsonSampling'),
+                                                                                       ('d_thompson', 'D_ThompsonSampling'),
+                                                                                       ('cd_thompson', 'CD_ThompsonSampling')])
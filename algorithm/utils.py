@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+import json
+import numpy as np
+
+__all__ = ['rand_argmax', 'get_index', 'get_batch_stats', 'StateMixin']
+
+def rand_argmax(values, rng):
+    """ Return the index of the maximum value, breaking ties uniformly at random with `rng` Generator.
+    Equivalent to scanning arms with `random.choice` on ties, but done in one vectorized pass.
+    For (replicas, arms) shaped values, returns (replicas,) array of indices along the last axis.
+    """
+    if values.ndim > 1:
+        best = values == values.max(axis=-1, keepdims=True)
+        return np.argmax(np.where(best, rng.random(values.shape), -1), axis=-1)
+    
+    best = np.flatnonzero(values == values.max())
+    if len(best) == 1:
+        return int(best[0])
+    
+    return int(best[rng.integers(len(best))])
+
+def get_index(arm, rows):
+    """ Return index of the selected arm into (arms,) state array, or into (replicas, arms) state array if rows is arange(replicas).
+    """
+    return arm if rows is None else (rows, arm)
+
+def get_batch_stats(arms, rewards, size):
+    """ Return number of pulls and sum of rewards of each arm in a batch of (arm, reward) feedback.
+    """
+    arms = np.asarray(arms)
+    count = np.bincount(arms, minlength=size)
+    total = np.bincount(arms, weights=np.asarray(rewards, dtype=float), minlength=size)
+    
+    return count, total
+
+class StateMixin:
+    """ Mixin of checkpoint methods of policy, whose whole learned state is the attributes listed in its `STATE`.
+    """
+    STATE = ()
+    
+    def get_state(self):
+        """ Return flat dict of arrays of the state. Entries of `param` dict are stored as 'param.<key>', and state of `rng` Generator as json string.
+        """
+        state = {}
+        for name in self.STATE:
+            if name == 'rng':
+                state[name] = np.array(json.dumps(self.rng.bit_generator.state))
+            elif name == 'param':
+                state.update({'param.%s' % k: np.asarray(v) for k, v in self.param.items()})
+            else:
+                state[name] = np.asarray(getattr(self, name))
+                
+        return state
+    
+    def set_state(self, state):
+        """ Restore state made by `get_state`. Arrays are used as they are, so memory-mapped arrays are paged in lazily.
+        """
+        for key, value in state.items():
+            value = value[()] if value.ndim == 0 else value
+            if key == 'rng':
+                self.rng.bit_generator.state = json.loads(str(value))
+            elif key.startswith('param.'):
+                self.param[key[len('param.'):]] = value
+            else:
+                setattr(self, key, value)
@@ -0,0 +1,291 @@
+# -*- coding: utf-8 -*-
+import os
+os.environ['OMP_NUM_THREADS'] = '1'
+import sys
+import csv
+import json
+import time
+import pickle
+import shutil
+import inspect
+import logging
+import platform
+import argparse
+import datetime
+import resource
+import itertools
+import tempfile
+import multiprocessing
+import numpy as np
+
+from tools import *
+from mab_experiment import MABexp
+
+class MABbench:
+    """ This class is reproducible benchmark suite of MAB algorithms over a grid of arms, context dimension and rounds.
+    For every `ALGO_MAP` entry in config, measures rounds/sec of the whole simulation, per-call latency of select_arm and update_parameter,
+    peak RSS, and final regret. Generation of each dataset by `DataMaker` is measured as `data_maker` record too.
+    If `fast` is set in config, algorithms supported by `FastSimulator` are run once more by it, to compare its throughput and regret with the per-round loop.
+    
+    Every measurement runs in a fresh worker process, so that peak RSS of one cell is not inherited by the next one.
+    Results are written to `benchmark.json` and `benchmark.csv`, and two result files can be compared by `MABbench.compare`.
+    Any benchmark setting can be controlled by `./config/mab_benchmark.json` file.
+    """
+    FIELDS = ['algo', 'arms', 'context_dim', 'rounds', 'status', 'elapsed_s', 'rounds_per_s',
+              'select_mean_us', 'select_p50_us', 'select_p99_us', 'update_mean_us', 'update_p50_us', 'update_p99_us',
+              'peak_rss_mb', 'rss_delta_mb', 'final_regret', 'fast_rounds_per_s', 'fast_speedup', 'fast_final_regret']
+    # metric: True if higher is better
+    COMPARE = {'rounds_per_s': True, 'select_mean_us': False, 'update_mean_us': False, 'peak_rss_mb': False, 'final_regret': False, 'fast_rounds_per_s': True}
+    
+    def __init__(self, conf_fname, output=None):
+        self.opt = ConfLoader(conf_fname).opt
+        
+        self.fpath = output or os.path.join('./results/benchmark', self.opt.name)
+        if not os.path.isdir(self.fpath):
+            os.makedirs(self.fpath)
+        self._logging(os.path.join(self.fpath, 'mab_benchmark.log'))
+    
+    def _logging(self, fpath):
+        if os.path.isfile(fpath):
+            os.remove(fpath)
+        
+        self.logger = logging.getLogger('MAB_benchmark')
+        self.logger.setLevel(logging.DEBUG)
+        if not self.logger.handlers:
+            handler = logging.FileHandler(fpath)
+            handler.setLevel(logging.DEBUG)
+            formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+            handler.setFormatter(formatter)
+            self.logger.addHandler(handler)
+    
+    @staticmethod
+    def _is_contextual(algo_name):
+        return 'context' in inspect.signature(MABexp.ALGO_MAP[algo_name]).parameters
+    
+    def _get_cells(self):
+        """ Returns list of (arms, rounds) datasets, each with list of (algo_name, context_dim) cells run on it.
+        Non-contextual algorithms do not depend on context dimension, so they are run once per dataset.
+        Cells exceeding `limits` of config are kept as skipped records.
+        """
+        grid = self.opt.grid
+        limits = self.opt.get('limits', {})
+        max_work = limits.get('arm_rounds', float('inf'))
+        max_state = limits.get('state', float('inf'))
+        
+        datasets, skipped = [], []
+        for arms, rounds in itertools.product(grid['arms'], grid['rounds']):
+            cells = []
+            for algo_name in self.opt.algo:
+                dims = grid['context_dim'] if self._is_contextual(algo_name) else [None]
+                for dim in dims:
+                    if arms * rounds > max_work or (dim is not None and arms * dim * dim > max_state):
+                        skipped.append(self._get_record(algo_name, arms, dim, rounds, status='skipped'))
+                    else:
+                        cells.append((algo_name, dim))
+            if cells:
+                datasets.append((arms, rounds, cells))
+        
+        return datasets, skipped
+    
+    @classmethod
+    def _get_record(cls, algo_name, arms, dim, rounds, **values):
+        record = dict.fromkeys(cls.FIELDS)
+        record.update({'algo': algo_name, 'arms': arms, 'context_dim': dim, 'rounds': rounds})
+        record.update(values)
+        
+        return record
+    
+    def _get_meta(self):
+        return {'name': self.opt.name,
+                'date': datetime.datetime.now().isoformat(),
+                'python': platform.python_version(),
+                'numpy': np.__version__,
+                'platform': platform.platform(),
+                'processor': platform.processor(),
+                'seed': self.opt.get('seed', 0)}
+    
+    def _save(self, meta, records):
+        with open(os.path.join(self.fpath, 'benchmark.json'), 'w') as f:
+            json.dump({'meta': meta, 'results': records}, f, indent=4)
+        
+        with open(os.path.join(self.fpath, 'benchmark.csv'), 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=self.FIELDS)
+            writer.writeheader()
+            writer.writerows(records)
+    
+    def _log_record(self, record):
+        if record['status'] != 'ok':
+            self.logger.info('%-18s arms %6d dim %4s rounds %8d: %s' % (record['algo'], record['arms'], record['context_dim'], record['rounds'], record['status']))
+            return
+        self.logger.info('%-18s arms %6d dim %4s rounds %8d: %12.1f rounds/s, peak rss %8.1f MiB, final regret %s'
+                         % (record['algo'], record['arms'], record['context_dim'], record['rounds'], record['rounds_per_s'], record['peak_rss_mb'], record['final_regret']))
+        if record.get('fast_rounds_per_s') is not None:
+            self.logger.info('%-18s %43s %12.1f rounds/s (x%.1f), final regret %s' % ('', 'fast path:', record['fast_rounds_per_s'], record['fast_speedup'], record['fast_final_regret']))
+    
+    def run(self):
+        _begin = datetime.datetime.now()
+        
+        meta = self._get_meta()
+        datasets, records = self._get_cells()
+        for record in records:
+            self._log_record(record)
+        
+        param = self.opt.data.param
+        seed = self.opt.get('seed', 0)
+        chunk_rounds = self.opt.data.get('chunk_rounds', MABexp.CHUNK_ROUNDS)
+        latency_rounds = self.opt.get('latency_rounds', 1000)
+        fast = self.opt.get('fast', False)
+        # every task runs in a fresh process to measure its own peak RSS
+        with multiprocessing.Pool(self.opt.get('workers', 1), maxtasksperchild=1) as pool:
+            for arms, rounds, cells in datasets:
+                data_dir = tempfile.mkdtemp(prefix='mab_benchmark-')
+                try:
+                    record = pool.apply(_bench_data, (data_dir, dict(param, arms=arms, rounds=rounds), seed))
+                    self._log_record(record)
+                    records.append(record)
+                    
+                    results = [pool.apply_async(_bench_algo, (data_dir, algo_name, self.opt.algo[algo_name], dim, seed, chunk_rounds, latency_rounds, fast))
+                               for algo_name, dim in cells]
+                    for result in results:
+                        record = result.get()
+                        self._log_record(record)
+                        records.append(record)
+                finally:
+                    shutil.rmtree(data_dir)
+                
+                self._save(meta, records)
+        self._save(meta, records)
+        
+        _end = datetime.datetime.now()
+        
+        self.logger.info('results are stored to %s' % self.fpath)
+        self.logger.info('(%s) elapsed for mab_benchmark.py' % (str(_end - _begin)))
+        self.logger.info('=' * 54)
+    
+    @classmethod
+    def compare(cls, base_fname, new_fname, threshold=0.1):
+        """ Compare two result files cell by cell, and print relative change of each metric.
+        Returns list of (cell, metric, base, new) which got worse by more than `threshold` ratio.
+        """
+        def load(fname):
+            with open(fname, 'r') as f:
+                results = json.load(f)['results']
+            
+            return {(r['algo'], r['arms'], r['context_dim'], r['rounds']): r for r in results if r['status'] == 'ok'}
+        
+        base, new = load(base_fname), load(new_fname)
+        regressions = []
+        print('%-44s %-16s %14s %14s %9s' % ('algo/arms/dim/rounds', 'metric', 'base', 'new', 'change'))
+        for key in sorted(base.keys() & new.keys(), key=str):
+            for metric, higher_is_better in cls.COMPARE.items():
+                b, n = base[key].get(metric), new[key].get(metric)
+                if b is None or n is None:
+                    continue
+                change = (n - b) / b if b else 0.
+                worse = -change if higher_is_better else change
+                flag = ' <- regression' if worse > threshold else ''
+                print('%-44s %-16s %14.3f %14.3f %+8.1f%%%s' % ('/'.join(map(str, key)), metric, b, n, change * 100, flag))
+                if flag:
+                    regressions.append((key, metric, b, n))
+        
+        for key in sorted(base.keys() ^ new.keys(), key=str):
+            print('%-44s only in %s' % ('/'.join(map(str, key)), base_fname if key in base else new_fname))
+        print('%d regressions over %.0f%% threshold' % (len(regressions), threshold * 100))
+        
+        return regressions
+
+def _get_peak_rss():
+    """ Peak resident set size of this process in MiB.
+    """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS, and in kilobytes elsewhere
+    return peak / 2 ** 20 if sys.platform == 'darwin' else peak / 2 ** 10
+
+def _bench_data(data_dir, param, seed):
+    """ Worker of `MABbench.run`. Make dataset in `data_dir` and returns its `data_maker` record.
+    """
+    _rss = _get_peak_rss()
+    
+    opt = ConfLoader.DictWithAttributeAccess
+    data_maker = DataMaker(opt({'name': 'benchmark', 'data': opt({'param': opt(param, contextual=False, seed=seed)})}))
+    data_maker.dir, data_maker.sub_dir = data_dir, ''
+    data_maker.logger = logging.getLogger('MAB_benchmark')
+    
+    _begin = time.perf_counter()
+    data_maker._get_rng(data_maker.opt.data.param)
+    data_maker._get_arms_reward(data_maker.opt.data.param)
+    data_maker._make_data(data_maker.opt.data.param)
+    data_maker._store_data_info(data_maker.opt.data.param)
+    elapsed = time.perf_counter() - _begin
+    
+    peak = _get_peak_rss()
+    
+    return MABbench._get_record('data_maker', param['arms'], None, param['rounds'], status='ok', elapsed_s=elapsed, rounds_per_s=param['rounds'] / elapsed,
+                                peak_rss_mb=peak, rss_delta_mb=peak - _rss)
+
+def _bench_algo(data_dir, algo_name, param, dim, seed, chunk_rounds, latency_rounds, fast=False):
+    """ Worker of `MABbench.run`. Returns record of the algorithm on dataset in `data_dir`, with `dim` dimensional random contexts for contextual algorithm.
+    Throughput and regret are measured on uninstrumented loop over the whole dataset, and per-call latency on separate instrumented run of the first `latency_rounds` rounds.
+    If `fast` is set and `FastSimulator` supports the algorithm, the whole dataset is run by it too, after a short warm-up run which compiles its kernel.
+    """
+    _rss = _get_peak_rss()
+    with open(os.path.join(data_dir, 'info.pickle'), 'rb') as f:
+        data_info = pickle.load(f)
+    data = RewardData.load(data_dir, data_info['arms'])
+    if dim is not None:
+        rng = np.random.default_rng(seed)
+        data_info.update(arms_context=dict(enumerate(rng.random((data_info['arms'], dim)))), arms_context_dim=dim)
+    
+    try:
+        algo = MABexp._get_algo(algo_name, param, data_info, MABexp._get_seed(algo_name, seed))
+        plotter = Plotter(data, data_info, 1)
+        
+        _begin = time.perf_counter()
+        MABexp._simulate(algo, algo_name, data, plotter, chunk_rounds)
+        elapsed = time.perf_counter() - _begin
+        
+        algo = MABexp._get_algo(algo_name, param, data_info, MABexp._get_seed(algo_name, seed))
+        profiler = Profiler()
+        MABexp._run_chunk_profiled(algo, data[:min(latency_rounds, len(data))], algo_name, profiler)
+        
+        fast_values = {}
+        simulator = MABexp._get_fast(fast)
+        if simulator is not None and simulator.supports(algo):
+            simulator.run_chunk(MABexp._get_algo(algo_name, param, data_info, MABexp._get_seed(algo_name, seed)), data[:min(latency_rounds, len(data))])
+            
+            algo = MABexp._get_algo(algo_name, param, data_info, MABexp._get_seed(algo_name, seed))
+            fast_plotter = Plotter(data, data_info, 1)
+            _begin = time.perf_counter()
+            MABexp._simulate(algo, algo_name, data, fast_plotter, chunk_rounds, fast=simulator)
+            fast_elapsed = time.perf_counter() - _begin
+            fast_values = {'fast_rounds_per_s': data_info['rounds'] / fast_elapsed, 'fast_speedup': elapsed / fast_elapsed,
+                           'fast_final_regret': float(fast_plotter.algo_regret[algo_name][-1])}
+    
+    except MemoryError:
+        return MABbench._get_record(algo_name, data_info['arms'], dim, data_info['rounds'], status='out of memory')
+    
+    peak = _get_peak_rss()
+    latency = profiler.summary()
+    select, update = latency['%s/select_arm' % algo_name], latency['%s/update_parameter' % algo_name]
+    
+    return MABbench._get_record(algo_name, data_info['arms'], dim, data_info['rounds'], status='ok', elapsed_s=elapsed, rounds_per_s=data_info['rounds'] / elapsed,
+                                select_mean_us=select['mean_us'], select_p50_us=select['p50_us'], select_p99_us=select['p99_us'],
+                                update_mean_us=update['mean_us'], update_p50_us=update['p50_us'], update_p99_us=update['p99_us'],
+                                peak_rss_mb=peak, rss_delta_mb=peak - _rss, final_regret=float(plotter.algo_regret[algo_name][-1]), **fast_values)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('conf_fname', nargs='?', help='benchmark config, see ./config/mab_benchmark.json')
+    parser.add_argument('--output', help='directory of result files, ./results/benchmark/<name> by default')
+    parser.add_argument('--compare', nargs=2, metavar=('BASE', 'NEW'), help='compare two benchmark.json files instead of running benchmark')
+    parser.add_argument('--threshold', type=float, default=0.1, help='relative change counted as regression in compare mode')
+    args = parser.parse_args()
+    
+    if args.compare:
+        regressions = MABbench.compare(*args.compare, args.threshold)
+        sys.exit(1 if regressions else 0)
+    
+    if args.conf_fname is None:
+        parser.error('conf_fname is required unless --compare is given')
+    mab_bench = MABbench(args.conf_fname, args.output)
+    mab_bench.run()
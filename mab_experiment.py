@@ -1,30 +1,47 @@
 # -*- coding: utf-8 -*-
 import os
 os.environ['OMP_NUM_THREADS'] = '1'
+import csv
 import sys
+import glob
+import json
+import time
+import hashlib
 import pickle
+import pstats
+import inspect
 import logging
+import cProfile
+import argparse
 import datetime
+import tracemalloc
+import collections
+import numpy as np
 
-from tqdm import tqdm
+from concurrent.futures import ProcessPoolExecutor
 from tools import *
-from algorithm import *
+from algorithm import ALGO_MAP
 
 class MABexp:
     """ This class is for doing experiment of MAB algorithm on some synthetic reward dataset.
     Can create reward data using `DataMaker` class, get regret info of various MAB algorithm, and plot them.
     Any experiment setting can be controlled by `./config/mab_experiment.json` file.
     """
-    # If you implement some MAB algorithms, put them here
-    ALGO_MAP = {'egreedy': Egreedy,
-                'ucb': UCB,
-                'kl_ucb': KL_UCB,
-                'thompson': ThompsonSampling,
-                'linucb': LinUCB,
-                'context_thompson': Context_ThompsonSampling}
-    
-    def __init__(self, conf_fname):
-        self.opt = ConfLoader(conf_fname).opt
+    # MAB algorithms are registered in `algorithm/registry.py` or by entry points of other packages, and imported on first use
+    ALGO_MAP = ALGO_MAP
+    # number of rounds read from dataset at once, can be set by `chunk_rounds` in data config
+    CHUNK_ROUNDS = 1 << 16
+    
+    def __init__(self, conf_fname, profile=False):
+        # config is checked and compiled first, so mistakes are raised as `ConfigError` before any data is generated
+        loader = ConfLoader(conf_fname)
+        self.opt = loader.opt
+        self.plan = loader.get_plan(self.ALGO_MAP)
+        self.profile = profile
+        # phase timers are enabled by `--profile` or `instrument` in config, otherwise uninstrumented loop is used
+        self.profiler = Profiler() if profile or self.opt.get('instrument', False) else None
+        # `fast` is true or backend name of `FastSimulator`, which replaces the per-round loop of supported algorithms
+        self.fast = self._get_fast(self.opt.get('fast', False))
         self.data_maker = DataMaker(self.opt)
         
         self.fpath = os.path.join('./results', self.data_maker.sub_dir, self.opt.name)
@@ -35,7 +52,7 @@ class MABexp:
     def _logging(self, fpath):
         if os.path.isfile(fpath):
             os.remove(fpath)
-
+        
         self.logger = logging.getLogger('MAB_experiment')
         self.logger.setLevel(logging.DEBUG)
         if not self.logger.handlers:
@@ -46,16 +63,18 @@ class MABexp:
             self.logger.addHandler(handler)
         
     def _load_data(self):
-        """ Try to load reward dataset and its information pickle file.
+        """ Try to load memory-mapped reward dataset and its information pickle file.
         If except statement works, program will be shutdown and you should set `enabled=True` in json file.
         """
         try:
-            with open(os.path.join(self.data_maker.dir, self.data_maker.sub_dir, 'data.pickle'), 'rb') as f:
-                self.data = pickle.load(f)
-
-            with open(os.path.join(self.data_maker.dir, self.data_maker.sub_dir, 'info.pickle'), 'rb') as f:
+            fpath = os.path.join(self.data_maker.dir, self.data_maker.sub_dir)
+            with open(os.path.join(fpath, 'info.pickle'), 'rb') as f:
                 self.data_info = pickle.load(f)
                 
+            if not RewardData.exists(fpath, self.data_info['rounds'], self.data_info['arms']):
+                raise FileNotFoundError('reward dataset in %s is missing, incomplete or does not match info.pickle, it should be made again' % fpath)
+            self.data = RewardData.load(fpath, self.data_info['arms'])
+                
             self.logger.info('data and information is loaded')
             self.logger.info('=' * 54)
                     
@@ -69,57 +88,457 @@ class MABexp:
             self.logger.info('Data is not found. It should be created first')
             raise
     
-    def _explore_exploit(self, algo_name, param, flag=True):
-        """ This function is for selecting arm, getting real reward from dataset, and updating parameters using that rewards. And plotting the results of regret values.
-        Returns flag to plot regret lowerbound just only once.
+    @classmethod
+    def _get_algo(cls, algo_name, param, data_info, rng=None):
+        """ Returns instance of the algorithm, whose arguments taken from dataset, e.g. arm contexts, are resolved by its `AlgoSpec`.
         """
-        _begin = datetime.datetime.now()
+        return AlgoSpec(algo_name, cls.ALGO_MAP[algo_name]).create(data_info, param, rng)
+    
+    @classmethod
+    def _get_seed(cls, algo_name, seed):
+        """ Returns `SeedSequence` of the algorithm, which is child of `SeedSequence(seed)` spawned for its position in `ALGO_MAP`,
+        so that each algorithm gets independent stream regardless of which algorithms are run with it. Fresh entropy is used if seed is None.
+        """
+        # children do not depend on how many are spawned, so the ones after the algorithm are not
+        position = cls.ALGO_MAP.position(algo_name)
+        return np.random.SeedSequence(seed).spawn(position + 1)[position]
+    
+    def _get_pbar(self, desc):
+        # tqdm is imported here, so that importing this module (e.g. by workers and server) does not import it
+        from tqdm import tqdm
+        return tqdm(total=self.data_info['rounds'], ascii=True, desc=desc)
+    
+    @staticmethod
+    def _get_label(algo_name, seed, param=None):
+        """ Label of the run, with values of `param` if given, e.g. `egreedy(c=6,d=0.2)-seed0`.
+        """
+        if param:
+            algo_name = '%s(%s)' % (algo_name, ','.join('%s=%s' % (k, v) for k, v in param.items()))
         
-        try:
-            algo = self.ALGO_MAP[algo_name](self.data_info['arms'], **param)
-        except:
-            # Contextual algorithm needs context and dim argument
-            algo = self.ALGO_MAP[algo_name](self.data_info['arms'], self.data_info['arms_context'], self.data_info['arms_context_dim'], **param)
-            
+        return algo_name if seed is None else '%s-seed%d' % (algo_name, seed)
+    
+    @staticmethod
+    def _save_checkpoint(checkpoint, algo, label, plotter, round):
+        """ Store policy state including its random generator, and regret accumulated so far at the round.
+        """
+        state = {'algo.%s' % k: v for k, v in algo.get_state().items()}
+        state.update({'plotter.%s' % k: v for k, v in plotter._get_algo_state(label).items()})
+        state['round'] = np.array(round)
+        
+        checkpoint.save(state)
+    
+    @staticmethod
+    def _load_checkpoint(checkpoint, algo, label, plotter):
+        """ Restore state stored by `_save_checkpoint`. Returns the round to resume from.
+        """
+        state = checkpoint.load()
+        algo.set_state({k[len('algo.'):]: v for k, v in state.items() if k.startswith('algo.')})
+        plotter._set_algo_state(label, {k[len('plotter.'):]: v for k, v in state.items() if k.startswith('plotter.')})
         
-        for r in tqdm(range(self.data_info['rounds']), ascii=True, desc='rounds-%s' % algo_name):
+        return int(state['round'])
+    
+    @staticmethod
+    def _run_chunk(algo, rewards):
+        selected = np.zeros(len(rewards), dtype=int)
+        for i in range(len(rewards)):
             selected_arm = algo.select_arm()
-            reward = 1 if selected_arm in self.data[r] else 0
+            reward = int(rewards[i, selected_arm])
             algo.update_parameter(selected_arm, reward)
+            selected[i] = selected_arm
+            
+        return selected
+    
+    @staticmethod
+    def _run_chunk_context(algo, rewards, contexts):
+        """ Same as `_run_chunk`, but (arms, d) context of each round, which is a view into memory-mapped contexts, is passed to algo.
+        """
+        selected = np.zeros(len(rewards), dtype=int)
+        for i in range(len(rewards)):
+            context = contexts[i]
+            selected_arm = algo.select_arm(context)
+            reward = int(rewards[i, selected_arm])
+            algo.update_parameter(selected_arm, reward, context)
+            selected[i] = selected_arm
             
-            self.plotter._get_algo_regret(r, algo_name, selected_arm)
-            if flag:
-                self.plotter._get_lowerbound(r)
+        return selected
+    
+    @staticmethod
+    def _run_chunk_profiled(algo, rewards, label, profiler, contexts=None):
+        """ Same as `_run_chunk`, but records time of each select_arm, reward lookup and update_parameter call.
+        """
+        clock = time.perf_counter_ns
+        selected = np.zeros(len(rewards), dtype=int)
+        for i in range(len(rewards)):
+            context = () if contexts is None else (contexts[i],)
+            t0 = clock()
+            selected_arm = algo.select_arm(*context)
+            t1 = clock()
+            reward = int(rewards[i, selected_arm])
+            t2 = clock()
+            algo.update_parameter(selected_arm, reward, *context)
+            t3 = clock()
+            selected[i] = selected_arm
+            
+            profiler.record(label, 'select_arm', t1 - t0)
+            profiler.record(label, 'reward_lookup', t2 - t1)
+            profiler.record(label, 'update_parameter', t3 - t2)
+            
+        return selected
+    
+    @staticmethod
+    def _get_fast(fast):
+        return FastSimulator('auto' if fast is True else fast) if fast else None
+    
+    @staticmethod
+    def _has_contexts(algo, data):
+        """ True if dataset has per-round contexts and algo takes them.
+        """
+        return data.contexts is not None and 'context' in inspect.signature(algo.select_arm).parameters
+    
+    @classmethod
+    def _simulate(cls, algo, label, data, plotter, chunk_rounds, pbar=None, checkpoint=None, profiler=None, fast=None):
+        """ Run select arm -> get reward -> update parameter loop of algo over the whole dataset, and accumulate its regret in plotter.
+        If checkpoint is given, the loop resumes from its snapshot and stores new snapshot every `checkpoint.every` rounds.
+        If profiler is given, time of each phase is recorded to it.
+        If `FastSimulator` is given as fast and supports algo, each chunk is run by it instead of the per-round loop, unless profiled.
+        """
+        start = 0
+        if checkpoint is not None and checkpoint.exists():
+            start = cls._load_checkpoint(checkpoint, algo, label, plotter)
+            if pbar is not None:
+                pbar.update(start)
+        
+        # rounds are streamed chunk by chunk, so memory does not depend on the number of rounds
+        has_contexts = cls._has_contexts(algo, data)
+        run_chunk = fast.run_chunk if fast is not None and fast.supports(algo) and not has_contexts else cls._run_chunk
+        _t = time.perf_counter_ns()
+        for begin, rewards, _, _ in data.iter_chunks(chunk_rounds, start):
+            contexts = data.get_contexts(begin, begin + len(rewards)) if has_contexts else None
+            if profiler is None:
+                selected = run_chunk(algo, rewards) if contexts is None else cls._run_chunk_context(algo, rewards, contexts)
+                plotter._get_algo_regret_block(begin, label, selected)
+            else:
+                profiler.record(label, 'data_load', time.perf_counter_ns() - _t)
+                selected = cls._run_chunk_profiled(algo, rewards, label, profiler, contexts)
+                _t = time.perf_counter_ns()
+                plotter._get_algo_regret_block(begin, label, selected)
+                profiler.record(label, 'regret', time.perf_counter_ns() - _t, len(rewards))
+                
+            if checkpoint is not None and checkpoint.due(begin, begin + len(rewards)):
+                cls._save_checkpoint(checkpoint, algo, label, plotter, begin + len(rewards))
+            if pbar is not None:
+                pbar.update(len(rewards))
+            _t = time.perf_counter_ns()
+    
+    @classmethod
+    def _simulate_batch(cls, algo, label, data, plotter, chunk_rounds, size, delay=0, pbar=None, profiler=None):
+        """ Run the loop in batches as in serving, `size` arms are selected by `select_arms` against frozen state of algo,
+        and feedback of each batch is applied in bulk by `update_batch` after `delay` more batches have been served.
+        With per-round contexts, each request of the batch is scored on its own context, which is kept with its feedback.
+        """
+        has_contexts = cls._has_contexts(algo, data)
+        pending = collections.deque()
+        for begin, rewards, _, _ in data.iter_chunks(chunk_rounds):
+            contexts = data.get_contexts(begin, begin + len(rewards)) if has_contexts else None
+            selected = np.zeros(len(rewards), dtype=int)
+            for b in range(0, len(rewards), size):
+                t0 = time.perf_counter_ns()
+                n = min(size, len(rewards) - b)
+                if contexts is None:
+                    arms = algo.select_arms(n)
+                    pending.append((arms, rewards[b + np.arange(n), arms]))
+                else:
+                    arms = algo.select_arms(n, contexts[b:b + n])
+                    pending.append((arms, rewards[b + np.arange(n), arms], contexts[b + np.arange(n), arms]))
+                selected[b:b + n] = arms
+                t1 = time.perf_counter_ns()
+                if len(pending) > delay:
+                    algo.update_batch(*pending.popleft())
                 
-        flag = False
+                if profiler is not None:
+                    profiler.record(label, 'select_arms', t1 - t0)
+                    profiler.record(label, 'update_batch', time.perf_counter_ns() - t1)
+            
+            plotter._get_algo_regret_block(begin, label, selected)
+            if pbar is not None:
+                pbar.update(len(rewards))
+    
+    @classmethod
+    def _run_simulation(cls, algo, label, data, plotter, chunk_rounds, batch=None, pbar=None, checkpoint=None, profiler=None, fast=None):
+        # checkpoint is not supported in batch mode, as feedback of served batches may be still pending
+        if batch:
+            cls._simulate_batch(algo, label, data, plotter, chunk_rounds, batch['size'], batch.get('delay', 0), pbar, profiler)
+        else:
+            cls._simulate(algo, label, data, plotter, chunk_rounds, pbar, checkpoint, profiler, fast)
+    
+    def _get_checkpoint(self, algo_name, param, seed):
+        """ Returns `Checkpoint` of the run if `checkpoint` is set in config, checkpoint is removed first if `resume` is false.
+        Path has hash of the run settings and dataset next to its label, so that changed parameters start new checkpoint instead of resuming the old one.
+        Dataset without data `seed` is made again at every run, so its run is never resumed.
+        """
+        if not self.opt.get('checkpoint'):
+            return None
+        
+        conf = self.opt.checkpoint
+        key = ResultCache.key(algo=algo_name, param=param, seed=seed, chunk_rounds=self.opt.data.get('chunk_rounds', self.CHUNK_ROUNDS), batch=self.opt.get('batch'),
+                              dataset=self._get_dataset_key())
+        checkpoint = Checkpoint(os.path.join(self.fpath, 'checkpoints', '%s-%s' % (self._get_label(algo_name, seed), key[:12])), conf.get('every', 0), conf.get('format', 'npz'))
+        if not conf.get('resume', True) or self.opt.data.param.get('seed') is None:
+            checkpoint.remove()
+            
+        return checkpoint
+    
+    def _explore_exploit(self, algo_name, param, seed=None):
+        """ This function is for selecting arm, getting real reward from dataset, and updating parameters using that rewards. And plotting the results of regret values.
+        """
+        _begin = datetime.datetime.now()
+        
+        label = self._get_label(algo_name, seed)
+        algo = self.plan.algos[algo_name].create(self.data_info, param, self._get_seed(algo_name, seed))
+        
+        pbar = self._get_pbar('rounds-%s' % label)
+        self._run_simulation(algo, label, self.data, self.plotter, self.opt.data.get('chunk_rounds', self.CHUNK_ROUNDS), self.opt.get('batch'), pbar, self._get_checkpoint(algo_name, param, seed), self.profiler, self.fast)
+        pbar.close()
+        
+        _end = datetime.datetime.now()
+        
+        self._log_elapsed(label, _end - _begin)
+    
+    def _log_elapsed(self, label, elapsed):
+        self.logger.info('(%s) elapsed for %s algorithm' % (str(elapsed), label))
+        if self.opt.get('batch'):
+            # throughput of batched serving, to be compared with regret of the same batch setting
+            batch = self.opt.batch
+            self.logger.info('batch size %d, feedback delay %d: %.1f decisions/s, final regret %.2f' % (batch['size'], batch.get('delay', 0), self.data_info['rounds'] / max(elapsed.total_seconds(), 1e-9), self.plotter.algo_regret[label][-1]))
+        self.logger.info('=' * 54)
+    
+    def _explore_exploit_replicas(self, algo_name, param, replicas):
+        """ Simulate `replicas` independent replicas of the algorithm at once using `ReplicaSimulator`.
+        Algorithms which accept `replicas` argument keep (replicas, arms) state, others are run as list of independent instances.
+        """
+        _begin = datetime.datetime.now()
+        
+        # array-backed replicas draw from one stream in bulk, and independent instances get child stream of each replica
+        seed = self._get_seed(algo_name, self.plan.seeds[0])
+        spec = self.plan.algos[algo_name]
+        if spec.replicas:
+            policy = spec.create(self.data_info, dict(param, replicas=replicas), seed)
+        else:
+            policy = [spec.create(self.data_info, param, s) for s in seed.spawn(replicas)]
+        
+        simulator = ReplicaSimulator(self.data, self.plotter, replicas, self.opt.data.get('chunk_rounds', self.CHUNK_ROUNDS))
+        pbar = self._get_pbar('rounds-%s-x%d' % (algo_name, replicas))
+        simulator.run(policy, algo_name, pbar)
+        pbar.close()
         
         _end = datetime.datetime.now()
         
-        self.logger.info('(%s) elapsed for %s algorithm' % (str(_end - _begin), algo_name))
+        self.logger.info('(%s) elapsed for %d replicas of %s algorithm' % (str(_end - _begin), replicas, algo_name))
+        self.logger.info('=' * 54)
+    
+    def _run_parallel(self, jobs):
+        """ Run (algo_name, param, seed) jobs on process pool of `workers` processes.
+        Workers open the memory-mapped dataset by its path instead of receiving a pickled copy,
+        and their regret curves are merged into plotter in the order of jobs.
+        """
+        chunk_rounds = self.opt.data.get('chunk_rounds', self.CHUNK_ROUNDS)
+        points = self.opt.get('plot_points', 1000)
+        with ProcessPoolExecutor(max_workers=self.opt.workers) as executor:
+            futures = [executor.submit(_run_job, self.data.fpath, self.data_info, algo_name, param, seed, chunk_rounds, points, self.opt.get('batch'), self._get_checkpoint(algo_name, param, seed), self.profiler is not None, self.opt.get('fast', False))
+                       for algo_name, param, seed in jobs]
+            
+            for future in futures:
+                label, regret, elapsed, stats = future.result()
+                self.plotter._add_algo_regret(label, regret)
+                if stats is not None:
+                    self.profiler.merge(stats)
+                self._log_elapsed(label, elapsed)
+        
+    def _get_dataset_key(self):
+        """ Hash of dataset information, which includes randomly drawn best arms and contexts, so regenerated dataset gets new key.
+        """
+        with open(os.path.join(self.data_maker.dir, self.data_maker.sub_dir, 'info.pickle'), 'rb') as f:
+            return hashlib.sha256(f.read()).hexdigest()
+    
+    @classmethod
+    def _get_code_key(cls):
+        """ Hash of source files of algorithm package and of simulation, i.e. this module and modules of `RewardData`, `FastSimulator` and `Plotter`
+        which computes regret, so cached results are recomputed when any of them is changed.
+        """
+        fnames = glob.glob(os.path.join(os.path.dirname(inspect.getsourcefile(cls.ALGO_MAP['ucb'])), '*.py'))
+        fnames += [inspect.getsourcefile(c) for c in (cls, RewardData, FastSimulator, Plotter)]
+        
+        sha = hashlib.sha256()
+        for fname in sorted(set(os.path.abspath(fname) for fname in fnames)):
+            with open(fname, 'rb') as f:
+                sha.update(f.read())
+                
+        return sha.hexdigest()
+    
+    def _run_sweep(self):
+        """ Run every combination of parameter grid declared in `sweep` config for each seed, over the dataset loaded once.
+        Grid of each algorithm is merged on its `algo` config, and value of parameter is list, range dict, or fixed value (see `expand_grid`),
+        which is expanded to the points of `ExperimentPlan.sweep` when config is loaded.
+        Finished results are cached in `./results/sweep_cache` by hash of (algorithm, parameters, algorithm and simulation source, dataset, seed, chunk rounds, batch, plot points),
+        so only points not computed before are run, on process pool of `workers` processes if set.
+        Points without seed, or on dataset without data `seed`, are not reproducible, so they are always run and not cached.
+        """
+        cache = ResultCache(os.path.join('./results', 'sweep_cache'))
+        chunk_rounds = self.opt.data.get('chunk_rounds', self.CHUNK_ROUNDS)
+        points = self.opt.get('plot_points', 1000)
+        batch = self.opt.get('batch')
+        dataset, code = self._get_dataset_key(), self._get_code_key()
+        
+        jobs, rows = [], []
+        for algo_name, keys, param in self.plan.sweep:
+            for seed in self.plan.seeds:
+                label = self._get_label(algo_name, seed, {k: param[k] for k in keys})
+                key, result = None, None
+                if seed is not None and self.opt.data.param.get('seed') is not None:
+                    key = cache.key(algo=algo_name, param=param, code=code, dataset=dataset, seed=seed, chunk_rounds=chunk_rounds, batch=batch, points=points,
+                                    fast=self.opt.get('fast', False))
+                    result = cache.get(key)
+                if result is None:
+                    jobs.append((label, key, algo_name, param, seed))
+                else:
+                    self.plotter._add_algo_regret(label, result[0])
+                    rows.append((algo_name, param, seed, result[0][-1], result[1], True))
+        self.logger.info('%d of %d sweep points are cached, %d points to run' % (len(rows), len(rows) + len(jobs), len(jobs)))
         self.logger.info('=' * 54)
         
-        return flag
+        def done(label, key, algo_name, param, seed, regret, elapsed):
+            if key is not None:
+                cache.put(key, regret, elapsed.total_seconds(), algo=algo_name, param=param, seed=seed)
+            self.plotter._add_algo_regret(label, regret)
+            rows.append((algo_name, param, seed, regret[-1], elapsed.total_seconds(), False))
+            self._log_elapsed(label, elapsed)
+            
+        if self.opt.get('workers', 1) > 1 and self.data.fpath is not None:
+            with ProcessPoolExecutor(max_workers=self.opt.workers) as executor:
+                futures = [executor.submit(_run_job, self.data.fpath, self.data_info, algo_name, param, seed, chunk_rounds, points, batch, fast=self.opt.get('fast', False))
+                           for _, _, algo_name, param, seed in jobs]
+                for job, future in zip(jobs, futures):
+                    _, regret, elapsed, _ = future.result()
+                    done(*job, regret, elapsed)
+        else:
+            for job in jobs:
+                label, _, algo_name, param, seed = job
+                _begin = datetime.datetime.now()
+                algo = self.plan.algos[algo_name].create(self.data_info, param, self._get_seed(algo_name, seed))
+                
+                pbar = self._get_pbar('rounds-%s' % label)
+                self._run_simulation(algo, label, self.data, self.plotter, chunk_rounds, batch, pbar, profiler=self.profiler, fast=self.fast)
+                pbar.close()
+                done(*job, self.plotter.algo_regret[label], datetime.datetime.now() - _begin)
+        
+        self._log_sweep(rows)
+        
+    def _log_sweep(self, rows):
+        """ Store final regret of every sweep point to `sweep.csv`, and log the best parameters of each algorithm by mean final regret over seeds.
+        """
+        with open(os.path.join(self.fpath, 'sweep.csv'), 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['algo', 'param', 'seed', 'final_regret', 'elapsed_s', 'cached'])
+            for algo_name, param, seed, regret, elapsed, cached in rows:
+                writer.writerow([algo_name, json.dumps(param, sort_keys=True), seed, regret, elapsed, cached])
+        
+        final = collections.defaultdict(list)
+        for algo_name, param, _, regret, _, _ in rows:
+            final[(algo_name, json.dumps(param, sort_keys=True))].append(regret)
+        for algo_name in self.opt.sweep:
+            scores = {param: np.mean(regret) for (name, param), regret in final.items() if name == algo_name}
+            best = min(scores, key=scores.get)
+            self.logger.info('best parameters of %s: %s, mean final regret %.2f among %d parameter sets' % (algo_name, best, scores[best], len(scores)))
+        self.logger.info('=' * 54)
+    
+    def _dump_profile(self, profile):
+        """ Dump cProfile stats and tracemalloc top allocations of the parent process next to mab_experiment.log.
+        Worker processes are covered by phase timers only.
+        """
+        profile.dump_stats(os.path.join(self.fpath, 'profile.pstats'))
+        with open(os.path.join(self.fpath, 'profile.txt'), 'w') as f:
+            pstats.Stats(profile, stream=f).sort_stats('cumulative').print_stats(50)
+            
+        current, peak = tracemalloc.get_traced_memory()
+        snapshot = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+        with open(os.path.join(self.fpath, 'tracemalloc.txt'), 'w') as f:
+            f.write('current %.1f MiB, peak %.1f MiB\n' % (current / 2 ** 20, peak / 2 ** 20))
+            for stat in snapshot.statistics('lineno')[:30]:
+                f.write('%s\n' % stat)
+                
+        if self.profiler is not None:
+            self.profiler.dump(os.path.join(self.fpath, 'instrument.json'))
+        self.logger.info('profile reports are dumped to %s' % self.fpath)
         
     def run(self):
+        if not self.profile:
+            self._run()
+            return
+        
+        tracemalloc.start()
+        profile = cProfile.Profile()
+        profile.enable()
+        try:
+            self._run()
+        finally:
+            profile.disable()
+            self._dump_profile(profile)
+        
+    def _run(self):
         _begin = datetime.datetime.now()
         
         if self.opt.data.enabled:
             self.data_maker.run()
         self._load_data()
         
-        self.plotter = Plotter(self.data, self.data_info)
-    
-        flag=True
-        for algo_name, param in self.opt.algo.items():
-            flag = self._explore_exploit(algo_name, param, flag)
+        self.plotter = Plotter(self.data, self.data_info, self.opt.get('plot_points', 1000))
+        self.plotter._get_lowerbound()
+        
+        jobs = self.plan.jobs
+        if self.opt.get('sweep'):
+            self._run_sweep()
+        elif self.opt.get('replicas', 1) > 1:
+            for algo_name, param in self.opt.algo.items():
+                self._explore_exploit_replicas(algo_name, param, self.opt.replicas)
+        elif self.opt.get('workers', 1) > 1 and self.data.fpath is not None:
+            self._run_parallel(jobs)
+        else:
+            for algo_name, param, seed in jobs:
+                self._explore_exploit(algo_name, param, seed)
         
         self.plotter._plot_regret(self.opt.name, os.path.join(self.fpath, 'regret_graph.png'))
+        if self.profiler is not None:
+            self.profiler.log(self.logger)
         
         _end = datetime.datetime.now()
         
         self.logger.info('(%s) elapsed for mab_experiment.py' % (str(_end - _begin)))
         self.logger.info('=' * 54)
+
+def _run_job(data_dir, data_info, algo_name, param, seed, chunk_rounds, points, batch=None, checkpoint=None, instrument=False, fast=False):
+    """ Worker of `MABexp._run_parallel`. Returns label, regret curve, elapsed time, and phase timer stats of the job.
+    """
+    _begin = datetime.datetime.now()
+    
+    label = MABexp._get_label(algo_name, seed)
+    
+    data = RewardData.load(data_dir, data_info['arms'])
+    plotter = Plotter(data, data_info, points)
+    algo = MABexp._get_algo(algo_name, param, data_info, MABexp._get_seed(algo_name, seed))
+    profiler = Profiler() if instrument else None
+    MABexp._run_simulation(algo, label, data, plotter, chunk_rounds, batch, checkpoint=checkpoint, profiler=profiler, fast=MABexp._get_fast(fast))
+    
+    return label, plotter.algo_regret[label], datetime.datetime.now() - _begin, None if profiler is None else profiler.stats
         
 if __name__ == '__main__':
-    mab_exp = MABexp(sys.argv[1])
+    parser = argparse.ArgumentParser()
+    parser.add_argument('conf_fname')
+    parser.add_argument('--profile', action='store_true', help='record phase timers, and dump cProfile and tracemalloc reports next to mab_experiment.log')
+    args = parser.parse_args()
+    
+    try:
+        mab_exp = MABexp(args.conf_fname, args.profile)
+    except ConfigError as e:
+        parser.error(str(e))
     mab_exp.run()
\ No newline at end of file
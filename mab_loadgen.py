@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+import json
+import time
+import pickle
+import asyncio
+import numpy as np
+
+from tools import *
+
+class MABloadgen:
+    """ This class is load generator for `MABserver`, driven by reward dataset made by `DataMaker`.
+    Each of `concurrency` clients repeats select -> reward of dataset at next round -> reward request,
+    until `rounds` rounds of dataset are consumed. Client-side latency of select, QPS, and server statistics are reported.
+    Uses same config file with server, `loadgen` entry of which controls concurrency and rounds.
+    """
+    def __init__(self, conf_fname):
+        self.opt = ConfLoader(conf_fname).opt
+        self.data_maker = DataMaker(self.opt)
+        
+        fpath = os.path.join(self.data_maker.dir, self.data_maker.sub_dir)
+        with open(os.path.join(fpath, 'info.pickle'), 'rb') as f:
+            self.data_info = pickle.load(f)
+        self.data = RewardData.load(fpath, self.data_info['arms'])
+        
+        loadgen = self.opt.get('loadgen', {})
+        self.concurrency = loadgen.get('concurrency', 32)
+        self.rounds = min(loadgen.get('rounds', len(self.data)), len(self.data))
+        
+    async def _request(self, reader, writer, request):
+        writer.write((json.dumps(request) + '\n').encode())
+        await writer.drain()
+        
+        return json.loads(await reader.readline())
+        
+    async def _client(self):
+        reader, writer = await asyncio.open_connection(self.opt.get('host', '127.0.0.1'), self.opt.get('port', 8642))
+        while self.round < self.rounds:
+            r = self.round
+            self.round += 1
+            
+            _begin = time.perf_counter()
+            arm = (await self._request(reader, writer, {'op': 'select'}))['arm']
+            self.latency.append(time.perf_counter() - _begin)
+            
+            reward = self.data.reward(r, arm)
+            self.reward += reward
+            await self._request(reader, writer, {'op': 'reward', 'arm': arm, 'reward': reward})
+        
+        writer.close()
+        
+    async def _run(self):
+        self.round, self.reward, self.latency = 0, 0, []
+        
+        _begin = time.perf_counter()
+        await asyncio.gather(*[self._client() for _ in range(self.concurrency)])
+        elapsed = time.perf_counter() - _begin
+        
+        reader, writer = await asyncio.open_connection(self.opt.get('host', '127.0.0.1'), self.opt.get('port', 8642))
+        server_stats = await self._request(reader, writer, {'op': 'stats'})
+        writer.close()
+        
+        latency = np.array(self.latency) * 1000
+        return {'rounds': self.rounds,
+                'concurrency': self.concurrency,
+                'qps': self.rounds / elapsed,
+                'p50_ms': float(np.percentile(latency, 50)),
+                'p99_ms': float(np.percentile(latency, 99)),
+                'mean_reward': self.reward / self.rounds,
+                'server': server_stats}
+        
+    def run(self):
+        stats = asyncio.run(self._run())
+        print(json.dumps(stats, indent=4))
+        
+        return stats
+        
+if __name__ == '__main__':
+    mab_loadgen = MABloadgen(sys.argv[1])
+    mab_loadgen.run()
@@ -0,0 +1,250 @@
+# -*- coding: utf-8 -*-
+import os
+os.environ['OMP_NUM_THREADS'] = '1'
+import sys
+import json
+import time
+import pickle
+import asyncio
+import logging
+import collections
+import numpy as np
+
+from tools import *
+from mab_experiment import MABexp
+
+class MABserver:
+    """ This class is for serving one MAB algorithm of `MABexp.ALGO_MAP` as long-running local service.
+    Requests are line-delimited json over TCP socket, `{"op": "select"}`, `{"op": "reward", "arm": 3, "reward": 1}` and `{"op": "stats"}`.
+    Contextual algorithm takes context of the request too, (arms, d) context of every arm by `{"op": "select", "context": [[...], ...]}`
+    and (d,) context of the pulled arm by `{"op": "reward", ..., "context": [...]}`, and requests without context use fixed context of arms of the dataset.
+    
+    Concurrent select requests are coalesced into micro-batches of at most `max_batch` requests waiting at most `max_wait_ms`,
+    and served by one vectorized `select_arms` call. The batcher is also the single writer of policy state,
+    which applies queued rewards by `update_batch` before each batch, so that there is no lock on the policy.
+    Any server setting can be controlled by `./config/mab_server.json` file.
+    """
+    # number of latest select latencies kept for percentiles
+    LATENCY_WINDOW = 100000
+    # rewards of the datasets are 0/1, and Bernoulli rates in between are taken as well
+    REWARD_RANGE = (0, 1)
+    
+    def __init__(self, conf_fname):
+        # config is checked before data is generated, and the first algorithm of it is served
+        loader = ConfLoader(conf_fname)
+        self.opt = loader.opt
+        self.plan = loader.get_plan(MABexp.ALGO_MAP)
+        self.data_maker = DataMaker(self.opt)
+        
+        self.fpath = os.path.join('./results', self.data_maker.sub_dir, self.opt.name)
+        if not os.path.isdir(self.fpath):
+            os.makedirs(self.fpath)
+        self._logging(os.path.join(self.fpath, 'mab_server.log'))
+        
+        if self.opt.data.enabled:
+            self.data_maker.run()
+        
+        self.algo_name, spec = next(iter(self.plan.algos.items()))
+        with open(os.path.join(self.data_maker.dir, self.data_maker.sub_dir, 'info.pickle'), 'rb') as f:
+            self.data_info = pickle.load(f)
+        self.algo = spec.create(self.data_info, rng=MABexp._get_seed(self.algo_name, self.opt.get('seed')))
+        
+        # policy state is restored from checkpoint of the same parameters if exists, and stored at every report
+        self.checkpoint = None
+        if self.opt.get('checkpoint'):
+            key = ResultCache.key(algo=self.algo_name, param=spec.param, seed=self.opt.get('seed'))
+            self.checkpoint = Checkpoint(os.path.join(self.fpath, 'checkpoints', '%s-%s' % (self.algo_name, key[:12])), fmt=self.opt.checkpoint.get('format', 'npz'))
+            if self.checkpoint.exists():
+                self.algo.set_state(self.checkpoint.load())
+                self.logger.info('policy state is restored from %s' % self.checkpoint.fpath)
+        
+        self.feedback = []
+        self.latency = collections.deque(maxlen=self.LATENCY_WINDOW)
+        self.served, self.rewarded, self.batches = 0, 0, 0
+        
+    def _logging(self, fpath):
+        self.logger = logging.getLogger('MAB_server')
+        self.logger.setLevel(logging.DEBUG)
+        if not self.logger.handlers:
+            handler = logging.FileHandler(fpath)
+            handler.setLevel(logging.DEBUG)
+            formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+            handler.setFormatter(formatter)
+            self.logger.addHandler(handler)
+            
+    def _apply_feedback(self):
+        if not self.feedback:
+            return
+        
+        arms, rewards, contexts = zip(*self.feedback)
+        if all(c is None for c in contexts):
+            contexts = None
+        else:
+            # feedback without context is of the fixed context of its arm
+            contexts = np.array([self.algo.context[arm] if c is None else c for arm, c in zip(arms, contexts)])
+        self.algo.update_batch(np.array(arms), np.array(rewards), contexts)
+        self.rewarded += len(arms)
+        self.feedback = []
+            
+    def _get_feedback(self, request):
+        """ Returns (arm, reward, context) of reward request, or raises ValueError if it can not be applied to the policy,
+        so that bad request is answered with error instead of breaking `update_batch` of the batcher.
+        """
+        arm, reward, context = request['arm'], request['reward'], request.get('context')
+        if isinstance(arm, bool) or not isinstance(arm, int) or not 0 <= arm < self.algo.arms:
+            raise ValueError('arm should be int in [0, %d), got %r' % (self.algo.arms, arm))
+        if isinstance(reward, bool) or not isinstance(reward, (int, float)) or not self.REWARD_RANGE[0] <= reward <= self.REWARD_RANGE[1]:
+            raise ValueError('reward should be number in [%s, %s], got %r' % (*self.REWARD_RANGE, reward))
+        
+        return arm, float(reward), self._get_context(context, ())
+    
+    def _get_context(self, context, shape):
+        """ Returns context of request as array of `shape` + (d,), or None if not given. Raises ValueError if the policy does not take it.
+        """
+        if context is None:
+            return None
+        
+        dim = getattr(self.algo, 'dim', None)
+        if dim is None:
+            raise ValueError('%s algorithm does not take context' % self.algo_name)
+        try:
+            context = np.asarray(context, dtype=float)
+        except (TypeError, ValueError):
+            raise ValueError('context should be nested list of numbers of shape %s' % (shape + (dim,),))
+        if context.shape != shape + (dim,) or not np.isfinite(context).all():
+            raise ValueError('context should be finite numbers of shape %s, got shape %s' % (shape + (dim,), context.shape))
+        
+        return context
+    
+    async def _batcher(self):
+        """ Single writer of policy state, coalescing queued (future, context) of select requests into micro-batches.
+        If a batch fails, its select requests get the error and queued feedback is dropped, and the batcher keeps serving.
+        """
+        max_batch, max_wait = self.opt.get('max_batch', 64), self.opt.get('max_wait_ms', 1) / 1000
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.requests.get()]
+            deadline = loop.time() + max_wait
+            while len(batch) < max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.requests.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            
+            try:
+                self._apply_feedback()
+                if all(context is None for _, context in batch):
+                    arms = self.algo.select_arms(len(batch))
+                else:
+                    arms = self.algo.select_arms(len(batch), np.array([self.algo.context if context is None else context for _, context in batch]))
+            except Exception as e:
+                self.logger.exception('batch of %d requests failed, %d feedback are dropped' % (len(batch), len(self.feedback)))
+                self.feedback = []
+                for future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            
+            for (future, _), arm in zip(batch, arms):
+                if not future.done():
+                    future.set_result(int(arm))
+            self.batches += 1
+    
+    def _stats(self):
+        latency = np.array(self.latency) * 1000 if self.latency else np.zeros(1)
+        elapsed = max(time.perf_counter() - self.begin, 1e-9)
+        
+        return {'served': self.served,
+                'rewarded': self.rewarded,
+                'batches': self.batches,
+                'mean_batch': self.served / max(self.batches, 1),
+                'qps': self.served / elapsed,
+                'p50_ms': float(np.percentile(latency, 50)),
+                'p99_ms': float(np.percentile(latency, 99))}
+    
+    async def _handle(self, reader, writer):
+        loop = asyncio.get_running_loop()
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            
+            _begin = time.perf_counter()
+            try:
+                request = json.loads(line)
+                if request['op'] == 'select':
+                    context = self._get_context(request.get('context'), (self.algo.arms,))
+                    future = loop.create_future()
+                    await self.requests.put((future, context))
+                    try:
+                        response = {'arm': await future}
+                    except Exception as e:
+                        response = {'error': 'select failed, %r' % e}
+                    else:
+                        self.served += 1
+                        self.latency.append(time.perf_counter() - _begin)
+                    
+                elif request['op'] == 'reward':
+                    self.feedback.append(self._get_feedback(request))
+                    response = {'ok': True}
+                    
+                elif request['op'] == 'stats':
+                    response = self._stats()
+                    
+                else:
+                    response = {'error': 'unknown op %s' % request['op']}
+            except (ValueError, KeyError, TypeError) as e:
+                response = {'error': repr(e)}
+                
+            writer.write((json.dumps(response) + '\n').encode())
+            await writer.drain()
+            
+        writer.close()
+        
+    async def _report(self, interval):
+        while True:
+            await asyncio.sleep(interval)
+            stats = self._stats()
+            self.logger.info(' '.join('%s: %.3f' % (k, v) for k, v in stats.items()))
+            # state is changed only by the batcher, so queued feedback is left to it and is not in this checkpoint
+            self._save_checkpoint()
+    
+    def _save_checkpoint(self):
+        if self.checkpoint is not None:
+            self.checkpoint.save(self.algo.get_state())
+    
+    async def serve(self):
+        self.requests = asyncio.Queue()
+        self.begin = time.perf_counter()
+        
+        host, port = self.opt.get('host', '127.0.0.1'), self.opt.get('port', 8642)
+        server = await asyncio.start_server(self._handle, host, port)
+        self.logger.info('%s algorithm is served on %s:%d' % (self.algo_name, host, port))
+        self.logger.info('=' * 54)
+        
+        tasks = [asyncio.ensure_future(self._batcher()), asyncio.ensure_future(self._report(self.opt.get('report_interval', 10)))]
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            for task in tasks:
+                task.cancel()
+        
+    def run(self):
+        try:
+            asyncio.run(self.serve())
+        except KeyboardInterrupt:
+            # batcher is stopped, so remaining feedback is applied here before the last checkpoint
+            self._apply_feedback()
+            self._save_checkpoint()
+            self.logger.info('server is stopped, %s' % self._stats())
+        
+if __name__ == '__main__':
+    try:
+        mab_server = MABserver(sys.argv[1])
+    except ConfigError as e:
+        sys.exit(str(e))
+    mab_server.run()
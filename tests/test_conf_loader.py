@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+import json
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tools import ConfLoader, ConfigError
+from mab_experiment import MABexp
+
+DATA = {'enabled': True,
+        'param': {'stationary': True, 'contextual': True, 'rounds': 100, 'arms': 10,
+                  'best_reward': 0.7, 'offset': 0.2, 'context_dim': 4, 'seed': 0}}
+
+def _get_plan(tmp_path, **conf):
+    fpath = os.path.join(str(tmp_path), 'conf.json')
+    with open(fpath, 'w') as f:
+        json.dump(dict({'name': 'test_conf', 'data': DATA}, **conf), f)
+    
+    return ConfLoader(fpath).get_plan(MABexp.ALGO_MAP)
+
+@pytest.mark.parametrize('algo, error', [({'ucb': {'replicas': 4}}, 'algo.ucb.replicas: is given by experiment'),
+                                         ({'ucb': {'index': 'heap'}}, 'algo.ucb.index: should be one of'),
+                                         ({'cd_ucb': {'restart': 'none'}}, 'algo.cd_ucb.restart: should be one of'),
+                                         ({'hybrid_linucb': {'arm_features': 'foo'}}, 'algo.hybrid_linucb.arm_features: should be one of'),
+                                         ({'ucb': {'c': 1}}, 'algo.ucb.c: unknown parameter')])
+def test_bad_algo_param_is_rejected(tmp_path, algo, error):
+    with pytest.raises(ConfigError) as e:
+        _get_plan(tmp_path, algo=algo)
+    
+    assert error in str(e.value)
+
+def test_declared_choices_are_accepted(tmp_path):
+    plan = _get_plan(tmp_path, algo={'ucb': {'index': 'tree'}, 'cd_ucb': {'restart': 'arm'}, 'hybrid_linucb': {'arm_features': 'bias'}})
+    
+    assert list(plan.algos) == ['ucb', 'cd_ucb', 'hybrid_linucb']
+
+def test_single_seed_is_seeds_of_one(tmp_path):
+    assert _get_plan(tmp_path, algo={'ucb': {}}, seed=3).seeds == [3]
+    assert _get_plan(tmp_path, algo={'ucb': {}}).seeds == [None]
+    
+    with pytest.raises(ConfigError):
+        _get_plan(tmp_path, algo={'ucb': {}}, seed=3, seeds=[1, 2])
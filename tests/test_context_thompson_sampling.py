@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from algorithm import Context_ThompsonSampling
+
+ARMS, DIM = 8, 5
+
+def _get_feedback(rounds, seed=0):
+    rng = np.random.default_rng(seed)
+    
+    return rng.random((ARMS, DIM)), rng.integers(ARMS, size=rounds), rng.integers(2, size=rounds)
+
+def _assert_factor_of_inverse(algo):
+    param = algo.param
+    B_inv = np.linalg.inv(param['B'])
+    
+    assert np.allclose(np.matmul(param['G'].T, param['G']), B_inv, atol=1e-8)
+    assert np.allclose(param['u_hat'], np.matmul(B_inv, param['f']), atol=1e-8)
+
+@pytest.mark.parametrize('refresh', [0, 7])
+def test_rank1_factor_matches_inverse(refresh):
+    context, arms, rewards = _get_feedback(2000)
+    algo = Context_ThompsonSampling(ARMS, context, DIM, refresh=refresh)
+    for arm, reward in zip(arms, rewards):
+        algo.update_parameter(arm, reward)
+    
+    _assert_factor_of_inverse(algo)
+
+@pytest.mark.parametrize('batch', [3, 64])
+def test_batch_factor_matches_inverse(batch):
+    # batches up to d are rank-1 updates, larger ones are refactorized
+    context, arms, rewards = _get_feedback(1000)
+    one, algo = Context_ThompsonSampling(ARMS, context, DIM), Context_ThompsonSampling(ARMS, context, DIM)
+    for arm, reward in zip(arms, rewards):
+        one.update_parameter(arm, reward)
+    for start in range(0, len(arms), batch):
+        algo.update_batch(arms[start:start + batch], rewards[start:start + batch])
+    
+    _assert_factor_of_inverse(algo)
+    assert np.allclose(algo.param['B'], one.param['B']) and np.allclose(algo.param['u_hat'], one.param['u_hat'], atol=1e-8)
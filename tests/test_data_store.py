@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+import subprocess
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tools import DataStore
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def _add(store, name, size=100):
+    fpath = os.path.join(store.root, name)
+    os.makedirs(fpath)
+    with open(os.path.join(fpath, 'rewards.npy'), 'wb') as f:
+        f.write(b'x' * size)
+    
+    return fpath, store.add(name, fpath, {'name': name})
+
+def test_eviction_skips_dataset_in_use(tmp_path):
+    store = DataStore(str(tmp_path), budget=150)
+    used, _ = _add(store, 'used')
+    lock = store.lock('used')
+    
+    _, evicted = _add(store, 'new')
+    assert evicted == [] and os.path.isdir(used)
+    
+    lock.close()
+    _, evicted = _add(store, 'newer')
+    assert evicted == ['used', 'new'] and not os.path.isdir(used)
+
+def test_broken_dataset_in_use_is_not_removed(tmp_path):
+    store = DataStore(str(tmp_path))
+    fpath, _ = _add(store, 'broken')
+    with open(os.path.join(fpath, 'rewards.npy'), 'wb') as f:
+        f.write(b'x')
+    
+    lock = store.lock('broken')
+    assert not store.lookup('broken')
+    assert os.path.isfile(os.path.join(fpath, 'rewards.npy'))
+    lock.close()
+    
+    _add(store, 'other')
+    with open(os.path.join(store.root, 'other', 'rewards.npy'), 'wb') as f:
+        f.write(b'x')
+    assert not store.lookup('other')
+    assert not os.path.isdir(os.path.join(store.root, 'other'))
+
+def test_import_without_fcntl(tmp_path):
+    # fcntl is missing on e.g. Windows, where the store works without locks
+    code = ('import sys; sys.modules["fcntl"] = None; sys.path.insert(0, %r)\n'
+            'from tools import *\n'
+            'store = DataStore(%r)\n'
+            'store.lock("key").close()\n'
+            'assert not store.lookup("key")\n') % (ROOT, str(tmp_path))
+    subprocess.run([sys.executable, '-c', code], check=True)
@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from algorithm import HybridLinUCB
+
+ARMS, DIM, ALPHA = 6, 4, 0.5
+
+class _Reference:
+    """ Algorithm 2 of 'A Contextual-Bandit Approach to Personalized News Article Recommendation' with explicit inverses,
+    for shared feature z and per-arm feature x.
+    """
+    def __init__(self, m):
+        self.A0, self.b0 = np.eye(DIM), np.zeros(DIM)
+        self.A = [np.eye(m) for arm in range(ARMS)]
+        self.B = [np.zeros((m, DIM)) for arm in range(ARMS)]
+        self.b = [np.zeros(m) for arm in range(ARMS)]
+    
+    def get_index(self, z, x):
+        A0_inv = np.linalg.inv(self.A0)
+        beta = np.matmul(A0_inv, self.b0)
+        index = []
+        for arm in range(ARMS):
+            A_inv, B = np.linalg.inv(self.A[arm]), self.B[arm]
+            theta = np.matmul(A_inv, self.b[arm] - np.matmul(B, beta))
+            s = (z[arm] @ A0_inv @ z[arm] - 2 * z[arm] @ A0_inv @ B.T @ A_inv @ x[arm]
+                 + x[arm] @ A_inv @ x[arm] + x[arm] @ A_inv @ B @ A0_inv @ B.T @ A_inv @ x[arm])
+            index.append(z[arm] @ beta + x[arm] @ theta + ALPHA * np.sqrt(s))
+        
+        return np.array(index)
+    
+    def update(self, arm, reward, z, x):
+        A_inv = np.linalg.inv(self.A[arm])
+        self.A0 += self.B[arm].T @ A_inv @ self.B[arm]
+        self.b0 += self.B[arm].T @ A_inv @ self.b[arm]
+        self.A[arm] += np.outer(x, x)
+        self.B[arm] += np.outer(x, z)
+        self.b[arm] += reward * x
+        A_inv = np.linalg.inv(self.A[arm])
+        self.A0 += np.outer(z, z) - self.B[arm].T @ A_inv @ self.B[arm]
+        self.b0 += reward * z - self.B[arm].T @ A_inv @ self.b[arm]
+
+@pytest.mark.parametrize('arm_features', ['context', 'bias', 'none'])
+def test_index_matches_paper(arm_features):
+    rng = np.random.default_rng(0)
+    context = rng.random((ARMS, DIM))
+    algo = HybridLinUCB(ARMS, context, DIM, alpha=ALPHA, arm_features=arm_features)
+    features = algo._get_features(context)
+    reference = _Reference(features.shape[-1])
+    for t in range(300):
+        # every other round has its own context
+        z = context if t % 2 else rng.random((ARMS, DIM))
+        x = features if t % 2 else algo._get_features(z)
+        expected = reference.get_index(z, x)
+        
+        assert np.allclose(algo._get_index(None if t % 2 else z), expected, atol=1e-8)
+        
+        arm, reward = rng.integers(ARMS), rng.integers(2)
+        algo.update_parameter(arm, reward, None if t % 2 else z)
+        reference.update(arm, reward, z[arm], x[arm])
+    
+    assert np.allclose(algo.param['A0'], reference.A0, atol=1e-8)
+    assert np.allclose(algo.param['A_inv'], np.linalg.inv(reference.A), atol=1e-8)
+
+@pytest.mark.parametrize('arm_features', ['context', 'bias', 'none'])
+def test_batch_matches_one_by_one(arm_features):
+    rng = np.random.default_rng(1)
+    context = rng.random((ARMS, DIM))
+    arms, rewards = rng.integers(ARMS, size=500), rng.integers(2, size=500)
+    one = HybridLinUCB(ARMS, context, DIM, arm_features=arm_features)
+    batch = HybridLinUCB(ARMS, context, DIM, arm_features=arm_features)
+    for arm, reward in zip(arms, rewards):
+        one.update_parameter(arm, reward)
+    for start in range(0, len(arms), 50):
+        batch.update_batch(arms[start:start + 50], rewards[start:start + 50])
+    
+    assert np.allclose(one._get_index(), batch._get_index(), atol=1e-8)
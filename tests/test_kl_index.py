@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+import math
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from algorithm.kl_index import KLIndex
+
+def _bisection(n, mean, bound, epsilon=1e-12):
+    """ Reference index, the largest q with n * kl(mean, q) <= bound by bisection to machine precision.
+    """
+    def kl(p, q):
+        return p * math.log(p / q) + (1 - p) * math.log((1 - p) / (1 - q))
+    
+    p = min(max(mean, epsilon), 1 - epsilon)
+    d = max(bound, 0) / n
+    lo, hi = p, 1 - epsilon
+    if kl(p, hi) <= d:
+        return 1.
+    for i in range(200):
+        mid = (lo + hi) / 2
+        if kl(p, mid) > d:
+            hi = mid
+        else:
+            lo = mid
+    
+    return lo
+
+def _get_arms(arms, max_n, seed=0):
+    rng = np.random.default_rng(seed)
+    n = rng.integers(1, max_n, arms).astype(float)
+    mean = rng.random(arms)
+    # means at the edges of [0, 1]
+    mean[:arms // 10], mean[arms // 10:arms // 5] = 0, 1
+    
+    return n, mean
+
+@pytest.mark.parametrize('max_n', [50, 10 ** 6])
+def test_solvers_match_bisection(max_n):
+    n, mean = _get_arms(2000, max_n)
+    bound = math.log(10 ** 6)
+    expected = np.array([_bisection(*arm, bound) for arm in zip(n, mean)])
+    kl_index = KLIndex(len(n))
+    
+    assert np.allclose(kl_index.solve(n, mean, bound), expected, rtol=0, atol=1e-5)
+    assert np.allclose([kl_index._solve_one(*arm, bound, np.nan) for arm in zip(n, mean)], expected, rtol=0, atol=1e-5)
+
+def test_cached_index_matches_fresh_solve():
+    n, mean = _get_arms(100, 1000)
+    rng = np.random.default_rng(1)
+    kl_index = KLIndex(len(n))
+    for t in range(200):
+        # bound is kept for a few rounds as by lazy refresh of KL_UCB, and one or many arms change
+        bound = math.log(1000 + t // 10)
+        arms = rng.integers(len(n), size=1 if t % 3 else 20)
+        n[arms] += 1
+        mean[arms] = rng.random(len(arms))
+        
+        assert np.allclose(kl_index(n, mean, bound), kl_index.solve(n, mean, bound), rtol=0, atol=1e-5)
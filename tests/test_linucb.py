@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from algorithm import LinUCB
+
+ARMS, DIM = 8, 5
+
+def _get_feedback(rounds, seed=0):
+    rng = np.random.default_rng(seed)
+    context = rng.random((ARMS, DIM))
+    
+    return context, rng.integers(ARMS, size=rounds), rng.integers(2, size=rounds), rng.random((rounds, DIM))
+
+def _assert_matches_explicit_inverse(algo):
+    param = algo.param
+    A_inv = np.linalg.inv(param['A'])
+    
+    assert np.allclose(param['A_inv'], A_inv, atol=1e-8)
+    assert np.allclose(param['theta'], np.matmul(A_inv, param['b'][..., None])[..., 0], atol=1e-8)
+    
+    x = algo.context
+    index = np.sum(param['theta'] * x, axis=-1) + algo.alpha * np.sqrt(np.einsum('ai,aij,aj->a', x, A_inv, x))
+    assert np.allclose(algo._get_index(), index, atol=1e-8)
+
+@pytest.mark.parametrize('refresh', [0, 7])
+def test_sherman_morrison_matches_explicit_inverse(refresh):
+    context, arms, rewards, contexts = _get_feedback(2000)
+    algo = LinUCB(ARMS, context, DIM, alpha=0.5, refresh=refresh)
+    for arm, reward in zip(arms, rewards):
+        algo.update_parameter(arm, reward)
+    
+    _assert_matches_explicit_inverse(algo)
+    assert np.array_equal(algo.param['n'], np.bincount(arms, minlength=ARMS))
+
+def test_round_contexts_match_explicit_inverse():
+    context, arms, rewards, contexts = _get_feedback(500)
+    algo = LinUCB(ARMS, context, DIM)
+    for arm, reward, x in zip(arms, rewards, contexts):
+        round_context = context.copy()
+        round_context[arm] = x
+        algo.update_parameter(arm, reward, round_context)
+    
+    _assert_matches_explicit_inverse(algo)
+
+@pytest.mark.parametrize('with_contexts', [False, True])
+def test_batch_matches_one_by_one(with_contexts):
+    context, arms, rewards, contexts = _get_feedback(1000)
+    contexts = contexts if with_contexts else context[arms]
+    one, batch = LinUCB(ARMS, context, DIM), LinUCB(ARMS, context, DIM)
+    for arm, reward, x in zip(arms, rewards, contexts):
+        round_context = context.copy()
+        round_context[arm] = x
+        one.update_parameter(arm, reward, round_context)
+    for start in range(0, len(arms), 64):
+        batch.update_batch(arms[start:start + 64], rewards[start:start + 64], contexts[start:start + 64] if with_contexts else None)
+    
+    for key in ('A', 'A_inv', 'b', 'theta', 'n'):
+        assert np.allclose(one.param[key], batch.param[key], atol=1e-8)
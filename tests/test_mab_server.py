@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+import json
+import asyncio
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mab_server import MABserver
+
+CONF = {'name': 'test_server',
+        'max_batch': 8,
+        'max_wait_ms': 1,
+        'data': {'enabled': True,
+                 'param': {'stationary': True, 'contextual': False, 'rounds': 100, 'arms': 10,
+                           'best_reward': 0.7, 'offset': 0.2, 'change_type': 'abruptly', 'change_num': 10, 'seed': 0}},
+        'algo': {'ucb': {}}}
+CONTEXT_CONF = dict(CONF, data={'enabled': True, 'param': dict(CONF['data']['param'], contextual=True, context_dim=4)}, algo={'linucb': {}})
+
+def _get_server(tmp_path, monkeypatch, conf=CONF):
+    monkeypatch.chdir(tmp_path)
+    with open('conf.json', 'w') as f:
+        json.dump(conf, f)
+    
+    return MABserver('conf.json')
+
+async def _session(server, requests):
+    """ Serve on a free port with the batcher running, and return response of each request sent in order on one connection.
+    """
+    server.requests = asyncio.Queue()
+    server.begin = asyncio.get_running_loop().time()
+    batcher = asyncio.ensure_future(server._batcher())
+    listener = await asyncio.start_server(server._handle, '127.0.0.1', 0)
+    try:
+        reader, writer = await asyncio.open_connection(*listener.sockets[0].getsockname()[:2])
+        responses = []
+        for request in requests:
+            writer.write((json.dumps(request) + '\n').encode())
+            await writer.drain()
+            responses.append(json.loads(await asyncio.wait_for(reader.readline(), 5)))
+        writer.close()
+        
+        return responses
+    finally:
+        batcher.cancel()
+        listener.close()
+
+def test_bad_reward_does_not_hang_select(tmp_path, monkeypatch):
+    server = _get_server(tmp_path, monkeypatch)
+    responses = asyncio.run(_session(server, [{'op': 'reward', 'arm': 10 ** 6, 'reward': 1},
+                                              {'op': 'reward', 'arm': -1, 'reward': 1},
+                                              {'op': 'reward', 'arm': 0, 'reward': 'x'},
+                                              {'op': 'reward', 'arm': 0, 'reward': 1, 'context': [0.5]},
+                                              {'op': 'select'},
+                                              {'op': 'reward', 'arm': 3, 'reward': 1},
+                                              {'op': 'select'}]))
+    
+    assert all('error' in r for r in responses[:4])
+    assert 0 <= responses[4]['arm'] < 10
+    assert responses[5] == {'ok': True}
+    assert 0 <= responses[6]['arm'] < 10
+    assert server.rewarded == 1 and server.feedback == []
+
+def test_failed_batch_answers_select_with_error(tmp_path, monkeypatch):
+    server = _get_server(tmp_path, monkeypatch)
+    select_arms = server.algo.select_arms
+    calls = []
+    def fail_once(k):
+        calls.append(k)
+        if len(calls) == 1:
+            raise RuntimeError('broken policy')
+        return select_arms(k)
+    server.algo.select_arms = fail_once
+    
+    responses = asyncio.run(_session(server, [{'op': 'select'}, {'op': 'select'}]))
+    
+    assert 'error' in responses[0]
+    assert 0 <= responses[1]['arm'] < 10
+
+def test_contexts_are_kept_per_request(tmp_path, monkeypatch):
+    server = _get_server(tmp_path, monkeypatch, CONTEXT_CONF)
+    update_batch = server.algo.update_batch
+    updates = []
+    def spy(arms, rewards, contexts=None):
+        updates.append((arms, contexts))
+        return update_batch(arms, rewards, contexts)
+    server.algo.update_batch = spy
+    
+    # context of the round makes arm 7 the most uncertain one, which LinUCB selects first
+    context = [[0.1] * 4] * 10
+    context[7] = [1.0] * 4
+    responses = asyncio.run(_session(server, [{'op': 'reward', 'arm': 2, 'reward': 1, 'context': [0.5] * 4},
+                                              {'op': 'reward', 'arm': 5, 'reward': 0},
+                                              {'op': 'select', 'context': context},
+                                              {'op': 'select', 'context': [[0.1] * 4] * 9}]))
+    
+    assert responses[2] == {'arm': 7}
+    assert 'error' in responses[3]
+    arms, contexts = updates[0]
+    assert list(arms) == [2, 5]
+    assert np.array_equal(contexts, [[0.5] * 4, server.algo.context[5]])
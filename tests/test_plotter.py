@@ -0,0 +1,24 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tools import Plotter, RewardData
+
+@pytest.mark.parametrize('rounds', [1, 2, 10, 11, 3000])
+def test_checkpoints_are_rounds_of_dataset(rounds):
+    checkpoints = Plotter._get_checkpoints(rounds, 100)
+    
+    assert checkpoints[0] == 0 and checkpoints[-1] == rounds - 1
+    assert np.all(np.diff(checkpoints) > 0)
+
+def test_lowerbound_of_one_round():
+    data = RewardData(np.zeros((1, 1), dtype=np.uint8), np.zeros(1, dtype=int), np.full(1, 0.7), 4)
+    plotter = Plotter(data, {'rounds': 1, 'arms': 4, 'best_reward': 0.7, 'offset': 0.2})
+    plotter._get_lowerbound()
+    
+    assert plotter.lowerbound.shape == (1,)
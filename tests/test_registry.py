@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+import subprocess
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def _run(code):
+    """ Run code in fresh interpreter, as which module is imported first decides attributes of the package.
+    """
+    return subprocess.run([sys.executable, '-c', code], cwd=ROOT, capture_output=True, text=True)
+
+@pytest.mark.parametrize('first', ['from algorithm.UCB import UCB', 'import algorithm.UCB', 'import algorithm', 'from algorithm import *'])
+def test_algorithm_is_class_whichever_is_imported_first(first):
+    result = _run('\n'.join([first,
+                             'import algorithm',
+                             'from mab_experiment import MABexp',
+                             'from algorithm import UCB',
+                             'assert isinstance(UCB, type) and isinstance(algorithm.UCB, type)',
+                             'assert MABexp.ALGO_MAP["ucb"] is UCB',
+                             'assert type(MABexp._get_algo("ucb", {}, {"arms": 5}, 0)) is UCB']))
+    
+    assert result.returncode == 0, result.stderr
+
+def test_algorithms_are_imported_lazily():
+    result = _run('\n'.join(['import sys',
+                             'from mab_experiment import MABexp',
+                             'MABexp._get_algo("ucb", {}, {"arms": 5}, 0).select_arm()',
+                             'loaded = [m for m in sys.modules if m.startswith("algorithm.")]',
+                             'assert "algorithm.KL_UCB" not in loaded and "matplotlib" not in sys.modules, loaded']))
+    
+    assert result.returncode == 0, result.stderr
@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from algorithm import UCB, KL_UCB, Egreedy, SW_UCB, SW_ThompsonSampling, D_UCB, D_ThompsonSampling, CD_UCB, CD_ThompsonSampling
+
+ARMS = 20
+
+def _get_rewards(rounds, seed=0, change=None):
+    """ Bernoulli rewards where arm 3 is the best, and arm 12 is the best from round `change` if given.
+    """
+    probs = np.full((rounds, ARMS), 0.5)
+    probs[:change, 3] = 0.7
+    if change is not None:
+        probs[change:, 12] = 0.9
+    
+    return (np.random.default_rng(seed).random((rounds, ARMS)) < probs).astype(int)
+
+def _run(algo, rewards):
+    selected = []
+    for reward in rewards:
+        arm = algo.select_arm()
+        algo.update_parameter(arm, reward[arm])
+        selected.append(arm)
+    
+    return selected
+
+def _assert_resumes(make, rounds=2000, stop=700, change=None):
+    """ Policy restored from state at round `stop` should select the same arms as the one which kept running.
+    """
+    rewards = _get_rewards(rounds, change=change)
+    algo = make()
+    _run(algo, rewards[:stop])
+    state = {k: np.copy(v) for k, v in algo.get_state().items()}
+    expected = _run(algo, rewards[stop:])
+    
+    resumed = make()
+    resumed.set_state(state)
+    
+    assert _run(resumed, rewards[stop:]) == expected
+    
+    return algo
+
+@pytest.mark.parametrize('cls', [UCB, KL_UCB, Egreedy])
+def test_tree_index_resumes(cls):
+    _assert_resumes(lambda: cls(ARMS, index='tree', rng=1))
+
+@pytest.mark.parametrize('make', [lambda: SW_UCB(ARMS, window=300, rng=1),
+                                  lambda: SW_ThompsonSampling(ARMS, window=300, rng=1),
+                                  lambda: D_UCB(ARMS, gamma=0.9, rng=1),
+                                  lambda: D_ThompsonSampling(ARMS, gamma=0.9, rng=1)])
+def test_window_and_discount_resume(make):
+    # the window has wrapped around and discounted sums have been rescaled before `stop`
+    _assert_resumes(make, rounds=4000, stop=2500, change=1000)
+
+@pytest.mark.parametrize('cls', [CD_UCB, CD_ThompsonSampling])
+@pytest.mark.parametrize('restart', ['all', 'arm'])
+def test_cusum_resumes(cls, restart):
+    algo = _assert_resumes(lambda: cls(ARMS, warmup=50, threshold=10, restart=restart, rng=1), rounds=4000, stop=2500, change=1000)
+    
+    assert algo.param['restarts'] > 0
@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tools import RewardData
+
+ROUNDS = 1000
+
+def _write(fpath, arms, chunk_rounds=300, seed=0):
+    rng = np.random.default_rng(seed)
+    rewards = rng.integers(2, size=(ROUNDS, arms))
+    best_arm = rng.integers(arms, size=ROUNDS)
+    best_reward = rng.random(ROUNDS)
+    
+    writer = RewardData.create(fpath, ROUNDS, arms)
+    for begin in range(0, ROUNDS, chunk_rounds):
+        end = begin + chunk_rounds
+        writer.write(begin, rewards[begin:end], best_arm[begin:end], best_reward[begin:end])
+    writer.close()
+    
+    return rewards, best_arm, best_reward
+
+# arms which fill the last byte of the bit-packed rows exactly and partially
+@pytest.mark.parametrize('arms', [8, 13])
+def test_round_trip(tmp_path, arms):
+    fpath = str(tmp_path)
+    rewards, best_arm, best_reward = _write(fpath, arms)
+    assert RewardData.exists(fpath, ROUNDS, arms)
+    
+    for mmap in (True, False):
+        data = RewardData.load(fpath, arms, mmap=mmap)
+        assert len(data) == ROUNDS and data.contexts is None
+        assert np.array_equal(data[:], rewards) and np.array_equal(data[17], rewards[17])
+        assert np.array_equal(data.best_arm, best_arm) and np.array_equal(data.best_reward, best_reward)
+        assert all(data.reward(r, arm) == rewards[r, arm] for r in range(0, ROUNDS, 97) for arm in range(arms))
+    
+    for start in (0, 450):
+        chunks = list(data.iter_chunks(128, start=start))
+        assert [begin for begin, *_ in chunks] == list(range(start, ROUNDS, 128))
+        assert np.array_equal(np.concatenate([chunk[1] for chunk in chunks]), rewards[start:])
+        assert np.array_equal(np.concatenate([chunk[2] for chunk in chunks]), best_arm[start:])
+        assert np.array_equal(np.concatenate([chunk[3] for chunk in chunks]), best_reward[start:])
+
+def test_exists_rejects_other_or_truncated_dataset(tmp_path):
+    fpath = str(tmp_path)
+    assert not RewardData.exists(fpath, ROUNDS, 13)
+    
+    _write(fpath, 13)
+    assert not RewardData.exists(fpath, ROUNDS + 1, 13)
+    assert not RewardData.exists(fpath, ROUNDS, 20)
+    
+    with open(os.path.join(fpath, RewardData.FNAME), 'r+b') as f:
+        f.truncate(os.path.getsize(f.name) - 1)
+    assert not RewardData.exists(fpath, ROUNDS, 13)
@@ -1,3 +1,10 @@
 from .conf_loader import *
+from .reward_data import *
+from .data_store import *
 from .data_maker import *
-from .plotter import *
\ No newline at end of file
+from .plotter import *
+from .replica_simulator import *
+from .fast_simulator import *
+from .checkpoint import *
+from .profiler import *
+from .sweep import *
\ No newline at end of file
@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+import os
+import shutil
+import numpy as np
+
+__all__ = ['Checkpoint']
+
+class Checkpoint:
+    """ This class is for storing snapshot of experiment state, which is flat dict of arrays, and restoring it.
+    In `npz` format the snapshot is one `.npz` file. In `npy` format it is directory of `.npy` files,
+    which are loaded memory-mapped copy-on-write, so that large tensors such as LinUCB `A` are paged in lazily on resume.
+    Snapshot is written to temporary path first and renamed, so that crash while saving never breaks the previous one.
+    """
+    def __init__(self, fpath, every=0, fmt='npz'):
+        self.every = every
+        self.fmt = fmt
+        self.fpath = fpath + '.npz' if fmt == 'npz' else fpath
+        
+    def exists(self):
+        return os.path.exists(self.fpath)
+    
+    def remove(self):
+        if os.path.isdir(self.fpath):
+            shutil.rmtree(self.fpath)
+        elif os.path.isfile(self.fpath):
+            os.remove(self.fpath)
+    
+    def due(self, begin, end):
+        """ Returns True if a multiple of `every` rounds is passed in rounds [begin, end).
+        """
+        return self.every > 0 and (end // self.every) > (begin // self.every)
+        
+    def save(self, state):
+        dirname = os.path.dirname(self.fpath)
+        if dirname and not os.path.isdir(dirname):
+            os.makedirs(dirname)
+        
+        tmp = self.fpath + '.tmp'
+        if self.fmt == 'npz':
+            with open(tmp, 'wb') as f:
+                np.savez(f, **state)
+            os.replace(tmp, self.fpath)
+            
+        else:
+            if os.path.isdir(tmp):
+                shutil.rmtree(tmp)
+            os.makedirs(tmp)
+            for key, value in state.items():
+                np.save(os.path.join(tmp, key + '.npy'), value)
+            if os.path.isdir(self.fpath):
+                shutil.rmtree(self.fpath)
+            os.replace(tmp, self.fpath)
+        
+    def load(self):
+        if self.fmt == 'npz':
+            with np.load(self.fpath) as f:
+                return dict(f)
+        
+        return {fname[:-len('.npy')]: np.load(os.path.join(self.fpath, fname), mmap_mode='c')
+                for fname in os.listdir(self.fpath) if fname.endswith('.npy')}
@@ -1,10 +1,23 @@
 import json
+import inspect
+import numbers
 
-__all__ = ['ConfLoader']
+from .sweep import expand_grid
+
+__all__ = ['ConfLoader', 'ConfigError', 'AlgoSpec', 'ExperimentPlan']
+
+class ConfigError(ValueError):
+    """ This class is error of invalid config file, which lists every problem found in it, one per line.
+    """
+    def __init__(self, conf_name, errors):
+        self.conf_name = conf_name
+        self.errors = list(errors)
+        super().__init__('invalid config %s\n%s' % (conf_name, '\n'.join('  - %s' % e for e in self.errors)))
 
 class ConfLoader:
     """ Load json config file using DictWithAttributeAccess object_hook.
     ConfLoader(conf_name).opt attribute is the result of loading json config file.
+    ConfLoader(conf_name).get_plan(algo_map) checks it and compiles `ExperimentPlan` of it.
     """
     class DictWithAttributeAccess(dict):
         """ This inner class makes dict to be accessed same as class attribute.
@@ -21,8 +34,11 @@ class ConfLoader:
         self.opt = self.__get_opt()
         
     def __load_conf(self):
-        with open(self.conf_name, 'r') as conf:
-            opt = json.load(conf, object_hook = lambda dict: self.DictWithAttributeAccess(dict))
+        try:
+            with open(self.conf_name, 'r') as conf:
+                opt = json.load(conf, object_hook = lambda dict: self.DictWithAttributeAccess(dict))
+        except json.JSONDecodeError as e:
+            raise ConfigError(self.conf_name, ['line %d column %d: %s' % (e.lineno, e.colno, e.msg)]) from e
         
         return opt
     
@@ -30,4 +46,248 @@ class ConfLoader:
         opt = self.__load_conf()
         opt = self.DictWithAttributeAccess(opt)
         
-        return opt
\ No newline at end of file
+        return opt
+    
+    def get_plan(self, algo_map):
+        """ Returns `ExperimentPlan` of the config with algorithms of `algo_map`, or raises `ConfigError`.
+        """
+        return ExperimentPlan(self.opt, algo_map, self.conf_name)
+
+class Field:
+    """ This class is schema of one config value, which is its types, whether it is required, and allowed choices or range of it.
+    Keys of dict value are checked by `schema`, where unknown keys are errors if `strict`, and elements of list value are checked by `items`.
+    """
+    NAMES = {bool: 'bool', int: 'int', float: 'float', str: 'string', dict: 'object', list: 'list', type(None): 'null'}
+    
+    def __init__(self, types, required=False, choices=None, low=None, high=None, schema=None, strict=True, items=None):
+        self.types = types if isinstance(types, tuple) else (types,)
+        self.required = required
+        self.choices = choices
+        self.low = low
+        self.high = high
+        self.schema = schema
+        self.strict = strict
+        self.items = items
+    
+    def _is_type(self, value):
+        # bool is int in python, but not in config
+        if isinstance(value, bool):
+            return bool in self.types
+        return isinstance(value, self.types)
+    
+    @staticmethod
+    def _join(path, key):
+        return '%s.%s' % (path, key) if path else key
+    
+    def check(self, path, value):
+        """ Returns list of problems of the value at `path`, e.g. 'data.param.rounds: should be int, got string'.
+        """
+        if not self._is_type(value):
+            return ['%s: should be %s, got %s' % (path or 'config', ' or '.join(self.NAMES[t] for t in self.types), self.NAMES.get(type(value), type(value).__name__))]
+        if self.choices is not None and value not in self.choices:
+            return ['%s: should be one of %s, got %s' % (path, ', '.join(json.dumps(c) for c in self.choices), json.dumps(value))]
+        if value is not None and not isinstance(value, (dict, list, str)):
+            if self.low is not None and value < self.low:
+                return ['%s: should be >= %s, got %s' % (path, self.low, value)]
+            if self.high is not None and value > self.high:
+                return ['%s: should be <= %s, got %s' % (path, self.high, value)]
+        
+        errors = []
+        if self.schema is not None:
+            errors += ['%s: is required' % self._join(path, k) for k, field in self.schema.items() if field.required and k not in value]
+            for k, v in value.items():
+                if k in self.schema:
+                    errors += self.schema[k].check(self._join(path, k), v)
+                elif self.strict:
+                    errors.append('%s: unknown key, one of %s' % (self._join(path, k), ', '.join(self.schema)))
+        if self.items is not None:
+            for i, item in enumerate(value):
+                errors += self.items.check('%s[%d]' % (path, i), item)
+        
+        return errors
+
+class AlgoSpec:
+    """ This class is constructor of one algorithm, which is resolved from signature of its class once, instead of trying constructor calls.
+    Required arguments after the number of arms are taken from dataset information by `DATA_ARGS`, e.g. arm contexts of `LinUCB`,
+    and the other arguments are parameters of config, which are checked against names and types of their defaults, and values declared in `CHOICES` of the class, by `check`.
+    """
+    # required argument of constructor -> key of dataset information passed for it
+    DATA_ARGS = {'context': 'arms_context', 'dim': 'arms_context_dim'}
+    # optional arguments set by experiment, e.g. `replicas` by `replicas` of experiment config
+    EXPERIMENT_ARGS = ('rng', 'replicas')
+    
+    def __init__(self, name, cls, param=None):
+        self.name = name
+        self.cls = cls
+        self.param = {} if param is None else param
+        
+        # first argument is the number of arms
+        parameters = list(inspect.signature(cls).parameters.values())[1:]
+        args = [p for p in parameters if p.kind not in (p.VAR_POSITIONAL, p.VAR_KEYWORD)]
+        self.data_args = [p.name for p in args if p.default is p.empty and p.name in self.DATA_ARGS]
+        self.required = [p.name for p in args if p.default is p.empty and p.name not in self.DATA_ARGS]
+        self.defaults = {p.name: p.default for p in args if p.default is not p.empty}
+        self.kwargs = any(p.kind == p.VAR_KEYWORD for p in parameters)
+        # allowed values of string arguments declared by the class, e.g. {'index': ('scan', 'tree')}
+        self.choices = getattr(cls, 'CHOICES', {})
+        
+        # contextual algorithm needs arm contexts of dataset, and array-backed one simulates replicas by itself
+        self.contextual = bool(self.data_args)
+        self.replicas = 'replicas' in self.defaults
+    
+    @staticmethod
+    def _is_like(default, value):
+        """ True if the value has the type of the default, where any number is taken for number, and None default takes anything.
+        """
+        if default is None:
+            return True
+        if isinstance(default, bool) or isinstance(value, bool):
+            return isinstance(default, bool) and isinstance(value, bool)
+        if isinstance(default, numbers.Real):
+            return isinstance(value, numbers.Real)
+        
+        return isinstance(value, type(default))
+    
+    def check(self, path, param, contextual):
+        """ Returns list of problems of running the algorithm with `param` on dataset, which has arm contexts if `contextual`.
+        """
+        errors = []
+        for k, v in param.items():
+            if k in self.EXPERIMENT_ARGS or k in self.data_args:
+                errors.append('%s.%s: is given by experiment, not by config' % (path, k))
+            elif k in self.defaults:
+                if not self._is_like(self.defaults[k], v):
+                    errors.append('%s.%s: should be of the same type as its default %s, got %s' % (path, k, json.dumps(self.defaults[k], default=repr), json.dumps(v)))
+                elif k in self.choices and v not in self.choices[k]:
+                    errors.append('%s.%s: should be one of %s, got %s' % (path, k, ', '.join(map(json.dumps, self.choices[k])), json.dumps(v)))
+            elif k not in self.required and not self.kwargs:
+                errors.append('%s.%s: unknown parameter of %s, one of %s' % (path, k, self.cls.__name__, ', '.join(a for a in self.defaults if a not in self.EXPERIMENT_ARGS)))
+        errors += ['%s.%s: is required by %s' % (path, k, self.cls.__name__) for k in self.required if k not in param]
+        
+        if 'rng' not in self.defaults and not self.kwargs:
+            errors.append('%s: %s does not take rng argument' % (path, self.cls.__name__))
+        if self.contextual and not contextual:
+            errors.append('%s: %s needs contextual data, but data.param.contextual is false' % (path, self.cls.__name__))
+        
+        return errors
+    
+    def create(self, data_info, param=None, rng=None):
+        """ Returns instance of the algorithm on dataset of `data_info`, with `param` of config, or its own param if None.
+        """
+        args = [data_info[self.DATA_ARGS[k]] for k in self.data_args]
+        
+        return self.cls(data_info['arms'], *args, **(self.param if param is None else param), rng=rng)
+
+NUMBER = (int, float)
+SEED = Field((int, type(None)), low=0)
+
+class ExperimentPlan:
+    """ This class is experiment compiled from config, which is checked against `SCHEMA`, with `AlgoSpec` of each algorithm resolved up front.
+    Every problem of config is raised together as `ConfigError` when the plan is made, before any data is generated,
+    instead of failing deep into a run.
+    
+    `algos` is `AlgoSpec` of each algorithm in `algo` and `sweep` config, `jobs` is (algo_name, param, seed) of each run of `algo` config,
+    and `sweep` is (algo_name, swept keys, param) of each point of parameter grid of `sweep` config.
+    """
+    # keys of config which are not listed, e.g. `host` of server, are taken as they are
+    SCHEMA = Field(dict, strict=False, schema={
+        'name': Field(str, required=True),
+        'data': Field(dict, required=True, schema={
+            'enabled': Field(bool),
+            'chunk_rounds': Field(int, low=1),
+            'store': Field(dict, schema={'budget_gb': Field(NUMBER + (type(None),), low=0),
+                                         'verify': Field(str, choices=('size', 'full'))}),
+            'param': Field(dict, required=True, schema={
+                'stationary': Field(bool, required=True),
+                'contextual': Field(bool, required=True),
+                'rounds': Field(int, required=True, low=1),
+                'arms': Field(int, required=True, low=1),
+                'best_reward': Field(NUMBER, required=True, low=0, high=1),
+                'offset': Field(NUMBER, required=True, low=0, high=1),
+                'change_type': Field(str, choices=('abruptly', 'slowly')),
+                'change_num': Field(int, low=1),
+                'context_dim': Field(int, low=1),
+                'context_mode': Field(str, choices=('static', 'arm', 'user')),
+                'seed': SEED})}),
+        'algo': Field(dict, required=True, strict=False),
+        'sweep': Field(dict, strict=False),
+        'seed': SEED,
+        'seeds': Field(list, items=SEED),
+        'workers': Field(int, low=1),
+        'replicas': Field(int, low=1),
+        'plot_points': Field(int, low=1),
+        'instrument': Field(bool),
+        'fast': Field((bool, str), choices=(True, False, 'auto', 'numba', 'numpy')),
+        'batch': Field(dict, schema={'size': Field(int, required=True, low=1),
+                                     'delay': Field(int, low=0)}),
+        'checkpoint': Field(dict, schema={'every': Field(int, low=0),
+                                          'format': Field(str, choices=('npz', 'npy')),
+                                          'resume': Field(bool)})})
+    
+    def __init__(self, opt, algo_map, conf_name=None):
+        # algorithms are checked only on config of valid types
+        errors = self.SCHEMA.check('', opt)
+        if errors:
+            raise ConfigError(conf_name, errors)
+        
+        self.data = opt.data.param
+        errors += self._check_data(self.data)
+        
+        self.algos = {}
+        for name, param in list(opt.algo.items()) + [(name, opt.algo.get(name, {})) for name in opt.get('sweep', {}) if name not in opt.algo]:
+            errors += self._add_algo(name, param, algo_map, 'algo' if name in opt.algo else 'sweep')
+        
+        # single `seed`, as of server config, is the same as `seeds` of the one seed
+        if 'seed' in opt and 'seeds' in opt:
+            errors.append('seed: should not be given together with seeds, got %s and %s' % (json.dumps(opt.seed), json.dumps(opt.seeds)))
+        self.seeds = opt.get('seeds', [opt.get('seed')])
+        self.jobs = [(name, param, seed) for name, param in opt.algo.items() for seed in self.seeds]
+        
+        self.sweep = []
+        for name, grid in opt.get('sweep', {}).items():
+            errors += self._add_sweep(name, grid, opt.algo.get(name, {}))
+        
+        if errors:
+            # the same problem of every sweep point is listed once
+            raise ConfigError(conf_name, list(dict.fromkeys(errors)))
+    
+    @staticmethod
+    def _check_data(param):
+        errors = []
+        if not param.stationary:
+            errors += ['data.param.%s: is required for non-stationary data' % k for k in ['change_type', 'change_num'] if k not in param]
+        if param.offset > param.best_reward:
+            errors.append('data.param.offset: should be <= best_reward %s, got %s' % (param.best_reward, param.offset))
+        
+        return errors
+    
+    def _add_algo(self, name, param, algo_map, section):
+        path = '%s.%s' % (section, name)
+        if not isinstance(param, dict):
+            return ['%s: should be object of parameters, got %s' % (path, json.dumps(param))]
+        try:
+            cls = algo_map[name]
+        except KeyError:
+            return ['%s: unknown algorithm, one of %s' % (path, ', '.join(algo_map))]
+        except ImportError as e:
+            return ['%s: algorithm can not be imported, %s' % (path, e)]
+        
+        self.algos[name] = AlgoSpec(name, cls, param)
+        
+        return self.algos[name].check(path, param, self.data.contextual) if section == 'algo' else []
+    
+    def _add_sweep(self, name, grid, param):
+        path = 'sweep.%s' % name
+        if not isinstance(grid, dict):
+            return ['%s: should be object of parameter grid, got %s' % (path, json.dumps(grid))]
+        if name not in self.algos:
+            return []
+        
+        try:
+            points = expand_grid(dict(param, **grid))
+        except (KeyError, TypeError, ValueError):
+            return ['%s: range should be {start, stop, num} or {start, stop, step} of numbers' % path]
+        
+        self.sweep += [(name, list(grid), point) for point in points]
+        
+        return [e for point in points for e in self.algos[name].check(path, point, self.data.contextual)]
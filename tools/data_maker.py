@@ -1,26 +1,33 @@
 # -*- coding: utf-8 -*-
 import os
-os.environ['OMP_NUM_THREADS'] = '1'
 import sys
-import random
 import pickle
+import shutil
 import logging
 import datetime
 import numpy as np
-import matplotlib.pyplot as plt
 
-from tqdm import tqdm
 from .conf_loader import *
+from .reward_data import *
+from .data_store import *
 
 __all__ = ['DataMaker']
 
 class DataMaker:
-    """ This class is for making synthetic reward dataset and its information as pickle type file.
+    """ This class is for making synthetic reward dataset as bit-packed `.npy` file and its information as pickle type file.
     If data is already made, making data process will be skipped.
+    
+    Datasets are kept in `DataStore` keyed by hash of all parameters in data config, so changing any of them (e.g. `change_num`, `context_dim`)
+    makes new dataset, and same `seed` makes identical one. Reward schedule, reward draws, contexts and plot colors are drawn from
+    separate streams spawned from `SeedSequence(seed)`, so that e.g. changing `rounds` keeps the contexts. Disk budget and integrity check of the store are set by `store` in data config,
+    e.g. {"budget_gb": 10, "verify": "full"}. Dataset of config without `seed` is not reproducible, so it is made again at every run and not stored.
     """
+    # number of (round, arm) rewards drawn at once
+    BLOCK_SIZE = 1 << 22
+    
     def __init__(self, opt):
         self.opt = opt
-        self.data = {}
+        self.lock = None
         
         self._get_dirs()
         
@@ -29,8 +36,14 @@ class DataMaker:
         stat = '' if param.stationary else '%s_non' % param.change_type
         cont = '' if param.contextual else 'non_'
         
+        conf = self.opt.data.get('store', {})
+        budget = conf.get('budget_gb')
+        self.store = DataStore('./data', None if budget is None else int(budget * 2 ** 30), conf.get('verify', 'size'))
+        self.key = self.store.key(param)
+        
+        # readable prefix is kept for browsing, the hash makes path unique to the parameters
         self.dir = './data/{}stationary_{}contextual'.format(stat, cont)
-        self.sub_dir = 'r%d-a%d-br%0.2f-off%0.2f' % (param.rounds, param.arms, param.best_reward, param.offset)
+        self.sub_dir = 'r%d-a%d-br%0.2f-off%0.2f-%s' % (param.rounds, param.arms, param.best_reward, param.offset, self.key[:12])
             
     def _logging(self, fpath):
         self.logger = logging.getLogger('DataMaker')
@@ -42,107 +55,163 @@ class DataMaker:
             handler.setFormatter(formatter)
             self.logger.addHandler(handler)
         
+    def _get_rng(self, param):
+        streams = np.random.SeedSequence(param.get('seed')).spawn(5)
+        self.rng = dict(zip(['schedule', 'reward', 'context', 'plot', 'round_context'], [np.random.default_rng(s) for s in streams]))
+        
     def _get_arms_reward(self, param):
         """ One of the arms will get best reward probability of bernoulli distribution, and others will get some value as low as offset amount.
-        Return class attribute reward_list (list type) that each index arm have its own reward value
+        Return class attribute reward_list (array type) that each index arm have its own reward value
         """
         reward = param.best_reward - param.offset
-        self.reward_list = [reward] * param.arms
-
-        self.best_arm_idx = np.random.randint(param.arms)
+        self.reward_list = np.full(param.arms, reward)
+        
+        self.best_arm_idx = int(self.rng['schedule'].integers(param.arms))
         self.reward_list[self.best_arm_idx] += param.offset
         
         self.best_arm_idx_list = [self.best_arm_idx]
-
-    def __change_arms_reward(self, round, param):
-        """ This function is for non_stationary data setting.
-        Returns changed flag and change the reward_list according to `change_type` and `change_num`.
+        self.change_rounds = [0]
+    
+    def _get_reward_schedule(self, param):
+        """ Precompute reward probabilities of all rounds as piecewise linear segments.
+        Reward of arm at round r in segment k is clip(start[k] + (r - round[k] + 1) * slope[k], best_reward - offset, best_reward).
         
-        In abruptly change_type, randomly choose one of the arms to be next best arm and it will get `best_reward` in sudden point.
+        In stationary setting, there is only one segment with zero slope.
+        In abruptly change_type, reward_list is shuffled at every change point, so the best arm changes in sudden point.
         In slowly change_type, randomly choose one of the arms to be next best arm and its reward will slowly increase to `best_reward`. Oppositely, previous best arm's reward will slowly decrease.
+        Best arm is switched to the next one at the middle of each segment, and `change_rounds` records when the best arm is changed.
         """
-        changed = False
-        if param.change_type == 'abruptly':
-            change_round = int(param.rounds / param.get('change_num', 10))
-            if round > 0 and round % change_round == 0:
-                changed = True
-                random.shuffle(self.reward_list)
-                self.best_arm_idx = np.argmax(self.reward_list)
-                self.best_arm_idx_list.append(self.best_arm_idx)
+        reward_list = self.reward_list.copy()
+        self.schedule = {'round': [], 'start': [], 'slope': []}
         
-        elif param.change_type == 'slowly':
-            change_round = int(param.rounds / param.get('change_num', 10))
-            change_by = param.offset / change_round
-            if round % change_round == 0:
-                self.prev_best = self.best_arm_idx
-                self.next_best = np.random.randint(param.arms)
+        change_round = param.rounds if param.stationary else int(param.rounds / param.get('change_num', 10))
+        for r in range(0, param.rounds, change_round):
+            slope = np.zeros(param.arms)
+            if param.stationary:
+                pass
             
-            for a, r in enumerate(self.reward_list):
-                if a == self.prev_best:
-                    self.reward_list[a] = min(max(r - change_by, param.best_reward - param.offset), param.best_reward)
-                if a == self.next_best:
-                    self.reward_list[a] = min(max(r + change_by, param.best_reward - param.offset), param.best_reward)
-            
-            if round % change_round != 0 and round % (change_round / 2) == 0:
-                changed = True
-                self.best_arm_idx = self.next_best
+            elif param.change_type == 'abruptly' and r > 0:
+                self.rng['schedule'].shuffle(reward_list)
+                self.best_arm_idx = np.argmax(reward_list)
                 self.best_arm_idx_list.append(self.best_arm_idx)
+                self.change_rounds.append(r)
+                
+            elif param.change_type == 'slowly':
+                change_by = param.offset / change_round
+                prev_best, next_best = self.best_arm_idx, int(self.rng['schedule'].integers(param.arms))
+                slope[prev_best] = -change_by
+                slope[next_best] = change_by
                 
-        return changed
+                # the best arm is switched at the middle of segment, which exists only if change_round is even
+                if change_round % 2 == 0 and r + change_round // 2 < param.rounds:
+                    self.best_arm_idx = next_best
+                    self.best_arm_idx_list.append(self.best_arm_idx)
+                    self.change_rounds.append(r + change_round // 2)
+            
+            self.schedule['round'].append(r)
+            self.schedule['start'].append(reward_list.copy())
+            self.schedule['slope'].append(slope)
+            
+            length = min(change_round, param.rounds - r)
+            reward_list = np.clip(reward_list + length * slope, param.best_reward - param.offset, param.best_reward)
+            
+        self.schedule = {k: np.array(v) for k, v in self.schedule.items()}
+        
+    def _get_block_reward(self, begin, end, param):
+        """ Returns (end - begin, arms) reward probabilities and best arm index of the rounds in [begin, end).
+        """
+        rounds = np.arange(begin, end)
+        seg = np.searchsorted(self.schedule['round'], rounds, side='right') - 1
+        steps = (rounds - self.schedule['round'][seg] + 1)[:, None]
+        probs = self.schedule['start'][seg] + steps * self.schedule['slope'][seg]
+        probs = np.clip(probs, param.best_reward - param.offset, param.best_reward)
+        
+        best = np.asarray(self.best_arm_idx_list)[np.searchsorted(self.change_rounds, rounds, side='right') - 1]
+        
+        return probs, best
     
     def _make_data(self, param):
+        """ Draw rewards of whole blocks of rounds at once, comparing uniform samples with precomputed reward probabilities.
+        Each block is appended to dataset files right away, so memory does not grow with the number of rounds.
+        Block size can be set by `chunk_rounds` in data config.
+        """
         rounds = param.rounds
         arms = param.arms
-        self.round_rewards = {}
-
-        changed = False
-        checkpoint = 0
-        best_rewards = []
-        fig = plt.figure(figsize=(7, 5))
-        color = (random.random(), random.random(), random.random())
+        block = self.opt.data.get('chunk_rounds', max(1, self.BLOCK_SIZE // arms))
         
-        for r in tqdm(range(rounds), ascii=True, desc='rounds'):
-            self.data[r] = []
-            if not param.stationary:
-                changed = self.__change_arms_reward(r, param)
-                
-            if changed:
-                plt.plot(range(checkpoint, checkpoint + len(best_rewards)), best_rewards, 'o', c=color)
-                color = (random.random(), random.random(), random.random())
-                best_rewards = []
-                checkpoint = r
+        self._get_reward_schedule(param)
+        
+        # tqdm is imported on use, so that importing `tools` does not import it
+        from tqdm import tqdm
+        fpath = os.path.join(self.dir, self.sub_dir)
+        writer = RewardData.create(fpath, rounds, arms)
+        for begin in tqdm(range(0, rounds, block), ascii=True, desc='rounds'):
+            end = min(begin + block, rounds)
+            probs, best = self._get_block_reward(begin, end, param)
             
-            best_rewards.append(self.reward_list[self.best_arm_idx])
             # to calculate regret easily, just store best_arm_idx and its reward value
-            self.round_rewards[r] = (self.best_arm_idx, self.reward_list[self.best_arm_idx])
-            
-            for arm in range(arms):
-                reward = np.random.binomial(1, self.reward_list[arm])
-                if reward == 1:
-                    self.data[r].append(arm)
-
-        fpath = os.path.join(self.dir, self.sub_dir, 'data.pickle')
-        with open(fpath, 'wb') as f:
-            pickle.dump(self.data, f)
+            writer.write(begin, self.rng['reward'].random(probs.shape) < probs, best, probs[np.arange(end - begin), best])
+        writer.close()
+        
+        self.__plot_best_reward(RewardData.load(fpath, arms).best_reward, param)
+        
+        self.logger.info('Making data is accomplished')
+        self.logger.info('=' * 60)
+        
+    def __plot_best_reward(self, best_reward, param, points=2000):
+        """ Plot reward of best arm in each period between changes, using at most `points` points for each period.
+        """
+        import matplotlib.pyplot as plt
+        
+        fig = plt.figure(figsize=(7, 5))
+        bounds = self.change_rounds + [param.rounds]
+        for begin, end in zip(bounds[:-1], bounds[1:]):
+            x = np.arange(begin, end, max(1, (end - begin) // points))
+            color = tuple(self.rng['plot'].random(3))
+            plt.plot(x, best_reward[x], 'o', c=color)
             
-        if best_rewards:
-            plt.plot(range(checkpoint, checkpoint + len(best_rewards)), best_rewards, 'o', c=color)
-        plt.plot(range(rounds), [param.best_reward-param.offset]*rounds, 'o', c=(0.5, 0.5, 0.5))
+        x = np.arange(0, param.rounds, max(1, param.rounds // points))
+        plt.plot(x, [param.best_reward-param.offset]*len(x), 'o', c=(0.5, 0.5, 0.5))
         plt.ylim(0, 1)
         fig.savefig(os.path.join(self.dir, self.sub_dir, 'arms_reward.png'))
+        plt.close(fig)
+    
+    def _make_contexts(self, param):
+        """ If `context_mode` is 'arm' or 'user', draw per-round contexts in blocks of rounds into memory-mapped `contexts.npy`,
+        which is (rounds, arms, d) context of each arm in 'arm' mode, and (rounds, d) user feature of each round in 'user' mode.
+        Context of arm in 'user' mode is product of the user feature and fixed context of the arm (see `RewardData.get_contexts`),
+        so it is meaningful for LinUCB, HybridLinUCB and Context_ThompsonSampling alike.
+        Default 'static' mode has only fixed context of each arm in info.pickle.
+        """
+        mode = param.get('context_mode', 'static')
+        if not param.contextual or mode == 'static':
+            return
         
-        self.logger.info('Making data is accomplished')
+        dim = param.get('context_dim', 40)
+        shape = (param.rounds, param.arms, dim) if mode == 'arm' else (param.rounds, dim)
+        contexts = np.lib.format.open_memmap(os.path.join(self.dir, self.sub_dir, RewardData.CONTEXT_FNAME), mode='w+', dtype=np.float32, shape=shape)
+        
+        block = max(1, self.BLOCK_SIZE // int(np.prod(shape[1:])))
+        from tqdm import tqdm
+        for begin in tqdm(range(0, param.rounds, block), ascii=True, desc='contexts'):
+            end = min(begin + block, param.rounds)
+            contexts[begin:end] = self.rng['round_context'].random((end - begin,) + shape[1:], dtype=np.float32)
+        contexts.flush()
+        del contexts
+        
+        self.logger.info('%s context of each round is stored' % mode)
         self.logger.info('=' * 60)
-
+    
     # If `contextual=True` setting, contexts of each arm will be also stored in info.pickle
     def __get_arms_context(self, info, param):
-        arms_context = {}
         dim = param.get('context_dim', 40)
-        for arm in range(param.arms):
-            arms_context[arm] = np.random.rand(dim)
         
-        info['arms_context'] = arms_context
+        info['arms_context'] = dict(enumerate(self.rng['context'].random((param.arms, dim))))
         info['arms_context_dim'] = dim
+        
+        # user features of rounds are combined with the fixed contexts when read
+        if param.get('context_mode', 'static') == 'user':
+            np.save(os.path.join(self.dir, self.sub_dir, RewardData.ARMS_CONTEXT_FNAME), np.stack(list(info['arms_context'].values())))
     
     def _store_data_info(self, param):
         info = {}
@@ -152,8 +221,8 @@ class DataMaker:
         info['best_reward'] = param.best_reward
         info['offset'] = param.offset
         info['best_arm_idx'] = self.best_arm_idx_list
-        info['round_rewards'] = self.round_rewards
-        self.logger.info('rounds, arms_number, best_reward, offset, best_arm_index, each rounds reward, and stationary or contextual information is stored')
+        info['change_rounds'] = self.change_rounds
+        self.logger.info('rounds, arms_number, best_reward, offset, best_arm_index, and stationary or contextual information is stored')
         
         info['stationary'] = param.stationary
         if not param.stationary:
@@ -163,6 +232,7 @@ class DataMaker:
         
         info['contextual'] = param.contextual
         if param.contextual:
+            info['context_mode'] = param.get('context_mode', 'static')
             self.__get_arms_context(info, param)
             self.logger.info('context vector of arms information is stored')
             
@@ -172,24 +242,49 @@ class DataMaker:
             
         self.logger.info('Storing data information is accomplished')
         self.logger.info('=' * 60)
-
+    
+    def _make(self, param, cache):
+        fpath = os.path.join(self.dir, self.sub_dir)
+        # leftover of interrupted or broken making process
+        if os.path.isdir(fpath):
+            shutil.rmtree(fpath)
+        os.makedirs(fpath)
+        
+        self._get_rng(param)
+        self._get_arms_reward(param)
+        self._make_data(param)
+        self._make_contexts(param)
+        self._store_data_info(param)
+        
+        if not cache:
+            self.logger.info('dataset is not stored since data config has no seed')
+            return
+        
+        for key in self.store.add(self.key, fpath, param):
+            self.logger.info('dataset %s is evicted from the store' % key)
+        self.logger.info('dataset is stored with key %s' % self.key)
+    
     def run(self):
         _begin = datetime.datetime.now()
         
         self._logging(os.path.join('./results', self.sub_dir, self.opt.name, 'mab_experiment.log'))
-        fpath = os.path.join(self.dir, self.sub_dir)
-        if os.path.isfile(os.path.join(fpath, 'data.pickle')):
+        param = self.opt.data.param
+        # dataset without seed differs at every making, so it is made again each run and not kept in the store
+        cache = param.get('seed') is not None
+        # lock of the dataset is held while this process runs, so that other processes do not evict or remake it
+        if self.lock is None:
+            self.lock = self.store.lock(self.key)
+        made = cache and self.store.lookup(self.key)
+        if not made:
+            with self.store.exclusive(self.lock):
+                # other process may have made it while waiting for the lock
+                made = cache and self.store.lookup(self.key)
+                if not made:
+                    self._make(param, cache)
+        
+        if made:
             self.logger.debug('Data is already made')
             self.logger.info('=' * 60)
-            
-        else:
-            if not os.path.isdir(fpath):
-                os.makedirs(fpath)
-
-            param = self.opt.data.param
-            self._get_arms_reward(param)
-            self._make_data(param)
-            self._store_data_info(param)
         
         _end = datetime.datetime.now()
         
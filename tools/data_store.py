@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+import os
+import json
+import time
+import shutil
+import hashlib
+import contextlib
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+__all__ = ['DataStore']
+
+def _flock(f, shared=False, block=True):
+    """ Lock file `f` by `flock`, and returns False if `block` is false and other process holds the lock.
+    Platforms without fcntl, e.g. Windows, have no lock, where processes sharing the store should not run at the same time.
+    """
+    if fcntl is None:
+        return True
+    try:
+        fcntl.flock(f, (fcntl.LOCK_SH if shared else fcntl.LOCK_EX) | (0 if block else fcntl.LOCK_NB))
+    except BlockingIOError:
+        return False
+    
+    return True
+
+class DataStore:
+    """ This class is content-addressed store of datasets made by `DataMaker`, keyed by hash of all generation parameters including seed.
+    `index.json` in the root directory records path, parameters, size and checksum of files of each dataset, and when it was last used.
+    
+    Dataset found in index is checked before reuse, by file sizes (`verify='size'`) or by sha256 of files (`verify='full'`),
+    and broken one is removed to be made again. If `budget` bytes is set, least recently used datasets are evicted
+    whenever a new one is added, until the total size fits in the budget. Index is updated under file lock,
+    so that experiments running at the same time can share the store.
+    
+    Each dataset also has lock file of its own key, which is held shared while the dataset is used and exclusive while it is made,
+    so that it is made by one process at a time, and is not evicted while other process uses it.
+    """
+    INDEX_FNAME = 'index.json'
+    LOCK_DIR = 'locks'
+    # bumped when generation process changes, so that datasets made by old process are not reused
+    VERSION = 3
+    
+    def __init__(self, root='./data', budget=None, verify='size'):
+        self.root = root
+        self.budget = budget
+        self.verify = verify
+    
+    @classmethod
+    def key(cls, param):
+        return hashlib.sha256(json.dumps(dict(param, version=cls.VERSION), sort_keys=True).encode()).hexdigest()
+    
+    @contextlib.contextmanager
+    def _index(self):
+        """ Yields index dict under exclusive lock, and writes it back atomically.
+        """
+        if not os.path.isdir(self.root):
+            os.makedirs(self.root)
+        
+        fpath = os.path.join(self.root, self.INDEX_FNAME)
+        with open(fpath + '.lock', 'w') as lock:
+            _flock(lock)
+            try:
+                with open(fpath, 'r') as f:
+                    index = json.load(f)
+            except (FileNotFoundError, ValueError):
+                index = {}
+            
+            yield index
+            
+            with open(fpath + '.tmp', 'w') as f:
+                json.dump(index, f, indent=4)
+            os.replace(fpath + '.tmp', fpath)
+    
+    def lock(self, key):
+        """ Returns lock file of the key under shared lock, which is held until the file is closed or the process exits.
+        """
+        dpath = os.path.join(self.root, self.LOCK_DIR)
+        if not os.path.isdir(dpath):
+            os.makedirs(dpath, exist_ok=True)
+        
+        lock = open(os.path.join(dpath, key + '.lock'), 'w')
+        _flock(lock, shared=True)
+        
+        return lock
+    
+    @staticmethod
+    @contextlib.contextmanager
+    def exclusive(lock):
+        """ Turns shared lock from `lock` into exclusive one, which waits until other processes using the dataset release it.
+        """
+        _flock(lock)
+        try:
+            yield
+        finally:
+            _flock(lock, shared=True)
+    
+    def _evict(self, index, key):
+        """ Remove dataset of the key unless other process holds its lock, and returns True if removed.
+        """
+        with open(os.path.join(self.root, self.LOCK_DIR, key + '.lock'), 'w') as lock:
+            if not _flock(lock, block=False):
+                return False
+            self._remove(index, key)
+        
+        return True
+    
+    @staticmethod
+    def _sha256(fpath, block=1 << 20):
+        sha = hashlib.sha256()
+        with open(fpath, 'rb') as f:
+            for chunk in iter(lambda: f.read(block), b''):
+                sha.update(chunk)
+        
+        return sha.hexdigest()
+    
+    def _check(self, entry):
+        for fname, (size, sha) in entry['files'].items():
+            fpath = os.path.join(self.root, entry['path'], fname)
+            if not os.path.isfile(fpath) or os.path.getsize(fpath) != size:
+                return False
+            if self.verify == 'full' and self._sha256(fpath) != sha:
+                return False
+        
+        return True
+    
+    def _remove(self, index, key):
+        entry = index.pop(key)
+        shutil.rmtree(os.path.join(self.root, entry['path']), ignore_errors=True)
+    
+    def lookup(self, key):
+        """ Returns True if dataset of the key is in the store and passes integrity check, and marks it as used.
+        Dataset failing the check is dropped from the store, and its files are removed only if no process holds its lock,
+        otherwise by `DataMaker` making it again under exclusive lock.
+        """
+        with self._index() as index:
+            if key not in index:
+                return False
+            if not self._check(index[key]):
+                if not self._evict(index, key):
+                    index.pop(key)
+                return False
+            
+            index[key]['last_used'] = time.time()
+        
+        return True
+    
+    def add(self, key, fpath, param):
+        """ Register dataset made in `fpath` under the key, then evict least recently used datasets over budget.
+        Datasets in use by other processes are skipped. Returns list of evicted keys.
+        """
+        files = {}
+        for fname in sorted(os.listdir(fpath)):
+            if os.path.isfile(os.path.join(fpath, fname)):
+                files[fname] = (os.path.getsize(os.path.join(fpath, fname)), self._sha256(os.path.join(fpath, fname)))
+        
+        evicted = []
+        with self._index() as index:
+            index[key] = {'path': os.path.relpath(fpath, self.root),
+                          'param': param,
+                          'files': files,
+                          'size': sum(size for size, _ in files.values()),
+                          'created': time.time(),
+                          'last_used': time.time()}
+            
+            if self.budget is not None:
+                total = sum(entry['size'] for entry in index.values())
+                for other in sorted(index, key=lambda k: index[k]['last_used']):
+                    if total <= self.budget:
+                        break
+                    size = index[other]['size']
+                    if other != key and self._evict(index, other):
+                        total -= size
+                        evicted.append(other)
+        
+        return evicted
@@ -0,0 +1,275 @@
+# -*- coding: utf-8 -*-
+import math
+import importlib.util
+import numpy as np
+
+from algorithm.utils import rand_argmax
+
+__all__ = ['FastSimulator']
+
+# kernels are plain functions until `_compile` replaces them with compiled ones
+_KERNELS = []
+
+def _jit(func):
+    _KERNELS.append(func.__name__)
+    return func
+
+def _compile():
+    """ Compile kernels of this module with numba on first use, so that importing this module does not import numba.
+    Kernels call each other through module globals, which numba resolves when each kernel is compiled at its first call.
+    """
+    import numba
+    for name in _KERNELS:
+        globals()[name] = numba.njit(cache=True, nogil=True)(globals()[name])
+    _KERNELS.clear()
+
+@_jit
+def _rand_argmax(values, rng):
+    """ Same as `rand_argmax`, including the draw from `rng` only on ties, so the same arm is selected.
+    """
+    best, ties = 0, 1
+    for a in range(1, len(values)):
+        if values[a] > values[best]:
+            best, ties = a, 1
+        elif values[a] == values[best]:
+            ties += 1
+    if ties == 1:
+        return best
+    
+    k = rng.integers(0, ties)
+    for a in range(best, len(values)):
+        if values[a] == values[best]:
+            if k == 0:
+                return a
+            k -= 1
+    
+    return best
+
+@_jit
+def _egreedy_kernel(rewards, n, mean, rounds, c, d, rng):
+    arms = len(n)
+    selected = np.empty(len(rewards), dtype=np.int64)
+    for i in range(len(rewards)):
+        if not rng.binomial(1, min(1, (c * arms) / (d ** 2 * rounds))):
+            arm = _rand_argmax(mean, rng)
+        else:
+            arm = rng.integers(0, arms)
+        
+        n[arm] += 1
+        mean[arm] += (rewards[i, arm] - mean[arm]) / n[arm]
+        rounds += 1
+        selected[i] = arm
+    
+    return selected, rounds
+
+@_jit
+def _ucb_kernel(rewards, n, mean, rounds, rng):
+    index = np.empty(len(n))
+    selected = np.empty(len(rewards), dtype=np.int64)
+    for i in range(len(rewards)):
+        bound = 2 * np.log(rounds)
+        for a in range(len(n)):
+            index[a] = mean[a] + np.sqrt(bound / n[a])
+        arm = _rand_argmax(index, rng)
+        
+        n[arm] += 1
+        mean[arm] += (rewards[i, arm] - mean[arm]) / n[arm]
+        rounds += 1
+        selected[i] = arm
+    
+    return selected, rounds
+
+@_jit
+def _thompson_kernel(rewards, alpha, beta, rng):
+    sample = np.empty(len(alpha))
+    selected = np.empty(len(rewards), dtype=np.int64)
+    for i in range(len(rewards)):
+        # drawn one by one in the same order as `rng.beta(alpha, beta)` draws them at once
+        for a in range(len(alpha)):
+            sample[a] = rng.beta(alpha[a], beta[a])
+        arm = _rand_argmax(sample, rng)
+        
+        alpha[arm] += rewards[i, arm]
+        beta[arm] += 1 - rewards[i, arm]
+        selected[i] = arm
+    
+    return selected
+
+@_jit
+def _kl(p, q):
+    return p * np.log(p / q) + (1 - p) * np.log((1 - p) / (1 - q))
+
+@_jit
+def _kl_index(n, mean, bound, q0, tol, maxiter, epsilon):
+    """ Scalar version of `KLIndex._solve`, Newton iterations from `q0` or upper bound of the root if it is nan, and bisection if they did not converge.
+    """
+    p = min(max(mean, epsilon), 1 - epsilon)
+    d = max(bound, 0.) / n
+    hi = 1 - epsilon
+    if _kl(p, hi) <= d:
+        return 1.
+    if d <= 0:
+        return p
+    
+    if np.isnan(q0):
+        q0 = min(p + np.sqrt(d / 2), 1 - (1 - p) * np.exp(-(d - p * np.log(p)) / (1 - p)))
+    q = min(max(q0, p + epsilon), hi)
+    for _ in range(maxiter):
+        f = _kl(p, q) - d
+        q_next = min(max(q - f / ((q - p) / (q * (1 - q))), p), hi)
+        if abs(f) <= tol:
+            return q_next
+        if not np.isfinite(q_next):
+            break
+        q = q_next
+    
+    lo = p
+    for _ in range(int(np.ceil(np.log2(1 / tol)))):
+        mid = (lo + hi) / 2
+        if _kl(p, mid) > d:
+            hi = mid
+        else:
+            lo = mid
+    
+    return lo
+
+@_jit
+def _kl_ucb_kernel(rewards, n, mean, rounds, c, lazy_bound, refresh, cache_n, cache_mean, cache_bound, cache_index, tol, maxiter, epsilon, rng):
+    """ Refreshes bound lazily and keeps cache of `KLIndex` as `KL_UCB` does, so arms are warm started from the same index
+    and the bound and the cache stay valid after the chunk.
+    """
+    selected = np.empty(len(rewards), dtype=np.int64)
+    for i in range(len(rewards)):
+        bound = np.log(rounds) + c * np.log(max(np.log(rounds), 1))
+        if bound > lazy_bound * (1 + refresh):
+            lazy_bound = bound
+        bound = lazy_bound
+        for a in range(len(n)):
+            same = cache_n[a] == n[a] and cache_mean[a] == mean[a]
+            if bound != cache_bound or not same:
+                cache_index[a] = _kl_index(n[a], mean[a], bound, cache_index[a] if same else np.nan, tol, maxiter, epsilon)
+                cache_n[a], cache_mean[a] = n[a], mean[a]
+        cache_bound = bound
+        arm = _rand_argmax(cache_index, rng)
+        
+        n[arm] += 1
+        mean[arm] += (rewards[i, arm] - mean[arm]) / n[arm]
+        rounds += 1
+        selected[i] = arm
+    
+    return selected, rounds, lazy_bound, cache_bound
+
+class FastSimulator:
+    """ This class is fused select arm -> get reward -> update parameter loop of a chunk of rounds for `Egreedy`, `UCB`, `KL_UCB` and `ThompsonSampling`,
+    to be used in place of `MABexp._run_chunk` on non-contextual datasets. Learned state is updated in place in arrays of the policy,
+    so that checkpoint and regret of the chunk are handled by the caller as usual.
+    
+    With `numba` (0.56 or later for `np.random.Generator` support), whole chunk runs in one compiled call, which draws from `rng` of the policy
+    in the same order as the policy does, and keeps cache of `KLIndex` as it does, so the result is the same as `_run_chunk`
+    up to rounding of math functions, which may break exact ties of `KL_UCB` index differently.
+    Without numba (or `backend='numpy'`), the loop runs in Python with method dispatch of the policy removed, and gives exactly the same result as `_run_chunk`.
+    Policies using `replicas` or `index='tree'` are not supported, see `supports`.
+    """
+    def __init__(self, backend='auto'):
+        if backend == 'auto':
+            backend = 'numba' if importlib.util.find_spec('numba') is not None else 'numpy'
+        self.backend = backend
+        if self.backend == 'numba' and _KERNELS:
+            _compile()
+    
+    # algorithms are told by class and module name, so that the check does not import the other algorithms
+    ALGORITHMS = ('Egreedy', 'UCB', 'KL_UCB', 'ThompsonSampling')
+    
+    @classmethod
+    def _get_name(cls, algo):
+        name = type(algo).__name__
+        return name if name in cls.ALGORITHMS and type(algo).__module__ == 'algorithm.' + name else None
+    
+    @classmethod
+    def supports(cls, algo):
+        return cls._get_name(algo) is not None and algo.rows is None and getattr(algo, 'tree', None) is None
+    
+    def run_chunk(self, algo, rewards):
+        """ Returns array of selected arm of each round of (chunk, arms) 0/1 rewards.
+        """
+        name = self._get_name(algo)
+        if self.backend == 'numba':
+            if name == 'ThompsonSampling':
+                return _thompson_kernel(rewards, algo.alpha, algo.beta, algo.rng)
+            if name == 'Egreedy':
+                selected, rounds = _egreedy_kernel(rewards, algo.n, algo.reward_mean, int(algo.rounds), algo.c, algo.d, algo.rng)
+            elif name == 'UCB':
+                selected, rounds = _ucb_kernel(rewards, algo.n, algo.reward_mean, int(algo.rounds), algo.rng)
+            else:
+                kl = algo.kl_index
+                selected, rounds, algo.bound, kl.cache['bound'] = _kl_ucb_kernel(rewards, algo.n, algo.reward_mean, int(algo.rounds), algo.c, float(algo.bound), float(algo.refresh),
+                                                                                 kl.cache['n'], kl.cache['mean'], float(kl.cache['bound']), kl.cache['index'],
+                                                                                 kl.tol, kl.maxiter, kl.epsilon, algo.rng)
+            algo.rounds = rounds
+            return selected
+        
+        return getattr(self, '_run_%s' % name.lower())(algo, rewards)
+    
+    @staticmethod
+    def _run_egreedy(algo, rewards):
+        n, mean, rng, rounds = algo.n, algo.reward_mean, algo.rng, algo.rounds
+        arms, c, d = algo.arms, algo.c, algo.d
+        selected = np.zeros(len(rewards), dtype=int)
+        for i in range(len(rewards)):
+            if not rng.binomial(1, min(1, (c * arms) / (pow(d, 2) * rounds))):
+                arm = rand_argmax(mean, rng)
+            else:
+                arm = rng.integers(arms)
+            
+            n[arm] += 1
+            mean[arm] += (int(rewards[i, arm]) - mean[arm]) / n[arm]
+            rounds += 1
+            selected[i] = arm
+        
+        algo.rounds = rounds
+        return selected
+    
+    @staticmethod
+    def _run_ucb(algo, rewards):
+        n, mean, rng, rounds = algo.n, algo.reward_mean, algo.rng, algo.rounds
+        selected = np.zeros(len(rewards), dtype=int)
+        for i in range(len(rewards)):
+            arm = rand_argmax(mean + np.sqrt(2 * math.log(rounds) / n), rng)
+            
+            n[arm] += 1
+            mean[arm] += (int(rewards[i, arm]) - mean[arm]) / n[arm]
+            rounds += 1
+            selected[i] = arm
+        
+        algo.rounds = rounds
+        return selected
+    
+    @staticmethod
+    def _run_kl_ucb(algo, rewards):
+        n, mean, rng, rounds, kl_index = algo.n, algo.reward_mean, algo.rng, algo.rounds, algo.kl_index
+        selected = np.zeros(len(rewards), dtype=int)
+        for i in range(len(rewards)):
+            algo.rounds = rounds
+            arm = rand_argmax(kl_index(n, mean, algo._refresh_bound()), rng)
+            
+            n[arm] += 1
+            mean[arm] += (int(rewards[i, arm]) - mean[arm]) / n[arm]
+            rounds += 1
+            selected[i] = arm
+        
+        algo.rounds = rounds
+        return selected
+    
+    @staticmethod
+    def _run_thompsonsampling(algo, rewards):
+        alpha, beta, rng = algo.alpha, algo.beta, algo.rng
+        selected = np.zeros(len(rewards), dtype=int)
+        for i in range(len(rewards)):
+            arm = rand_argmax(rng.beta(alpha, beta), rng)
+            
+            reward = int(rewards[i, arm])
+            alpha[arm] += reward
+            beta[arm] += 1 - reward
+            selected[i] = arm
+        
+        return selected
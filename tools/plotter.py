@@ -1,65 +1,131 @@
 import numpy as np
-import matplotlib.pyplot as plt
 
 __all__ = ['Plotter']
 
 class Plotter:
     """ This class is for plotting regret results.
     Can plot regret of each algorithm and asymptotic lowerbound suggested in paper.
+    
+    Cumulative regret is kept only at log-spaced checkpoint rounds matching the symlog x-axis,
+    so memory and plotting time do not grow with the number of rounds.
     """
-    def __init__(self, data, data_info):
+    def __init__(self, data, data_info, points=1000):
         self.data = data
         self.data_info = data_info
+        self.checkpoints = self._get_checkpoints(data_info['rounds'], points)
     
-        self.lowerbound = []
+        self.lowerbound = np.zeros(len(self.checkpoints))
         self.algo_regret = {}
+        self.algo_band = {}
+        self.band_note = None
+        # running total regret and index of next checkpoint of each algorithm
+        self.algo_cursor = {}
+        
+    @staticmethod
+    def _get_checkpoints(rounds, points):
+        """ Rounds to be recorded, every round in linear part of symlog axis and `points` log-spaced rounds after that.
+        """
+        linear = np.arange(min(rounds, 10))
+        log = np.geomspace(1, max(rounds - 1, 1), points).astype(int)
+        checkpoints = np.unique(np.concatenate([linear, log, [rounds - 1]]))
+        
+        # log-spaced rounds start from 1, which does not exist in dataset of one round
+        return checkpoints[checkpoints < rounds]
         
     def __kl(self, P, Q):
         epsilon = 0.00001
         
-        P += epsilon
-        Q += epsilon
+        P = P + epsilon
+        Q = Q + epsilon
         
-        div = np.sum(P * np.log(P / Q))
+        div = P * np.log(P / Q)
 
         return div
     
-    def _get_lowerbound(self, round):
-        ''' This is for asymptotic lower bound for regret.
+    def _get_lowerbound(self):
+        ''' This is for asymptotic lower bound for regret, computed at all checkpoints at once.
         Reference from 'An Empirical Evaluation of Thompson Sampling'
         '''
-        best_arm_idx, best_reward = self.data_info['round_rewards'][round]
+        best_reward = self.data.best_reward[self.checkpoints]
         not_best_reward = self.data_info['best_reward'] - self.data_info['offset']
         
         tmp = ((best_reward - not_best_reward) / self.__kl(best_reward, not_best_reward))
         tmp *= self.data_info['arms']
         
-        self.lowerbound.append((np.log(round + 0.00001) * (tmp + 0.05)))
+        self.lowerbound = np.log(self.checkpoints + 0.00001) * (tmp + 0.05)
 
-    def _get_algo_regret(self, round, algo_name, selected_arm):
-        best_arm_idx, best_reward = self.data_info['round_rewards'][round]
+    def _get_regret(self, round, selected_arm):
+        """ Returns regret of selected arm at the round. Works element-wise for arrays of rounds or selected arms too.
+        """
+        best_arm_idx, best_reward = self.data.best_arm[round], self.data.best_reward[round]
         not_best_reward = self.data_info['best_reward'] - self.data_info['offset']
         
-        regret = 0 if selected_arm == best_arm_idx else best_reward - not_best_reward
+        return np.where(selected_arm == best_arm_idx, 0, best_reward - not_best_reward)
+
+    def _get_algo_regret(self, round, algo_name, selected_arm):
+        """ Accumulate regret of one round. Rounds should be given in order from 0.
+        """
+        self._get_algo_regret_block(round, algo_name, np.array([selected_arm]))
         
+    def _get_algo_regret_block(self, begin, algo_name, selected_arm):
+        """ Accumulate regret of consecutive rounds beginning at `begin`, where selected_arm is array of selected arm of each round.
+        """
         if algo_name not in self.algo_regret:
-            self.algo_regret[algo_name] = [regret]
-        else:
-            tmp = self.algo_regret[algo_name][-1]
-            self.algo_regret[algo_name].append(tmp + regret)
+            self.algo_regret[algo_name] = np.zeros(len(self.checkpoints))
+            self.algo_cursor[algo_name] = [0., 0]
+        total, cursor = self.algo_cursor[algo_name]
+        
+        end = begin + len(selected_arm)
+        regret = total + np.cumsum(self._get_regret(np.arange(begin, end), selected_arm))
+        
+        stop = np.searchsorted(self.checkpoints, end)
+        self.algo_regret[algo_name][cursor:stop] = regret[self.checkpoints[cursor:stop] - begin]
+        self.algo_cursor[algo_name] = [regret[-1], stop]
+
+    def _get_algo_state(self, algo_name):
+        """ Returns regret accumulation state of algorithm as dict of arrays, to be stored by checkpoint.
+        """
+        total, cursor = self.algo_cursor[algo_name]
+        
+        return {'regret': self.algo_regret[algo_name], 'total': np.array(total), 'cursor': np.array(cursor)}
+    
+    def _set_algo_state(self, algo_name, state):
+        self.algo_regret[algo_name] = np.array(state['regret'])
+        self.algo_cursor[algo_name] = [float(state['total']), int(state['cursor'])]
+
+    def _add_algo_regret(self, algo_name, regret):
+        """ Merge regret curve of algorithm at checkpoints computed elsewhere, e.g. by worker process.
+        """
+        self.algo_regret[algo_name] = regret
+
+    def _add_algo_band(self, algo_name, lower, upper, note=None):
+        """ Set confidence band of algorithm regret curve, e.g. over independent replicas. `note` telling what bands cover is shown under the title.
+        """
+        self.algo_band[algo_name] = (lower, upper)
+        if note is not None:
+            self.band_note = note
 
     def __plot(self, x):
+        # matplotlib takes most of startup time, so it is imported only when a graph is drawn
+        import matplotlib.pyplot as plt
+        
         ylim = 0
         for algo_name, regret in self.algo_regret.items():
-            plt.plot(x, regret, label='%s' % algo_name)
+            line, = plt.plot(x, regret, label='%s' % algo_name)
             ylim = max(ylim, regret[-1])
+            if algo_name in self.algo_band:
+                lower, upper = self.algo_band[algo_name]
+                plt.fill_between(x, lower, upper, color=line.get_color(), alpha=0.2)
+                ylim = max(ylim, upper[-1])
             
         plt.plot(x, self.lowerbound, label='asymptotic_lower_bound')
         
         return ylim
 
     def _plot_regret(self, title, fpath):
-        x = range(self.data_info['rounds'])
+        import matplotlib.pyplot as plt
+        
+        x = self.checkpoints
         
         ylim = self.__plot(x)
 
@@ -69,6 +135,9 @@ class Plotter:
         plt.xlabel('rounds')
         plt.ylabel('regret')
 
-        plt.title('Regret graph of (%s)' % title)
+        title = 'Regret graph of (%s)' % title
+        if self.band_note is not None:
+            title += '\n(bands: %s)' % self.band_note
+        plt.title(title)
         plt.legend()
-        plt.savefig(fpath)
\ No newline at end of file
+        plt.savefig(fpath)
@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+import json
+import numpy as np
+
+__all__ = ['Profiler']
+
+class Profiler:
+    """ This class is for recording time spent in each phase (select_arm, update_parameter, reward lookup, regret bookkeeping) of each algorithm.
+    Each (algorithm, phase) keeps number of calls, total time, and histogram of call durations in power-of-2 nanosecond buckets.
+    
+    Profiler does nothing by itself, instrumented code path is taken only when profiler is given, so that disabled profiling costs nothing.
+    """
+    BUCKETS = 64
+    
+    def __init__(self):
+        self.stats = {}
+        
+    def _get_stat(self, algo_name, phase):
+        key = '%s/%s' % (algo_name, phase)
+        if key not in self.stats:
+            self.stats[key] = {'count': 0, 'total_ns': 0, 'hist': [0] * self.BUCKETS}
+            
+        return self.stats[key]
+    
+    def record(self, algo_name, phase, ns, count=1):
+        """ Add `count` calls taking `ns` nanoseconds in total. Duration of one call is used for the histogram.
+        """
+        stat = self._get_stat(algo_name, phase)
+        stat['count'] += count
+        stat['total_ns'] += ns
+        stat['hist'][min(int(ns // count).bit_length(), self.BUCKETS - 1)] += count
+        
+    def merge(self, stats):
+        """ Merge stats recorded elsewhere, e.g. by worker process.
+        """
+        for key, other in stats.items():
+            stat = self._get_stat(*key.split('/', 1))
+            stat['count'] += other['count']
+            stat['total_ns'] += other['total_ns']
+            stat['hist'] = [a + b for a, b in zip(stat['hist'], other['hist'])]
+            
+    @staticmethod
+    def _percentile(hist, q):
+        """ Upper bound of the bucket containing q-th percentile, in nanoseconds.
+        """
+        cum = np.cumsum(hist)
+        bucket = int(np.searchsorted(cum, q / 100 * cum[-1]))
+        
+        return 2 ** bucket
+            
+    def summary(self):
+        summary = {}
+        for key, stat in self.stats.items():
+            summary[key] = {'count': stat['count'],
+                            'total_s': stat['total_ns'] / 1e9,
+                            'mean_us': stat['total_ns'] / max(stat['count'], 1) / 1e3,
+                            'p50_us': self._percentile(stat['hist'], 50) / 1e3,
+                            'p99_us': self._percentile(stat['hist'], 99) / 1e3}
+            
+        return summary
+    
+    def log(self, logger):
+        logger.info('%-32s %10s %10s %10s %10s %10s' % ('algorithm/phase', 'calls', 'total(s)', 'mean(us)', 'p50(us)', 'p99(us)'))
+        for key, s in self.summary().items():
+            logger.info('%-32s %10d %10.3f %10.2f %10.2f %10.2f' % (key, s['count'], s['total_s'], s['mean_us'], s['p50_us'], s['p99_us']))
+        logger.info('=' * 54)
+        
+    def dump(self, fpath):
+        with open(fpath, 'w') as f:
+            json.dump({'summary': self.summary(), 'stats': self.stats}, f, indent=4)
@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+
+__all__ = ['ReplicaSimulator']
+
+class ReplicaSimulator:
+    """ This class is for simulating many independent replicas of a MAB algorithm at once on the same reward dataset.
+    Policy given to `run` keeps (replicas, arms) state, so selection and update of all replicas is one vectorized step per round.
+    Policies without batched state can be given as list of independent policies instead.
+    
+    Cumulative regret is computed by `Plotter._get_regret`, and its mean and confidence band over replicas at plotter checkpoints are stored in plotter.
+    All replicas read rewards of the same dataset, which stores one reward draw of each (round, arm), so the band covers randomness of the policy only,
+    not of the rewards. Variability over reward draws is seen by running on datasets of different data `seed`.
+    """
+    def __init__(self, data, plotter, replicas, chunk_rounds, z=1.96):
+        self.data = data
+        self.plotter = plotter
+        self.replicas = replicas
+        self.chunk_rounds = chunk_rounds
+        self.z = z
+        
+    class PolicyList:
+        """ This inner class makes list of independent policies to be used same as one batched policy.
+        """
+        def __init__(self, policies):
+            self.policies = policies
+            
+        def select_arm(self):
+            return np.array([policy.select_arm() for policy in self.policies])
+        
+        def update_parameter(self, selected_arm, reward):
+            for policy, arm, r in zip(self.policies, selected_arm, reward):
+                policy.update_parameter(int(arm), int(r))
+    
+    def run(self, policy, label, pbar=None):
+        """ Returns (mean, lower, upper) of cumulative regret over replicas, which are also stored in plotter under `label`.
+        """
+        if isinstance(policy, list):
+            policy = self.PolicyList(policy)
+            
+        checkpoints = self.plotter.checkpoints
+        mean, std = np.zeros(len(checkpoints)), np.zeros(len(checkpoints))
+        
+        regret, cursor = np.zeros(self.replicas), 0
+        for begin, rewards, _, _ in self.data.iter_chunks(self.chunk_rounds):
+            selected = np.zeros((len(rewards), self.replicas), dtype=int)
+            for i in range(len(rewards)):
+                selected_arm = policy.select_arm()
+                policy.update_parameter(selected_arm, rewards[i, selected_arm])
+                selected[i] = selected_arm
+                
+            # cumulative regret of every replica is summarized only at checkpoints of this chunk
+            end = begin + len(rewards)
+            cum = regret + np.cumsum(self.plotter._get_regret(np.arange(begin, end)[:, None], selected), axis=0)
+            stop = np.searchsorted(checkpoints, end)
+            rows = cum[checkpoints[cursor:stop] - begin]
+            mean[cursor:stop], std[cursor:stop] = rows.mean(axis=1), rows.std(axis=1)
+            regret, cursor = cum[-1], stop
+            
+            if pbar is not None:
+                pbar.update(len(rewards))
+        
+        band = self.z * std / np.sqrt(self.replicas)
+        self.plotter._add_algo_regret(label, mean)
+        self.plotter._add_algo_band(label, mean - band, mean + band, '%d replicas on one reward draw, policy randomness only' % self.replicas)
+        
+        return mean, mean - band, mean + band
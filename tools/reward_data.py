@@ -0,0 +1,210 @@
+# -*- coding: utf-8 -*-
+import os
+import numpy as np
+
+__all__ = ['RewardData']
+
+class RewardData:
+    """ This class is columnar reward dataset stored as bit-packed (rounds x arms) matrix in `.npy` file.
+    Bit (r, arm) is 1 if pulling the arm at round r gives reward, so reward lookup is O(1) array index.
+    Best arm index and its reward probability of each round are stored next to it as `best_arm.npy` and `best_reward.npy`.
+    
+    Files are written sequentially in chunks and loaded memory-mapped, so neither making nor loading dataset
+    needs memory proportional to the number of rounds. `iter_chunks` streams the rounds with constant memory.
+    
+    Dataset with per-round contexts has `contexts.npy` too, which is memory-mapped (rounds, arms, d) context of each arm
+    or (rounds, d) user feature of each round, and `contexts` is None otherwise. User features come with `arms_context.npy`,
+    (arms, d) fixed context of arms, to make per-arm contexts of the rounds, see `get_contexts`.
+    """
+    FNAME = 'rewards.npy'
+    BEST_ARM_FNAME = 'best_arm.npy'
+    BEST_REWARD_FNAME = 'best_reward.npy'
+    CONTEXT_FNAME = 'contexts.npy'
+    ARMS_CONTEXT_FNAME = 'arms_context.npy'
+    
+    def __init__(self, packed, best_arm, best_reward, arms, fpath=None, contexts=None, arms_context=None):
+        self.packed = packed
+        self.best_arm = best_arm
+        self.best_reward = best_reward
+        self.arms = arms
+        self.contexts = contexts
+        self.arms_context = arms_context
+        self.rounds = packed.shape[0]
+        self.fpath = fpath
+        
+    @classmethod
+    def _columns(cls, rounds, arms):
+        return {cls.FNAME: (np.dtype(np.uint8), (rounds, (arms + 7) // 8)),
+                cls.BEST_ARM_FNAME: (np.dtype(np.int64), (rounds,)),
+                cls.BEST_REWARD_FNAME: (np.dtype(np.float64), (rounds,))}
+        
+    @classmethod
+    def create(cls, fpath, rounds, arms):
+        """ Returns writer which appends chunks of rounds to dataset files in `fpath`.
+        """
+        return RewardDataWriter(fpath, cls._columns(rounds, arms), arms)
+    
+    @classmethod
+    def load(cls, fpath, arms, mmap=True):
+        columns = []
+        for fname in cls._columns(0, arms):
+            column = np.load(os.path.join(fpath, fname), mmap_mode='r' if mmap else None)
+            # plain ndarray view of memmap avoids memmap overhead on every scalar index
+            columns.append(column.view(np.ndarray))
+        
+        contexts, arms_context = None, None
+        if os.path.isfile(os.path.join(fpath, cls.CONTEXT_FNAME)):
+            contexts = np.load(os.path.join(fpath, cls.CONTEXT_FNAME), mmap_mode='r' if mmap else None).view(np.ndarray)
+        if os.path.isfile(os.path.join(fpath, cls.ARMS_CONTEXT_FNAME)):
+            arms_context = np.load(os.path.join(fpath, cls.ARMS_CONTEXT_FNAME))
+        
+        return cls(*columns, arms, fpath=fpath, contexts=contexts, arms_context=arms_context)
+    
+    @classmethod
+    def exists(cls, fpath, rounds, arms):
+        """ True if files of the dataset of `rounds` and `arms` are in `fpath`. Header of each file should have the shape of them
+        and the file should be as long as the header says, so that dataset truncated e.g. by interrupted making is not taken.
+        """
+        for fname, (dtype, shape) in cls._columns(rounds, arms).items():
+            if cls._read_full_header(os.path.join(fpath, fname)) != (shape, dtype):
+                return False
+        
+        # contexts are (rounds, arms, d) or (rounds, d) for dimension d of the dataset
+        if os.path.isfile(os.path.join(fpath, cls.CONTEXT_FNAME)):
+            header = cls._read_full_header(os.path.join(fpath, cls.CONTEXT_FNAME))
+            if header is None or header[0][0] != rounds:
+                return False
+        
+        return True
+    
+    @staticmethod
+    def _read_header(f):
+        """ Read header of `.npy` file, so that f points to the first element, and returns its (shape, fortran_order, dtype).
+        """
+        if np.lib.format.read_magic(f) == (1, 0):
+            return np.lib.format.read_array_header_1_0(f)
+        
+        return np.lib.format.read_array_header_2_0(f)
+    
+    @classmethod
+    def _read_full_header(cls, fpath):
+        """ Returns (shape, dtype) of `.npy` file, or None if the file is missing, unreadable or shorter than its header says.
+        """
+        if not os.path.isfile(fpath):
+            return None
+        
+        with open(fpath, 'rb') as f:
+            try:
+                shape, _, dtype = cls._read_header(f)
+            except ValueError:
+                return None
+            if os.path.getsize(fpath) != f.tell() + dtype.itemsize * int(np.prod(shape)):
+                return None
+        
+        return shape, dtype
+    
+    def reward(self, round, arm):
+        return int(self.packed[round, arm >> 3] >> (7 - (arm & 7))) & 1
+    
+    def __getitem__(self, round):
+        """ Returns 0/1 reward of all arms at the round (or rounds for slice).
+        """
+        return np.unpackbits(self.packed[round], axis=-1, count=self.arms)
+    
+    def __len__(self):
+        return self.rounds
+    
+    def get_contexts(self, begin, end):
+        """ Returns (end - begin, arms, d) contexts of the rounds. Contexts of user features are `UserContexts`, which is indexed like the array
+        but makes context of arm only when it is indexed.
+        """
+        contexts = self.contexts[begin:end]
+        if contexts.ndim == 2:
+            contexts = UserContexts(contexts, self.arms_context)
+            
+        return contexts
+    
+    def iter_chunks(self, chunk_rounds, start=0):
+        """ Generator of (begin, rewards, best_arm, best_reward) for each chunk of rounds from `start`, where rewards is (chunk, arms) 0/1 array.
+        If the dataset is file-backed, chunks are read from files instead of memory map, so that memory stays constant.
+        """
+        if self.fpath is None:
+            for begin in range(start, self.rounds, chunk_rounds):
+                end = min(begin + chunk_rounds, self.rounds)
+                yield begin, self[begin:end], self.best_arm[begin:end], self.best_reward[begin:end]
+            return
+        
+        files = [open(os.path.join(self.fpath, fname), 'rb') for fname in self._columns(0, self.arms)]
+        try:
+            for f in files:
+                # skip the header, so that f points to the first round
+                self._read_header(f)
+                
+            width = self.packed.shape[1]
+            for f, itemsize in zip(files, [width, 8, 8]):
+                f.seek(start * itemsize, os.SEEK_CUR)
+            
+            for begin in range(start, self.rounds, chunk_rounds):
+                n = min(chunk_rounds, self.rounds - begin)
+                packed = np.fromfile(files[0], dtype=np.uint8, count=n * width).reshape(n, width)
+                best_arm = np.fromfile(files[1], dtype=np.int64, count=n)
+                best_reward = np.fromfile(files[2], dtype=np.float64, count=n)
+                
+                yield begin, np.unpackbits(packed, axis=1, count=self.arms), best_arm, best_reward
+        finally:
+            for f in files:
+                f.close()
+
+class UserContexts:
+    """ This class is (rounds, arms, d) contexts of user feature of each round, whose context of arm at the round is element-wise product
+    of the user feature and fixed context of the arm. Unlike the same user feature for all arms, linear score of arm then depends on both,
+    so that policies sharing one parameter vector across arms (e.g. `Context_ThompsonSampling` and shared part of `HybridLinUCB`) rank arms by the user.
+    
+    `contexts[i]` is (arms, d) contexts of round i, `contexts[b:e]` is (e - b, arms, d), and `contexts[rounds, arms]` for index arrays of
+    the same length is (n, d) context of each chosen arm, as with numpy array.
+    """
+    def __init__(self, users, arms_context):
+        self.users = users
+        self.arms_context = arms_context
+        self.shape = users.shape[:1] + arms_context.shape
+        
+    def __len__(self):
+        return self.shape[0]
+    
+    def __getitem__(self, key):
+        if isinstance(key, tuple):
+            rounds, arms = key
+            return self.users[rounds] * self.arms_context[arms]
+        
+        return self.users[key][..., None, :] * self.arms_context
+
+class RewardDataWriter:
+    """ This class writes header of each column `.npy` file first, and then appends chunks of rounds in order.
+    """
+    def __init__(self, fpath, columns, arms):
+        self.fpath = fpath
+        self.arms = arms
+        self.rounds = next(iter(columns.values()))[1][0]
+        self.written = 0
+        
+        self.files = []
+        for fname, (dtype, shape) in columns.items():
+            f = open(os.path.join(fpath, fname), 'wb')
+            header = {'descr': np.lib.format.dtype_to_descr(dtype), 'fortran_order': False, 'shape': shape}
+            np.lib.format.write_array_header_1_0(f, header)
+            self.files.append((f, dtype))
+    
+    def write(self, begin, rewards, best_arm, best_reward):
+        """ Append (rounds, arms) 0/1 block of rewards beginning at round `begin`, with best arm index and its reward of those rounds.
+        """
+        assert begin == self.written, 'chunks should be written in order'
+        
+        chunk = [np.packbits(np.asarray(rewards, dtype=bool), axis=1), best_arm, best_reward]
+        for (f, dtype), column in zip(self.files, chunk):
+            np.ascontiguousarray(column, dtype=dtype).tofile(f)
+        self.written += len(rewards)
+        
+    def close(self):
+        for f, dtype in self.files:
+            f.close()
+        assert self.written == self.rounds, 'dataset is not completely written'
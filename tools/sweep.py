@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+import os
+import json
+import hashlib
+import itertools
+import numpy as np
+
+__all__ = ['expand_grid', 'ResultCache']
+
+def _expand_values(value):
+    """ List is taken as it is, and dict is range of {start, stop, num} (`scale` of 'linear' or 'log') or {start, stop, step}.
+    Any other value is fixed.
+    """
+    if isinstance(value, list):
+        return value
+    if not isinstance(value, dict):
+        return [value]
+    
+    if 'step' in value:
+        values = np.arange(value['start'], value['stop'] + value['step'] / 2, value['step'])
+    elif value.get('scale', 'linear') == 'log':
+        values = np.geomspace(value['start'], value['stop'], value['num'])
+    else:
+        values = np.linspace(value['start'], value['stop'], value['num'])
+    
+    # rounded to keep labels and cache keys free of float noise
+    return [round(float(v), 10) for v in values]
+
+def expand_grid(grid):
+    """ Returns list of every combination of parameters declared in `grid`, in order of its keys.
+    """
+    keys = list(grid)
+    
+    return [dict(zip(keys, values)) for values in itertools.product(*[_expand_values(grid[k]) for k in keys])]
+
+class ResultCache:
+    """ This class is content-addressed store of finished simulation results.
+    Key is hash of everything the result depends on, e.g. algorithm, its parameters, source code, dataset and seed,
+    so that rerunning an extended grid only computes the new points. Each result is `<key>.npz` holding regret curve,
+    elapsed seconds, and the fields of the key as json for inspection.
+    """
+    def __init__(self, fpath):
+        self.fpath = fpath
+        if not os.path.isdir(self.fpath):
+            os.makedirs(self.fpath)
+    
+    @staticmethod
+    def key(**fields):
+        return hashlib.sha256(json.dumps(fields, sort_keys=True, default=str).encode()).hexdigest()
+    
+    def _get_fname(self, key):
+        return os.path.join(self.fpath, key + '.npz')
+    
+    def get(self, key):
+        """ Returns (regret, elapsed seconds) of the key, or None if not cached.
+        """
+        try:
+            with np.load(self._get_fname(key)) as f:
+                return f['regret'], float(f['elapsed'])
+        except (FileNotFoundError, ValueError, KeyError, OSError):
+            return None
+    
+    def put(self, key, regret, elapsed, **fields):
+        tmp = self._get_fname(key) + '.tmp'
+        with open(tmp, 'wb') as f:
+            np.savez(f, regret=regret, elapsed=np.array(elapsed), fields=np.array(json.dumps(fields, sort_keys=True, default=str)))
+        os.replace(tmp, self._get_fname(key))